@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.utils.text import smart_split, unescape_string_literal
+
 from apps.users.models import Profile
+from apps.users.search import matching
 
 # Register your models here.
 
@@ -15,6 +18,18 @@ class ProfileAdmin(admin.ModelAdmin):
         'country', 'city'
     )
     list_filter = ('role', 'country', 'city')
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # search_fields' columns, answered by the search index (apps.users.search)
+        terms = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            terms.append((None, bit))
+        if not terms:
+            return queryset, False
+        return queryset.filter(matching(terms)), False
 
     def get_first_name(self, obj):
         return obj.user.first_name
@@ -0,0 +1,128 @@
+"""
+Drop-in replacement for DRF's TokenAuthentication that keeps token lookups
+off the database.
+
+A token resolves to its user and profile status through two cache levels:
+a bounded per-process LRU (``VIBES_AUTH_LOCAL_SIZE`` entries, kept for
+``VIBES_AUTH_LOCAL_TTL`` seconds) and the shared cache
+(``VIBES_AUTH_CACHE_TTL`` seconds). Only a miss on both runs the one
+Token/User/Profile query. Entries hold the pickled user, so every request
+gets its own instance.
+
+``invalidate_tokens`` drops both levels; apps.users.signals calls it when
+a token is deleted (logout) or a user / profile is saved (password,
+is_active, status). Other processes drop their local copy within the
+local TTL at most.
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+# profile statuses that may no longer use their token (see views.login_result)
+BLOCKED_STATUSES = {
+    'suspended': "This account is suspended.",
+    'deleted':   "This account has been deleted.",
+}
+
+
+class LocalLRU:
+    """Thread-safe, size-bounded LRU whose entries expire after ``VIBES_AUTH_LOCAL_TTL`` seconds."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = getattr(settings, 'VIBES_AUTH_LOCAL_SIZE', 10000)
+        expires = time.monotonic() + getattr(settings, 'VIBES_AUTH_LOCAL_TTL', 10)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LocalLRU()
+
+
+def _cache_key(token_key):
+    # the token itself never appears in cache key names
+    return f"auth:token:{hashlib.sha256(token_key.encode()).hexdigest()}"
+
+
+def invalidate_tokens(user_id=None, key=None):
+    """Forget the cached entry of token ``key``, or of every token of ``user_id``."""
+    keys = [key] if key else list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    for token_key in keys:
+        cache.delete(_cache_key(token_key))
+        _local.pop(token_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        entry = _local.get(key)
+        if entry is None:
+            entry = cache.get(_cache_key(key))
+            if entry is None:
+                entry = self.load(key)
+                cache.set(_cache_key(key), entry, getattr(settings, 'VIBES_AUTH_CACHE_TTL', 300))
+            _local.put(key, entry)
+
+        payload, profile_status = entry
+        user = pickle.loads(payload)
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        if profile_status in BLOCKED_STATUSES:
+            raise AuthenticationFailed(BLOCKED_STATUSES[profile_status])
+
+        return user, Token(key=key, user=user)
+
+    @staticmethod
+    def load(key):
+        """
+        ``(pickled user, profile status)`` for a token, in one query. The
+        password hash is deferred so it never reaches the shared cache.
+        """
+        try:
+            token = (
+                Token.objects.select_related('user')
+                .defer('user__password')
+                .annotate(profile_status=F('user__profile__status'))
+                .get(key=key)
+            )
+        except Token.DoesNotExist:
+            raise AuthenticationFailed('Invalid token.')
+        user = token.user
+        user._state.fields_cache.clear()     # select_related cached the token on it
+        return pickle.dumps(user), token.profile_status
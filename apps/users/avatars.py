@@ -0,0 +1,139 @@
+"""
+Content-addressed avatars with fixed-size thumbnails.
+
+An uploaded avatar is stored under the SHA-256 of its bytes
+(``avatar/ab/abcdef....jpg``): uploading the same image again, from any
+account, reuses the stored file. Thumbnails are square crops at every
+``SIZES`` size, in WebP and JPEG, named after the same hash. Every name is
+derived from the content, so a URL never changes meaning and may be cached
+forever.
+
+apps.users.signals runs ``store`` before a Profile with a new upload is
+saved; the thumbnails are then made by the ``make_avatar_thumbnails``
+Celery task (apps.users.tasks), outside the request. Until it has run
+(``Profile.avatar_thumbnails`` is False) ``urls`` points every size at the
+original.
+"""
+
+import hashlib
+import os
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from apps.users.models import Profile
+
+SIZES = {
+    'small':  64,
+    'medium': 256,
+    'large':  512,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+UPLOAD_DIR = 'avatar'
+HASHED_NAME = re.compile(rf'^{UPLOAD_DIR}/(?:[0-9a-f]{{2}}/[0-9a-f]{{64}}|thumbs/[0-9a-f]{{64}}_\d+)\.\w+$')
+
+
+def storage():
+    return Profile._meta.get_field('avatar').storage
+
+
+def _digest(file):
+    sha = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        sha.update(chunk)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def _extension(file):
+    try:
+        image_format = Image.open(file).format
+    except (OSError, ValueError):
+        image_format = None
+    file.seek(0)
+    return EXTENSIONS.get(image_format) or os.path.splitext(file.name)[1].lower()
+
+
+def is_content_addressed(name):
+    """Whether ``name`` (relative to the media root) can only ever hold the same bytes."""
+    return bool(HASHED_NAME.match(name))
+
+
+def thumbnail_name(name, size, fmt):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f"{UPLOAD_DIR}/thumbs/{stem}_{SIZES[size]}.{fmt}"
+
+
+def thumbnails_exist(name):
+    return all(storage().exists(thumbnail_name(name, size, fmt)) for size in SIZES for fmt in FORMATS)
+
+
+def store(profile):
+    """
+    Replace a pending upload on ``profile.avatar`` with its hashed original
+    and set ``avatar_thumbnails``. Returns True when thumbnails are still
+    to be made.
+    """
+    avatar = profile.avatar
+    if not avatar:
+        profile.avatar_thumbnails = False
+        return False
+    if avatar._committed:
+        return False
+
+    digest = _digest(avatar.file)
+    name = f"{UPLOAD_DIR}/{digest[:2]}/{digest}{_extension(avatar.file)}"
+    if not storage().exists(name):
+        stored = storage().save(name, avatar.file)
+        if stored != name:
+            storage().delete(stored)    # a concurrent upload of the same image won the name
+    avatar.name = name
+    avatar._committed = True
+    profile.avatar_thumbnails = thumbnails_exist(name)
+    return not profile.avatar_thumbnails
+
+
+def make_thumbnails(name):
+    """Write the missing thumbnails of the stored original ``name``."""
+    with storage().open(name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    for size, pixels in SIZES.items():
+        thumb = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        for fmt, (image_format, options) in FORMATS.items():
+            target = thumbnail_name(name, size, fmt)
+            if storage().exists(target):
+                continue
+            out = thumb
+            if image_format == 'JPEG' and thumb.mode != 'RGB':
+                out = Image.new('RGB', thumb.size, 'white')
+                out.paste(thumb, mask=thumb.getchannel('A'))
+            buffer = BytesIO()
+            out.save(buffer, image_format, **options)
+            storage().save(target, ContentFile(buffer.getvalue()))
+
+
+def urls(name, ready, build=lambda url: url):
+    """
+    ``{size: {format: url}}`` for the avatar stored as ``name`` (None when
+    there is none); ``build`` turns a storage URL into an absolute one.
+    """
+    if not name:
+        return None
+    if not ready:
+        original = build(storage().url(name))
+        return {size: {fmt: original for fmt in FORMATS} for size in SIZES}
+    return {
+        size: {fmt: build(storage().url(thumbnail_name(name, size, fmt))) for fmt in FORMATS}
+        for size in SIZES
+    }
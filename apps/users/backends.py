@@ -2,19 +2,34 @@ from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 
+from apps.users.models import UserEmail, normalize_email
+
 UserModel = get_user_model()
 
+def find_user(identifier):
+    """
+    The user whose username or email is ``identifier``, in one query with
+    both branches indexed: username is unique, emails go through the
+    normalized UserEmail table. An exact username beats another account's
+    email.
+    """
+    users = list(UserModel.objects.filter(
+        Q(username=identifier) |
+        Q(pk__in=UserEmail.objects.filter(email=normalize_email(identifier)).values('user_id'))
+    )[:2])
+    return next((u for u in users if u.username == identifier), users[0] if users else None)
+
+
 class EmailOrUsernameBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         # Accept email or username
         if username is None:
             username = kwargs.get('email')
-        
-        try:
-            user = UserModel.objects.get(
-                Q(username=username) | Q(email=username)
-            )
-        except UserModel.DoesNotExist:
+        if username is None or password is None:
+            return None
+
+        user = find_user(username)
+        if user is None:
             return None
 
         if user.check_password(password) and self.user_can_authenticate(user):
@@ -0,0 +1,99 @@
+"""
+Password hashing off the event loop for the async login view.
+
+PBKDF2 costs 100-300 ms of CPU per check. Hashes run in a bounded thread
+pool (``VIBES_LOGIN_HASH_WORKERS`` threads; hashlib releases the GIL while
+it hashes) so a login never stalls the other requests of its worker. At
+most ``VIBES_LOGIN_MAX_PENDING`` hashes may be queued or running; past
+that ``run`` raises PoolBusy and the view answers 503 instead of letting
+the queue, and every client's wait, grow without bound.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable, make_password
+
+_lock = threading.Lock()
+_executor = None
+_pending = 0
+
+
+class PoolBusy(Exception):
+    pass
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'VIBES_LOGIN_HASH_WORKERS', 4),
+                thread_name_prefix='login-hash',
+            )
+        return _executor
+
+
+def _release(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+async def run(func, *args):
+    """Await ``func(*args)`` on the hashing pool, or raise PoolBusy when it is full."""
+    global _pending
+    pool = _pool()
+    with _lock:
+        if _pending >= getattr(settings, 'VIBES_LOGIN_MAX_PENDING', 64):
+            raise PoolBusy()
+        _pending += 1
+    # counted until the thread finishes, even if the client went away
+    future = pool.submit(partial(func, *args))
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+def verify(password, encoded):
+    """
+    ``(is_correct, must_update)`` for a raw password against its stored
+    hash: django.contrib.auth.hashers.check_password without the setter,
+    so the caller decides where the re-hash runs.
+    """
+    if password is None or not is_password_usable(encoded):
+        return False, False
+
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, must_update
+
+
+async def check_password(user, password):
+    """
+    Whether ``password`` is ``user``'s. A hash stored with outdated hasher
+    settings (algorithm, iterations) is replaced on success. With no user,
+    one hash is still computed so unknown accounts answer as slowly as
+    known ones.
+    """
+    if user is None:
+        await run(make_password, password)
+        return False
+
+    is_correct, must_update = await run(verify, password, user.password)
+    if is_correct and must_update:
+        user.password = await run(make_password, password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return is_correct
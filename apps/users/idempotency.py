@@ -0,0 +1,104 @@
+"""
+``Idempotency-Key`` support for write endpoints that mobile clients retry.
+
+The first request with a given key claims it in the cache and runs the
+view; its response (anything below 500) is stored for
+``VIBES_IDEMPOTENCY_TTL`` seconds under the key, the endpoint and the
+user (``anon`` before login). Retries get the stored response back with
+``Idempotent-Replayed: true`` and never reach the write path. A retry that
+arrives while the first request is still running gets an immediate 409
+with ``Retry-After`` rather than running the view a second time; waiting
+for the result would hold a worker (or, under ASGI, the request thread)
+doing nothing.
+
+A key reused with a different body is rejected with 422, so a stored
+response (which may carry a token) is only ever replayed for the exact
+request that produced it.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER         = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+LOCK_TIMEOUT   = 60      # an in-flight claim outlives any request, even if its worker dies
+RETRY_AFTER    = 1       # seconds; a create is done well within it
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def key_reused():
+    return Response({
+        "status": False,
+        "message": "Idempotency Error",
+        "errors": "This Idempotency-Key was already used with a different request."
+    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+def replay(stored, request_fingerprint):
+    stored_fingerprint, code, data = stored
+    if stored_fingerprint != request_fingerprint:
+        return key_reused()
+    return Response(data, status=code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(name):
+    """
+    Decorator for an APIView handler (``post`` / ``create``) honouring the
+    ``Idempotency-Key`` header; ``name`` namespaces the keys per endpoint.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.META.get(HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({
+                    "status": False,
+                    "message": "Validation Error",
+                    "errors": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            owner = request.user.pk if request.user.is_authenticated else 'anon'
+            result_key = f"idem:{name}:{owner}:{hashlib.sha256(key.encode()).hexdigest()}"
+            lock_key = f"{result_key}:lock"
+            request_fingerprint = fingerprint(request)
+
+            stored = cache.get(result_key)
+            if stored is not None:
+                return replay(stored, request_fingerprint)
+            if not cache.add(lock_key, request_fingerprint, LOCK_TIMEOUT):
+                stored = cache.get(result_key)          # finished in between
+                if stored is not None:
+                    return replay(stored, request_fingerprint)
+                in_flight = cache.get(lock_key)
+                if in_flight is not None and in_flight != request_fingerprint:
+                    return key_reused()
+                return Response({
+                    "status": False,
+                    "message": "Request In Progress",
+                    "errors": "A request with this Idempotency-Key is still being processed."
+                }, status=status.HTTP_409_CONFLICT, headers={'Retry-After': str(RETRY_AFTER)})
+
+            try:
+                response = handler(view, request, *args, **kwargs)
+                # server errors are left retryable
+                if response.status_code < 500 and hasattr(response, 'data'):
+                    cache.set(result_key, (request_fingerprint, response.status_code, response.data),
+                              getattr(settings, 'VIBES_IDEMPOTENCY_TTL', 3600))
+            finally:
+                cache.delete(lock_key)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,56 @@
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Compare the EmailOrUsernameBackend lookup before (username OR unindexed auth_user.email) "
+            "and after (username OR the unique UserEmail table) on a throwaway in-memory SQLite "
+            "database with --users accounts.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=200)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        db = sqlite3.connect(':memory:')
+        db.execute("CREATE TABLE auth_user (id INTEGER PRIMARY KEY, username VARCHAR(150) NOT NULL UNIQUE, "
+                   "email VARCHAR(254) NOT NULL, password VARCHAR(128) NOT NULL)")
+        db.execute("CREATE TABLE users_useremail (id INTEGER PRIMARY KEY, "
+                   "user_id INTEGER NOT NULL UNIQUE REFERENCES auth_user (id), email VARCHAR(254) NOT NULL UNIQUE)")
+
+        users = options['users']
+        db.executemany(
+            "INSERT INTO auth_user (id, username, email, password) VALUES (?, ?, ?, ?)",
+            ((n, f"user{n}", f"User{n}@Example.com", 'pbkdf2_sha256$...') for n in range(1, users + 1)),
+        )
+        db.execute("INSERT INTO users_useremail (user_id, email) SELECT id, lower(email) FROM auth_user")
+
+        # logins by email: existing addresses (as typed) and unknown ones
+        emails = [f"User{rng.randint(1, users)}@Example.com" for _ in range(options['queries'] // 2)]
+        emails += [f"nobody{n}@example.com" for n in range(options['queries'] - len(emails))]
+
+        before = ("SELECT id, password FROM auth_user WHERE username = ? OR email = ?",
+                  lambda email: (email, email))
+        after = ("SELECT id, password FROM auth_user WHERE username = ? OR id IN "
+                 "(SELECT user_id FROM users_useremail WHERE email = ?)",
+                 lambda email: (email, email.strip().lower()))
+
+        self.stdout.write(f"users: {users}, lookups: {len(emails)} (half unknown addresses)")
+        for name, (sql, params) in (('username OR email', before), ('username OR UserEmail', after)):
+            plan = ' / '.join(row[-1] for row in db.execute('EXPLAIN QUERY PLAN ' + sql, params(emails[0])))
+            timings = []
+            for email in emails:
+                started = time.perf_counter()
+                db.execute(sql, params(email)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{name:22} p50 {statistics.median(timings):9.3f} ms   "
+                f"p99 {timings[int(len(timings) * 0.99) - 1]:9.3f} ms   plan: {plan}"
+            )
+        db.close()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from apps.users import hashing
+
+
+class Command(BaseCommand):
+    help = ("Login password checks under concurrency on one event loop: inline (what a single "
+            "worker did before) against the async view's hashing pool. Reports throughput, "
+            "latency and the longest stall the loop imposed on other requests.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=64)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'VIBES_LOGIN_HASH_WORKERS', 4))
+
+    def handle(self, *args, **options):
+        settings.VIBES_LOGIN_HASH_WORKERS = options['workers']
+        settings.VIBES_LOGIN_MAX_PENDING = max(options['concurrency'], options['workers'])
+        encoded = make_password('secret123')
+
+        async def inline():
+            return hashing.verify('secret123', encoded)
+
+        async def pooled():
+            return await hashing.run(hashing.verify, 'secret123', encoded)
+
+        self.stdout.write(
+            f"logins: {options['logins']}, concurrency: {options['concurrency']}, "
+            f"pool threads: {options['workers']}, cpus: {os.cpu_count()}"
+        )
+        for name, check in (('inline', inline), ('pool', pooled)):
+            elapsed, latencies, stall = asyncio.run(self.measure(check, options['logins'], options['concurrency']))
+            latencies.sort()
+            self.stdout.write(
+                f"{name:7} {options['logins'] / elapsed:7.1f} logins/s   "
+                f"p50 {statistics.median(latencies):7.0f} ms   p99 {latencies[int(len(latencies) * 0.99) - 1]:7.0f} ms   "
+                f"longest loop stall {stall:6.0f} ms"
+            )
+
+    @staticmethod
+    async def measure(check, logins, concurrency):
+        gate = asyncio.Semaphore(concurrency)
+        latencies, stall, done = [], 0.0, False
+
+        async def login(arrived):
+            # latency counts from arrival, so time spent queued is included
+            async with gate:
+                assert (await check())[0]
+                latencies.append((time.perf_counter() - arrived) * 1000)
+
+        async def ticker():
+            # stands in for every other request the worker is serving
+            nonlocal stall
+            while not done:
+                started = time.perf_counter()
+                await asyncio.sleep(0.005)
+                stall = max(stall, (time.perf_counter() - started) * 1000 - 5)
+
+        tick = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(started) for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done = True
+        await tick
+        return elapsed, latencies, stall
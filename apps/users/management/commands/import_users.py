@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from apps.users import search
+from apps.users.models import Profile, UserEmail, normalize_email
+
+PROFILE_FIELDS = ('country', 'state', 'city', 'address')
+ROLES = ('admin', 'user')
+MIN_PASSWORD_LENGTH = 6      # as RegisterUserSerializer
+
+
+def read_rows(path, fmt):
+    """``(line number, dict)`` for every record of a CSV (header row) or NDJSON file."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(source, 1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+
+
+class Command(BaseCommand):
+    help = ("Create accounts in bulk from a CSV (with a header row) or NDJSON file with username, "
+            "email, password and optional first_name, last_name, role, country, state, city and "
+            "address. Passwords are hashed across a process pool; users, profiles, email lookups, "
+            "tokens and search index rows are inserted in bulk, one transaction per chunk. Rows whose "
+            "username or email is taken (in the database or earlier in the file) are skipped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'ndjson'), default=None,
+                            help="Input format (default: from the file extension).")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help="Password hashing processes.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+
+        self.verbosity = options['verbosity']
+        self.processes = options['processes']
+        self.seen_usernames, self.seen_emails = set(), set()
+        self.skipped = Counter()
+        created = read = 0
+        started = time.monotonic()
+
+        rows = read_rows(path, fmt)
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as pool:
+            while True:
+                chunk = list(islice(rows, options['chunk_size']))
+                if not chunk:
+                    break
+                read += len(chunk)
+                created += self.import_chunk(pool, [self.clean(line_no, row) for line_no, row in chunk])
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{read} rows read, {created} users created, {sum(self.skipped.values())} skipped "
+                    f"({created / elapsed:.0f} users/s)"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} of {read} users in {elapsed:.1f}s ({created / max(elapsed, 1e-9):.0f} users/s)"
+        ))
+        for reason, count in sorted(self.skipped.items()):
+            self.stdout.write(f"  skipped {count}: {reason}")
+
+    def skip(self, line_no, reason):
+        self.skipped[reason] += 1
+        if self.verbosity > 1:
+            self.stderr.write(f"line {line_no}: {reason}")
+
+    def clean(self, line_no, row):
+        """Validated row plus its normalized ``lookup`` email, or None (counted as skipped)."""
+        username = str(row.get('username') or '').strip()
+        email = str(row.get('email') or '').strip()
+        password = str(row.get('password') or '')
+
+        if not username or not email or not password:
+            return self.skip(line_no, "username, email and password are required")
+        try:
+            UnicodeUsernameValidator()(username)
+            validate_email(email)
+        except ValidationError:
+            return self.skip(line_no, "invalid username or email")
+        if len(username) > 150 or len(password) < MIN_PASSWORD_LENGTH:
+            return self.skip(line_no, f"username over 150 or password under {MIN_PASSWORD_LENGTH} characters")
+        if row.get('role') and row['role'] not in ROLES:
+            return self.skip(line_no, "unknown role")
+
+        lookup = normalize_email(email)
+        if username in self.seen_usernames or lookup in self.seen_emails:
+            return self.skip(line_no, "username or email repeated in the file")
+        self.seen_usernames.add(username)
+        self.seen_emails.add(lookup)
+        return dict(row, line_no=line_no, username=username, email=email, lookup=lookup, password=password)
+
+    def import_chunk(self, pool, rows, retry=True):
+        rows = [row for row in rows if row]
+        if not rows:
+            return 0
+
+        # set-based checks against the database, one query each
+        taken_usernames = set(User.objects.filter(username__in=[r['username'] for r in rows])
+                              .values_list('username', flat=True))
+        taken_emails = set(UserEmail.objects.filter(email__in=[r['lookup'] for r in rows])
+                           .values_list('email', flat=True))
+        fresh = []
+        for row in rows:
+            if row['username'] in taken_usernames or row['lookup'] in taken_emails:
+                self.skip(row['line_no'], "username or email already registered")
+            else:
+                fresh.append(row)
+        if not fresh:
+            return 0
+
+        chunksize = max(1, len(fresh) // (self.processes * 4))
+        hashes = list(pool.map(make_password, [row['password'] for row in fresh], chunksize=chunksize))
+
+        try:
+            return self.write(fresh, hashes)
+        except IntegrityError:
+            # a concurrent signup took a name after the checks; redo them once
+            if not retry:
+                raise
+            return self.import_chunk(pool, fresh, retry=False)
+
+    @staticmethod
+    def write(rows, hashes):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username   = row['username'],
+                    email      = row['email'],
+                    password   = password,
+                    first_name = row.get('first_name') or '',
+                    last_name  = row.get('last_name') or '',
+                )
+                for row, password in zip(rows, hashes)
+            ])
+            if any(user.pk is None for user in users):
+                # backends that do not return ids from a bulk INSERT
+                ids = dict(User.objects.filter(username__in=[u.username for u in users])
+                           .values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+
+            # bulk_create sends no signals: the UserEmail and search index rows are written here
+            profiles = Profile.objects.bulk_create([
+                Profile(user=user, role=row.get('role') or 'user',
+                        **{field: row.get(field) or '' for field in PROFILE_FIELDS})
+                for row, user in zip(rows, users)
+            ])
+            UserEmail.objects.bulk_create([UserEmail(user=user, email=row['lookup']) for row, user in zip(rows, users)])
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+            search.index_profiles(
+                [profile.pk for profile in profiles] if all(profile.pk for profile in profiles)
+                else Profile.objects.filter(user__in=users).values_list('id', flat=True)
+            )
+        return len(users)
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_current_vibe(apps, schema_editor):
+    Profile = apps.get_model('users', 'Profile')
+    Vibe = apps.get_model('vibes', 'Vibe')
+    Profile.objects.update(current_vibe_id=Subquery(
+        Vibe.objects.filter(user_id=OuterRef('user_id'), status='running').values('id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0012_vibe_one_running_per_user'),
+        ('users', '0005_remove_profile_phone_remove_profile_zip_code_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='current_vibe',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_profiles', to='vibes.vibe'),
+        ),
+        migrations.RunPython(backfill_current_vibe, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_user_emails(apps, schema_editor):
+    """One row per normalized address; the oldest account keeps a shared one."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserEmail = apps.get_model('users', 'UserEmail')
+    seen, batch = set(), []
+    for user_id, email in User.objects.order_by('id').values_list('id', 'email').iterator(chunk_size=5000):
+        email = (email or '').strip().lower()
+        if not email or email in seen:
+            continue
+        seen.add(email)
+        batch.append(UserEmail(user_id=user_id, email=email))
+        if len(batch) >= 5000:
+            UserEmail.objects.bulk_create(batch)
+            batch = []
+    UserEmail.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0006_profile_current_vibe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.CharField(max_length=254, unique=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='email_lookup', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_emails, migrations.RunPython.noop),
+    ]
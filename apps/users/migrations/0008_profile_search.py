@@ -0,0 +1,58 @@
+# Generated by Django 4.2.9 on 2026-10-18 23:40
+
+from django.db import migrations
+
+# see apps.users.search
+SQLITE_CREATE = """
+    CREATE VIRTUAL TABLE users_profile_search USING fts5(
+        username, first_name, last_name, email, city, country, tokenize = 'trigram'
+    )
+"""
+SQLITE_BACKFILL = """
+    INSERT INTO users_profile_search (rowid, username, first_name, last_name, email, city, country)
+    SELECT p.id, u.username, u.first_name, u.last_name, u.email, COALESCE(p.city, ''), COALESCE(p.country, '')
+    FROM users_profile p JOIN auth_user u ON u.id = p.user_id
+"""
+# icontains compiles to UPPER(column::text) LIKE UPPER(%s) on PostgreSQL
+TRGM_INDEXES = {
+    'users_profile_search_username':   ('auth_user', 'username'),
+    'users_profile_search_first_name': ('auth_user', 'first_name'),
+    'users_profile_search_last_name':  ('auth_user', 'last_name'),
+    'users_profile_search_email':      ('auth_user', 'email'),
+    'users_profile_search_city':       ('users_profile', 'city'),
+    'users_profile_search_country':    ('users_profile', 'country'),
+}
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_BACKFILL)
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, (table, column) in TRGM_INDEXES.items():
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS users_profile_search")
+    elif vendor == 'postgresql':
+        for name in TRGM_INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0007_user_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_profile_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_thumbnails',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -24,6 +24,8 @@ class Profile(models.Model):
     city      = models.CharField(max_length=255, null=True, blank=True)
     address   = models.CharField(max_length=255, null=True, blank=True)
     avatar    = models.ImageField(upload_to='avatar', null=True, blank=True)
+    # stored under its content hash; thumbnails made by apps.users.tasks
+    avatar_thumbnails = models.BooleanField(default=False, editable=False)
 
     # Apple login fields
     apple_id = models.CharField(max_length=255, null=True, blank=True, unique=True)
@@ -32,5 +34,45 @@ class Profile(models.Model):
     # User status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
 
+    # the user's one running vibe, kept by apps.vibes.services
+    current_vibe = models.ForeignKey('vibes.Vibe', null=True, blank=True, editable=False,
+                                     on_delete=models.SET_NULL, related_name='current_profiles')
+
+    def __str__(self):
+        return self.user.username
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+class UserEmail(models.Model):
+    """
+    Normalized (trimmed, lowercased) email of a user, unique and indexed,
+    for email logins and profile lookups; ``auth_user.email`` has no index.
+    Kept in sync with User.email by apps.users.signals.
+    """
+    user  = models.OneToOneField(User, on_delete=models.CASCADE, related_name='email_lookup')
+    email = models.CharField(max_length=254, unique=True)
+
     def __str__(self):
-        return self.user.username
\ No newline at end of file
+        return self.email
+
+    @classmethod
+    def sync(cls, user):
+        """
+        Point ``user``'s row at its current email. An address already owned
+        by another user (legacy duplicates) is left with its first owner.
+        """
+        email = normalize_email(user.email)
+        owner = cls.objects.filter(email=email).values_list('user_id', flat=True).first() if email else None
+        if not email or owner not in (None, user.pk):
+            cls.objects.filter(user_id=user.pk).delete()
+            return
+        if owner == user.pk:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.update_or_create(user_id=user.pk, defaults={'email': email})
+        except IntegrityError:
+            pass        # lost a race for the address to a concurrent save
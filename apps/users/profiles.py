@@ -0,0 +1,80 @@
+"""
+Cached profile documents.
+
+The profile dict returned by get-profile, update-profile and the batch
+get-profiles endpoint is cached per user under ``profile:doc:<user id>``
+for ``VIBES_PROFILE_CACHE_TTL`` seconds. Entries hold media URLs relative
+to the site, so one entry serves every host; ``absolute`` resolves them
+per request.
+
+apps.users.signals calls ``invalidate`` after any User or Profile save
+commits (UpdateProfileSerializer.update, upload_avatar, update_user, the
+admin, ...); apps.users.tasks does too once thumbnails are ready.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+from apps.users import avatars
+
+
+def cache_key(user_id):
+    return f"profile:doc:{user_id}"
+
+
+def build(user, profile):
+    avatar = profile.avatar.name or None
+    return {
+        "username":   user.username,
+        "email":      user.email,
+        "first_name": user.first_name,
+        "last_name":  user.last_name,
+        "country":    profile.country,
+        "city":       profile.city,
+        "state":      profile.state,
+        "address":    profile.address,
+        "avatar":     avatars.storage().url(avatar) if avatar else None,
+        "avatars":    avatars.urls(avatar, profile.avatar_thumbnails),
+        "status":     profile.status,
+    }
+
+
+def absolute(document, build_uri):
+    """A copy of ``document`` with its media URLs made absolute by ``build_uri``."""
+    document = dict(document)
+    if document["avatar"]:
+        document["avatar"] = build_uri(document["avatar"])
+        document["avatars"] = {
+            size: {fmt: build_uri(url) for fmt, url in formats.items()}
+            for size, formats in document["avatars"].items()
+        }
+    return document
+
+
+def get_many(user_ids):
+    """
+    ``{user_id: document}`` for the users of ``user_ids`` that have a
+    profile: one cache multi-get, then one query for the misses.
+    """
+    keys = {cache_key(user_id): user_id for user_id in user_ids}
+    found = {keys[key]: document for key, document in cache.get_many(list(keys)).items()}
+
+    missing = [user_id for user_id in keys.values() if user_id not in found]
+    if missing:
+        built = {
+            user.pk: build(user, user.profile)
+            for user in User.objects.select_related('profile').filter(pk__in=missing, profile__isnull=False)
+        }
+        cache.set_many({cache_key(user_id): document for user_id, document in built.items()},
+                       getattr(settings, 'VIBES_PROFILE_CACHE_TTL', 3600))
+        found.update(built)
+    return found
+
+
+def get(user_id):
+    return get_many([user_id]).get(user_id)
+
+
+def invalidate(user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,130 @@
+"""
+Search index for the user directory (views.user_list) and the Profile admin.
+
+On SQLite the searchable columns (username, names, email, city, country)
+are mirrored into the FTS5 table ``users_profile_search`` (rowid = profile
+id) with the trigram tokenizer, which answers the same case-insensitive
+substring matches as ``icontains`` from the index. apps.users.signals keeps
+it in sync; import_users, whose bulk_create sends no signals, calls
+``index_profiles`` itself. Trigrams need three characters: shorter terms
+fall back to ``icontains``.
+
+On PostgreSQL migration 0008 adds pg_trgm GIN indexes on ``UPPER(column)``,
+the expression Django's ``icontains`` compiles to, so the plain lookups are
+indexed and nothing needs syncing. Other backends keep plain ``icontains``.
+
+Directory pages are keyset-paginated on the profile id, and the total for a
+filter set is cached for ``VIBES_DIRECTORY_COUNT_TTL`` seconds, reset when
+the index changes.
+"""
+
+import hashlib
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from apps.users.models import Profile
+from apps.vibes.cache import bump_version, get_version
+
+TABLE    = 'users_profile_search'
+MIN_TERM = 3        # the trigram tokenizer cannot match shorter strings
+
+# indexed column -> Profile lookup
+COLUMNS = {
+    'username':   'user__username',
+    'first_name': 'user__first_name',
+    'last_name':  'user__last_name',
+    'email':      'user__email',
+    'city':       'city',
+    'country':    'country',
+}
+USER_FIELDS    = {'username', 'first_name', 'last_name', 'email'}
+PROFILE_FIELDS = {'city', 'country'}
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def matching(terms):
+    """
+    Q for the profiles matching every ``(column, term)`` pair of ``terms``,
+    each term a substring of that column; column None matches any of them.
+    """
+    condition, expressions = Q(), []
+    for column, term in terms:
+        if uses_fts() and len(term) >= MIN_TERM:
+            expressions.append(_phrase(term) if column is None else f"{column} : {_phrase(term)}")
+        elif column is None:
+            condition &= reduce(or_, (Q(**{f'{lookup}__icontains': term}) for lookup in COLUMNS.values()))
+        else:
+            condition &= Q(**{f'{COLUMNS[column]}__icontains': term})
+    if expressions:
+        condition &= Q(id__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s",
+                                     [' AND '.join(expressions)]))
+    return condition
+
+
+# ── Index maintenance ────────────────────────────────────────────────────────
+
+def index_profiles(profile_ids):
+    """(Re)write the index rows of ``profile_ids`` from the database."""
+    profile_ids = list(profile_ids)
+    if not profile_ids:
+        return
+    if uses_fts():
+        rows = Profile.objects.filter(id__in=profile_ids).values_list('id', *COLUMNS.values())
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(pk,) for pk in profile_ids])
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * (len(COLUMNS) + 1))})",
+                [(pk, *(value or '' for value in values)) for pk, *values in rows],
+            )
+    bump_version('directory', 0)
+
+
+def unindex_profiles(profile_ids):
+    profile_ids = list(profile_ids)
+    if uses_fts() and profile_ids:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(pk,) for pk in profile_ids])
+    bump_version('directory', 0)
+
+
+# ── Directory pages ──────────────────────────────────────────────────────────
+
+def cached_count(queryset, params):
+    """COUNT(*) of ``queryset``, cached per filter set until the index changes."""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    key = f"directory:count:{get_version('directory', 0)}:{digest}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, getattr(settings, 'VIBES_DIRECTORY_COUNT_TTL', 300))
+    return count
+
+
+def keyset_page(queryset, page_size, after=None, before=None):
+    """
+    ``(rows, has_previous, has_next)`` for the page of ``queryset`` (newest
+    profile first) after the id ``after``, or before the id ``before``.
+    """
+    if before is not None:
+        rows = list(queryset.filter(id__gt=before).order_by('id')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        return rows[:page_size][::-1], has_previous, True
+
+    if after is not None:
+        queryset = queryset.filter(id__lt=after)
+    rows = list(queryset.order_by('-id')[:page_size + 1])
+    return rows[:page_size], after is not None, len(rows) > page_size
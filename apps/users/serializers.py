@@ -1,7 +1,6 @@
 from rest_framework import serializers
-from .models import Profile
+from .models import Profile, UserEmail, normalize_email
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
 
 class RegisterUserSerializer(serializers.ModelSerializer):
     # Include profile fields
@@ -30,7 +29,7 @@ class RegisterUserSerializer(serializers.ModelSerializer):
                   'address', 'avatar', 'apple_id', 'is_apple_user']
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        if UserEmail.objects.filter(email=normalize_email(value)).exists():
             raise serializers.ValidationError("A user with this email already exists.")
         return value
 
@@ -65,32 +64,6 @@ class RegisterUserSerializer(serializers.ModelSerializer):
 
         return user
 
-class LoginSerializer(serializers.Serializer):
-    email = serializers.CharField(required=True)
-    password = serializers.CharField(required=True, write_only=True)
-    apple_id = serializers.CharField(required=False)
-
-    def validate(self, data):
-        email = data.get('email')
-        password = data.get('password')
-        apple_id = data.get('apple_id')
-
-        if apple_id:
-            try:
-                profile = Profile.objects.get(apple_id=apple_id)
-                data['user'] = profile.user
-            except Profile.DoesNotExist:
-                raise serializers.ValidationError("Invalid Apple ID.")
-        else:
-            if not email or not password:
-                raise serializers.ValidationError("Email and password are required.")
-            user = authenticate(email=email, password=password)
-            if not user:
-                raise serializers.ValidationError("Invalid credentials.")
-            data['user'] = user
-
-        return data
-
 class AppleUserSerializer(serializers.Serializer):
     apple_id = serializers.CharField(required=True)
     email = serializers.EmailField(required=False)
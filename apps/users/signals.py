@@ -0,0 +1,92 @@
+import logging
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from apps.users import avatars, profiles, search, tasks
+from apps.users.authentication import invalidate_tokens
+from apps.users.models import Profile, UserEmail
+from apps.vibes.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+
+# The directory index (apps.users.search) is only rewritten when a searchable
+# column really changed: pre_save reads the stored values it may overwrite,
+# so logins, status changes and other full saves leave the index alone.
+
+def _searchable(sender, update_fields):
+    fields = search.USER_FIELDS if sender is User else search.PROFILE_FIELDS
+    return fields if update_fields is None else fields & set(update_fields)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Profile)
+def remember_searchable(sender, instance, update_fields=None, **kwargs):
+    fields = _searchable(sender, update_fields)
+    instance._searchable_before = (
+        sender.objects.filter(pk=instance.pk).values(*fields).first()
+        if fields and not instance._state.adding else None
+    )
+
+
+def searchable_changed(instance):
+    before = instance.__dict__.pop('_searchable_before', None)
+    return before is not None and any(getattr(instance, name) != value for name, value in before.items())
+
+
+# Any write to a user or its profile changes the profile document, so bump
+# the per-user 'profile' version that its ETag is derived from.
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    bump_version('profile', instance.pk)
+    update_fields = kwargs.get('update_fields')
+    if kwargs['signal'] is post_save and (update_fields is None or 'email' in update_fields):
+        UserEmail.sync(instance)
+    # a new user has no profile to index yet
+    if kwargs['signal'] is post_save and searchable_changed(instance):
+        search.index_profiles(Profile.objects.filter(user=instance).values_list('id', flat=True))
+    # password / is_active changes reach token auth and the profile document;
+    # last_login alone does not
+    if not kwargs.get('created') and set(update_fields or ()) != {'last_login'}:
+        transaction.on_commit(lambda: invalidate_tokens(user_id=instance.pk))
+        transaction.on_commit(lambda: profiles.invalidate([instance.pk]))
+
+
+@receiver(pre_save, sender=Profile)
+def avatar_uploaded(sender, instance, **kwargs):
+    if avatars.store(instance):
+        name = instance.avatar.name
+        transaction.on_commit(lambda: enqueue_thumbnails(name))
+
+
+def enqueue_thumbnails(name):
+    try:
+        tasks.make_avatar_thumbnails.delay(name)
+    except Exception:
+        # the original keeps being served for every size
+        logger.exception("Could not queue thumbnails for %s", name)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    bump_version('profile', instance.user_id)
+    update_fields = kwargs.get('update_fields')
+    if kwargs['signal'] is post_delete:
+        search.unindex_profiles([instance.pk])
+    elif kwargs.get('created') or searchable_changed(instance):
+        search.index_profiles([instance.pk])
+    # token auth caches the profile status only
+    if update_fields is None or 'status' in update_fields:
+        transaction.on_commit(lambda: invalidate_tokens(user_id=instance.user_id))
+    transaction.on_commit(lambda: profiles.invalidate([instance.user_id]))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    key = instance.key      # the primary key, cleared by delete() before commit
+    transaction.on_commit(lambda: invalidate_tokens(key=key))
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from apps.users import avatars, profiles
+from apps.users.models import Profile
+from apps.vibes.cache import bump_version
+
+
+@shared_task(ignore_result=True)
+def make_avatar_thumbnails(name):
+    """Thumbnail the stored avatar ``name`` and mark every profile using it."""
+    avatars.make_thumbnails(name)
+    pending = Profile.objects.filter(avatar=name, avatar_thumbnails=False)
+    user_ids = list(pending.values_list('user_id', flat=True))
+    pending.update(avatar_thumbnails=True)
+    # update() sends no signals
+    for user_id in user_ids:
+        bump_version('profile', user_id)
+    profiles.invalidate(user_ids)
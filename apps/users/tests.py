@@ -1,3 +1,381 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 
 # Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from PIL import Image
+
+from apps.users import avatars, profiles, search, tasks
+from apps.users.authentication import CachedTokenAuthentication, _local
+from apps.users.models import Profile, UserEmail
+from apps.users.search import matching
+from config.media import MediaFileResponse
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        _local.clear()
+        self.user = User.objects.create_user('token', 'token@example.com', 'secret123')
+        self.profile = Profile.objects.create(user=self.user)
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_warm_path_is_query_free(self):
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        _local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.auth.authenticate_credentials(self.token.key)[0].pk, user.pk)
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_password_hash_not_cached(self):
+        payload, _ = CachedTokenAuthentication.load(self.token.key)
+        self.assertNotIn(self.user.password.encode(), payload)
+
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertTrue(user.check_password('secret123'))      # loaded on demand
+
+    def test_invalidated_by_status_and_logout(self):
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.status = 'suspended'
+            self.profile.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'suspended'):
+            self.auth.authenticate_credentials(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.status = 'active'
+            self.profile.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(reverse('user_logout')).status_code, 200)
+        with self.assertRaisesMessage(AuthenticationFailed, 'Invalid token'):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class UserEmailLookupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('mailer', 'Mailer@Example.com', 'secret123')
+        Profile.objects.create(user=self.user)
+
+    def test_lookup_follows_email(self):
+        self.assertEqual(UserEmail.objects.get(user=self.user).email, 'mailer@example.com')
+        with self.assertNumQueries(1):
+            self.assertEqual(authenticate(email=' MAILER@example.com', password='secret123'), self.user)
+        self.assertEqual(authenticate(email='mailer', password='secret123'), self.user)
+
+        self.user.email = 'new@example.com'
+        self.user.save()
+        self.assertIsNone(authenticate(email='mailer@example.com', password='secret123'))
+        self.assertEqual(authenticate(email='new@example.com', password='secret123'), self.user)
+
+        # an address another account already uses stays with its first owner
+        other = User.objects.create_user('other', 'NEW@example.com', 'secret123')
+        self.assertFalse(UserEmail.objects.filter(user=other).exists())
+        self.assertEqual(authenticate(email='new@example.com', password='secret123'), self.user)
+
+
+class AsyncLoginTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('login', 'login@example.com', 'secret123')
+        Profile.objects.create(user=self.user)
+
+    def login(self, email, password):
+        return self.client.post(reverse('user_login'), {'email': email, 'password': password},
+                                content_type='application/json')
+
+    def test_login(self):
+        response = self.login('Login@example.com', 'secret123')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(self.login('login@example.com', 'wrong').json()['errors'], 'Invalid credentials.')
+        self.assertEqual(self.login('nobody@example.com', 'secret123').status_code, 400)
+
+    def test_rehash_on_login(self):
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode('secret123', hasher.salt(), iterations=1000)
+        self.user.save(update_fields=['password'])
+
+        self.assertEqual(self.login('login', 'secret123').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(hasher.decode(self.user.password)['iterations'], hasher.iterations)
+        self.assertTrue(self.user.check_password('secret123'))
+
+    @override_settings(VIBES_LOGIN_MAX_PENDING=0)
+    def test_back_pressure(self):
+        response = self.login('login', 'secret123')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class ImportUsersTests(TestCase):
+
+    def test_import(self):
+        User.objects.create_user('taken', 'Taken@example.com', 'secret123')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write("username,email,password,city\n"
+                         "ann,Ann@example.com,secret123,Pune\n"
+                         "bob,taken@EXAMPLE.com,secret123,\n"          # email registered
+                         "cat,ann@example.com,secret123,\n"            # email earlier in the file
+                         "dan,dan@example.com,short,\n"                # password too short
+                         "eve,eve@example.com,secret456,\n")
+        self.addCleanup(os.remove, source.name)
+
+        call_command('import_users', source.name, processes=2, chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(sorted(User.objects.values_list('username', flat=True)), ['ann', 'eve', 'taken'])
+        ann = User.objects.get(username='ann')
+        self.assertEqual((ann.email, ann.profile.city, ann.email_lookup.email), ('Ann@example.com', 'Pune', 'ann@example.com'))
+        self.assertTrue(Token.objects.filter(user=ann).exists())
+        self.assertEqual(authenticate(email='ANN@example.com', password='secret123'), ann)
+        self.assertEqual(list(Profile.objects.filter(matching([('city', 'pun')]))), [ann.profile])
+
+
+class DirectorySearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name, city in [('radhika', 'Pune'), ('rahul', 'Mumbai'), ('meera', 'Punjab'), ('ravi', 'Delhi')]:
+            Profile.objects.create(user=User.objects.create_user(name, f'{name}@example.com', 'secret123'), city=city)
+        self.admin = User.objects.create_superuser('boss', 'boss@example.com', 'secret123')
+        self.client.force_login(self.admin)
+
+    def names(self, *terms):
+        return sorted(Profile.objects.filter(matching(terms)).values_list('user__username', flat=True))
+
+    def test_index_follows_writes(self):
+        self.assertEqual(self.names(('city', 'PUN')), ['meera', 'radhika'])
+        self.assertEqual(self.names(('username', 'ra')), ['meera', 'radhika', 'rahul', 'ravi'])    # short: icontains
+
+        ravi = User.objects.get(username='ravi')
+        ravi.first_name = 'Punit'
+        ravi.save()
+        self.assertEqual(self.names((None, 'pun')), ['meera', 'radhika', 'ravi'])
+        self.assertEqual(self.names((None, 'pun'), ('city', 'del')), ['ravi'])
+
+        User.objects.get(username='meera').delete()
+        self.assertEqual(self.names(('city', 'pun')), ['radhika'])
+
+    def test_reindex_only_on_searchable_change(self):
+        radhika = Profile.objects.get(user__username='radhika')
+        with mock.patch.object(search, 'index_profiles') as index_profiles:
+            radhika.status = 'logged_out'
+            radhika.save(update_fields=['status'])
+            for _ in range(2):      # the first login reactivates, the second writes nothing
+                response = self.client.post(reverse('user_login'), {'email': 'radhika', 'password': 'secret123'},
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+            radhika.refresh_from_db()
+            self.assertEqual(radhika.status, 'active')
+
+            radhika.address = 'MG Road'
+            radhika.save()
+            radhika.user.last_name = radhika.user.last_name
+            radhika.user.save()
+            index_profiles.assert_not_called()
+
+            radhika.city = 'Goa'
+            radhika.save()
+            index_profiles.assert_called_once_with([radhika.pk])
+
+    def test_directory_pages(self):
+        response = self.client.get(reverse('user_list'), {'search': 'pun'})
+        self.assertEqual([p.user.username for p in response.context['users']], ['meera', 'radhika'])
+        self.assertEqual(response.context['total'], 2)
+        self.assertIsNone(response.context['next_url'])
+
+        for name in ('amit', 'anil', 'arun'):
+            Profile.objects.create(user=User.objects.create_user(name, f'{name}@example.com', 'secret123'))
+        response = self.client.get(reverse('user_list'))
+        self.assertEqual(response.context['total'], 7)
+        self.assertEqual(len(response.context['users']), 5)
+        second = self.client.get(reverse('user_list') + response.context['next_url'])
+        self.assertEqual([p.user.username for p in second.context['users']], ['rahul', 'radhika'])
+        first = self.client.get(reverse('user_list') + second.context['previous_url'])
+        self.assertEqual(list(first.context['users']), list(response.context['users']))
+        self.assertIsNone(first.context['previous_url'])
+
+
+class AvatarPipelineTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), 'teal').save(buffer, 'PNG')
+        self.image = buffer.getvalue()
+
+    def upload(self, name):
+        user = User.objects.create_user(name, f'{name}@example.com', 'secret123')
+        Profile.objects.create(user=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse('update_profile'), {
+            'username': name, 'avatar': SimpleUploadedFile('me.png', self.image, 'image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['data']
+
+    def test_hashed_original_and_thumbnails(self):
+        data = self.upload('ann')
+        profile = Profile.objects.get(user__username='ann')
+        self.assertRegex(profile.avatar.name, r'^avatar/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertFalse(profile.avatar_thumbnails)
+        self.assertEqual(data['avatars']['small']['webp'], data['avatar'])    # original until thumbnailed
+
+        tasks.make_avatar_thumbnails(profile.avatar.name)
+        profile.refresh_from_db()
+        self.assertTrue(profile.avatar_thumbnails)
+        with avatars.storage().open(avatars.thumbnail_name(profile.avatar.name, 'small', 'webp')) as thumb:
+            self.assertEqual(Image.open(thumb).size, (64, 64))
+
+        # the same image from another account reuses the file and its thumbnails
+        data = self.upload('bob')
+        bob = Profile.objects.get(user__username='bob')
+        self.assertEqual(bob.avatar.name, profile.avatar.name)
+        self.assertTrue(bob.avatar_thumbnails)
+        self.assertTrue(data['avatars']['large']['jpeg'].endswith('_512.jpeg'))
+
+
+class MediaServingTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        self.name = f"avatar/ab/{'ab' * 32}.png"
+        os.makedirs(os.path.join(media, 'avatar', 'ab'))
+        with open(os.path.join(media, self.name), 'wb') as target:
+            target.write(bytes(range(256)) * 4)
+        with open(os.path.join(media, 'report.csv'), 'w') as target:
+            target.write("a,b\n")
+
+    def test_ranges_and_caching(self):
+        url = f'/media/{self.name}'
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response['Content-Length']), (200, '1024'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/1024'))
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        response = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=2000-').status_code, 416)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-0', HTTP_IF_RANGE='"stale"').status_code, 200)
+
+        self.assertEqual(self.client.get('/media/../config/settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/report.csv').status_code, 302)     # login required
+
+    async def test_asgi_reads_blocks(self):
+        # a sync file body would be read whole by Django 4.2's ASGI handler
+        block = MediaFileResponse.block_size
+        with open(os.path.join(settings.MEDIA_ROOT, 'avatar', 'big.bin'), 'wb') as target:
+            target.write(b'x' * (2 * block + 5))
+
+        response = await self.async_client.get('/media/avatar/big.bin')
+        self.assertTrue(response.is_async)
+        self.assertEqual([len(chunk) async for chunk in response.streaming_content], [block, block, 5])
+
+        response = await self.async_client.get('/media/avatar/big.bin', headers={'Range': f'bytes={block - 1}-{block}'})
+        self.assertEqual((response.status_code, response['Content-Length']), (206, '2'))
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'xx')
+
+    @override_settings(VIBES_MEDIA_ACCEL_REDIRECT=True)
+    def test_accel_redirect(self):
+        response = self.client.get(f'/media/{self.name}', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/internal/media/{self.name}')
+        self.assertEqual(response.content, b'')
+
+
+class ProfileDocumentTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name in ('ann', 'bob', 'cat'):
+            Profile.objects.create(user=User.objects.create_user(name, f'{name}@example.com', 'secret123'), city='Pune')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username='ann'))
+
+    def test_single_and_batch(self):
+        response = self.client.post(reverse('get_profile'), {'email': 'BOB@example.com'}, format='json')
+        self.assertEqual(response.data['data']['city'], 'Pune')
+        with self.assertNumQueries(1):      # the email lookup; the document is cached
+            response = self.client.post(reverse('get_profile'), {'email': 'bob@example.com'}, format='json')
+        self.assertEqual(response.data['data']['username'], 'bob')
+
+        with self.assertNumQueries(2):      # resolve names, build the two cache misses
+            response = self.client.post(reverse('get_profiles'), {
+                'usernames': ['ann', 'nobody'], 'emails': ['Cat@example.com', 'bob@example.com'],
+            }, format='json')
+        self.assertEqual([p['username'] for p in response.data['data']['profiles']], ['ann', 'cat', 'bob'])
+        self.assertEqual(response.data['data']['not_found'], ['nobody'])
+        with self.assertNumQueries(1):
+            self.client.post(reverse('get_profiles'), {'usernames': ['ann', 'bob', 'cat']}, format='json')
+
+    def test_invalidated_on_update(self):
+        self.client.post(reverse('get_profile'), {'email': 'ann@example.com'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('update_profile'), {'username': 'ann', 'city': 'Goa'}, format='json')
+        response = self.client.post(reverse('get_profile'), {'email': 'ann@example.com'}, format='json')
+        self.assertEqual(response.data['data']['city'], 'Goa')
+
+        profile = Profile.objects.get(user__username='bob')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.country = 'India'
+            profile.save()      # e.g. the admin
+        response = self.client.post(reverse('get_profiles'), {'usernames': ['bob']}, format='json')
+        self.assertEqual(response.data['data']['profiles'][0]['country'], 'India')
+
+    def test_conditional_get(self):
+        def fetch(etag=None):
+            headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+            return self.client.post(reverse('get_profile'), {'email': 'bob@example.com'}, format='json', **headers)
+
+        etag = fetch()['ETag']
+        with self.assertNumQueries(1), mock.patch.object(profiles, 'get', side_effect=AssertionError):
+            response = fetch(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        profile = Profile.objects.get(user__username='bob')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.city = 'Goa'
+            profile.save()
+        response = fetch(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['data']['city'], 'Goa')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(username='bob').get().save()
+        self.assertNotEqual(fetch(etag)['ETag'], etag)
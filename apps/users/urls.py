@@ -32,10 +32,11 @@ urlpatterns = [
     path('user-change-password/<int:id>/', views.user_change_password, name="user_change_password"),
 
     path('api/v1/signup/', views.RegisterUserView.as_view(), name='user_register'),
-    path('api/v1/login/', views.LoginUserView.as_view(), name='user_login'),
+    path('api/v1/login/', views.login_user, name='user_login'),
     path('api/v1/logout/', views.LogoutUserView.as_view(), name='user_logout'),
     path('api/v1/update-profile/', views.UpdateProfileView.as_view(), name='update_profile'),
     path('api/v1/apple-auth/', views.AppleRegisterOrLoginView.as_view(), name='apple_auth'),
     path("api/v1/get-profile/", views.GetProfileView.as_view(), name="get_profile"),
+    path("api/v1/get-profiles/", views.GetProfilesView.as_view(), name="get_profiles"),
 
 ]
\ No newline at end of file
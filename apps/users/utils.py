@@ -1,3 +1,8 @@
+from django.db.models import Q
+
+from apps.users.search import COLUMNS, matching
+
+
 def user_filter(request):
     filter_string = {}
     filter_mappings = {
@@ -11,29 +16,15 @@ def user_filter(request):
 
 
 def profile_user_filter(request):
-    filter_string = {}
-
+    """Q for the directory filters in ``request.GET``, matched through apps.users.search."""
     search = request.GET.get('search')
     if search:
         # Broad search across multiple fields
-        return {
-            'user__username__icontains': search,
-        }
+        return matching([(None, search)])
 
     # Specific filters
-    filter_mappings = {
-        'username': 'user__username__icontains',
-        'first_name': 'user__first_name__icontains',
-        'last_name': 'user__last_name__icontains',
-        'email': 'user__email__icontains',
-        'role': 'role',
-        'city': 'city__icontains',
-        'country': 'country__icontains',
-    }
-
-    for key, lookup in filter_mappings.items():
-        value = request.GET.get(key)
-        if value:
-            filter_string[lookup] = value
-
-    return filter_string
+    terms = [(column, request.GET[column]) for column in COLUMNS if request.GET.get(column)]
+    condition = matching(terms)
+    if request.GET.get('role'):
+        condition &= Q(role=request.GET['role'])
+    return condition
@@ -1,9 +1,11 @@
-from django.http import HttpResponse
-from django.contrib.auth import authenticate
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.views import LoginView, PasswordResetView, PasswordChangeView, PasswordResetConfirmView
 from django.views.generic import CreateView
-from apps.users.models import Profile
+from apps.users.models import Profile, UserEmail, normalize_email
 from apps.users.forms import SigninForm, SignupForm, UserPasswordChangeForm, UserSetPasswordForm, UserPasswordResetForm, ProfileForm
 from django.contrib.auth import logout
 from django.urls import reverse
@@ -11,18 +13,24 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import check_password
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.utils.http import urlencode
 from apps.users.utils import user_filter, profile_user_filter
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .serializers import RegisterUserSerializer, LoginSerializer, UpdateProfileSerializer, AppleUserSerializer
+from .serializers import RegisterUserSerializer, UpdateProfileSerializer, AppleUserSerializer
 from rest_framework import generics, status
 from rest_framework.authtoken.models import Token
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.conf import settings
 from django.db import IntegrityError
+from django.db.models import Q
 from rest_framework.exceptions import ValidationError
 from rest_framework.authentication import TokenAuthentication
+from apps.vibes.cache import etag_matches, get_version, make_etag
+from . import hashing, profiles, search
+from .backends import find_user
+from .idempotency import idempotent
 
 # Create your views here.
 
@@ -94,13 +102,24 @@ def change_password(request):
 
 def user_list(request):
     filters = profile_user_filter(request)
+    params = {key: value for key, value in request.GET.items()
+              if value and key not in ('after', 'before', 'page')}
 
-    profile_list = Profile.objects.select_related('user').filter(**filters)
+    profile_list = Profile.objects.select_related('user').filter(filters)
     form = SignupForm()
 
-    page = request.GET.get('page', 1)
-    paginator = Paginator(profile_list, 5)
-    profiles = paginator.page(page)
+    # keyset pages on the profile id: no OFFSET, and the total is cached
+    try:
+        after = int(request.GET['after']) if request.GET.get('after') else None
+        before = int(request.GET['before']) if request.GET.get('before') else None
+    except ValueError:
+        after = before = None
+    page, has_previous, has_next = search.keyset_page(profile_list, 5, after=after, before=before)
+    previous_url = next_url = None
+    if page and has_previous:
+        previous_url = '?' + urlencode({**params, 'before': page[0].id})
+    if page and has_next:
+        next_url = '?' + urlencode({**params, 'after': page[-1].id})
 
     if request.method == 'POST':
         print(request.POST)
@@ -111,7 +130,10 @@ def user_list(request):
             print("Form errors:", form.errors)
 
     context = {
-        'users': profiles,
+        'users': page,
+        'total': search.cached_count(profile_list, params),
+        'previous_url': previous_url,
+        'next_url': next_url,
         'form': form,
     }
     return render(request, 'apps/users.html', context)
@@ -195,6 +217,7 @@ class RegisterUserView(generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = RegisterUserSerializer
 
+    @idempotent('signup')
     def post(self, request, *args, **kwargs):
         try:
             serializer = self.get_serializer(data=request.data)
@@ -260,7 +283,49 @@ class RegisterUserView(generics.CreateAPIView):
 #     "email": "radhika@gmail.com"
 # }
 
-class LoginUserView(APIView):
+def login_result(user):
+    """``(status_code, payload)`` for a user whose credentials checked out."""
+    # ------------------ profile checks ------------------
+    profile: Profile = user.profile
+    if profile.status == "suspended":
+        return 403, {
+            "status": False,
+            "message": "Account Suspended",
+            "errors": "This account is suspended."
+        }
+
+    if profile.status == "deleted":
+        return 403, {
+            "status": False,
+            "message": "Account Deleted",
+            "errors": "This account has been deleted."
+        }
+
+    # Activate user on login
+    if profile.status != "active":
+        profile.status = "active"
+        profile.save(update_fields=['status'])
+
+    # ------------------ success ------------------
+    token, _ = Token.objects.get_or_create(user=user)
+    return 200, {
+        "status": True,
+        "message": "Login successful",
+        "token": token.key,
+        "data": {
+            "username": user.username,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+        },
+    }
+
+
+def login_failed(message, errors, code=400):
+    return JsonResponse({"status": False, "message": message, "errors": errors}, status=code)
+
+
+async def login_user(request):
     """
     Returns uniform JSON:
     {
@@ -269,92 +334,60 @@ class LoginUserView(APIView):
         "token": "abc",      # on success
         "errors": "..."      # on error
     }
-    """
-    permission_classes = [AllowAny]
-    def post(self, request):
-        try:
-            # ------------------ validate input ------------------
-            serializer = LoginSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            
 
-            # Serializer may already attach user (see earlier example),
-            # otherwise authenticate manually:
-            user = serializer.validated_data.get("user") or authenticate(
-                email=serializer.validated_data.get("email"),
-                password=serializer.validated_data.get("password")
-            )
+    Async so the PBKDF2 check runs on the bounded hashing pool
+    (apps.users.hashing) instead of holding the worker; 503 with
+    Retry-After when that pool is full. Hashes stored with outdated
+    hasher settings are upgraded on a successful login.
+    """
+    if request.method != 'POST':
+        return login_failed("Method Not Allowed", "Use POST.", 405)
 
-            if not user:
-                return Response({
-                    "status": False,
-                    "message": "Invalid credentials",
-                    "errors": "Incorrect email or password."
-                }, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        # ------------------ validate input ------------------
+        if request.content_type == 'application/json':
+            data = json.loads(request.body or b'{}')
+        else:
+            data = request.POST
+        if not hasattr(data, 'get'):
+            raise ValueError
+        email, password, apple_id = data.get('email'), data.get('password'), data.get('apple_id')
+
+        if apple_id:
+            profile = await Profile.objects.select_related('user').filter(apple_id=apple_id).afirst()
+            if profile is None:
+                return login_failed("Validation Error", "Invalid Apple ID.")
+            user = profile.user
+        else:
+            if not email or not password:
+                return login_failed("Validation Error", "Email and password are required.")
+            user = await sync_to_async(find_user)(str(email))
+            if user is not None and not user.is_active:
+                user = None
+            if not await hashing.check_password(user, str(password)):
+                return login_failed("Validation Error", "Invalid credentials.")
 
-            # ------------------ profile checks ------------------
-            profile: Profile = user.profile
-            if profile.status == "suspended":
-                return Response({
-                    "status": False,
-                    "message": "Account Suspended",
-                    "errors": "This account is suspended."
-                }, status=403)
+        code, payload = await sync_to_async(login_result)(user)
+        return JsonResponse(payload, status=code)
 
-            if profile.status == "deleted":
-                return Response({
-                    "status": False,
-                    "message": "Account Deleted",
-                    "errors": "This account has been deleted."
-                }, status=403)
+    except ValueError:
+        return login_failed("Validation Error", "Request body must be a JSON object.")
 
-            # Activate user on login
-            profile.status = "active"
-            profile.save()
+    except hashing.PoolBusy:
+        response = login_failed("Server Busy", "Too many logins in progress, retry shortly.", 503)
+        response['Retry-After'] = '1'
+        return response
 
-            # ------------------ success ------------------
-            token, _ = Token.objects.get_or_create(user=user)
-            return Response({
-                "status": True,
-                "message": "Login successful",
-                "token": token.key,
-                "data": {
-                    "username": user.username,
-                    "email": user.email,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                },
-            }, status=status.HTTP_200_OK)
-
-        # ------------------ validation errors ------------------
-        except ValidationError as e:
-            flat = {
-                field: " ".join(msgs) if isinstance(msgs, (list, tuple)) else str(msgs)
-                for field, msgs in e.detail.items()
-            }
-            # Merge messages into readable sentence
-            combined = " ".join(dict.fromkeys(flat.values()))
-            return Response({
-                "status": False,
-                "message": "Validation Error",
-                "errors": combined
-            }, status=status.HTTP_400_BAD_REQUEST)
+    # ------------------ other DB / logic errors -------------
+    except IntegrityError as e:
+        return login_failed("Database Error", str(e))
 
-        # ------------------ other DB / logic errors -------------
-        except IntegrityError as e:
-            return Response({
-                "status": False,
-                "message": "Database Error",
-                "errors": str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
+    # ------------------ fallback ----------------------------
+    except Exception as e:
+        return login_failed("Unexpected Error", str(e), 500)
 
-        # ------------------ fallback ----------------------------
-        except Exception as e:
-            return Response({
-                "status": False,
-                "message": "Unexpected Error",
-                "errors": str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+# token clients post without a CSRF token; DRF views are exempt the same way
+login_user.csrf_exempt = True
 
 
 # {
@@ -366,6 +399,7 @@ class LoginUserView(APIView):
 class AppleRegisterOrLoginView(APIView):
     permission_classes = [AllowAny]
 
+    @idempotent('apple_auth')
     def post(self, request):
         try:
             serializer = AppleUserSerializer(data=request.data)
@@ -454,7 +488,7 @@ class LogoutUserView(APIView):
             try:
                 profile = user.profile
                 profile.status = 'logged_out'
-                profile.save()
+                profile.save(update_fields=['status'])
             except ObjectDoesNotExist:
                 pass  # Optional: log missing profile
 
@@ -487,9 +521,10 @@ class UpdateProfileView(APIView):
 
             # ── locate user ─────────────────────────────────────
             try:
-                user = (User.objects.get(username=identifier)
+                users = User.objects.select_related('profile')
+                user = (users.get(username=identifier)
                         if 'username' in request.data
-                        else User.objects.get(email=identifier))
+                        else users.get(email_lookup__email=normalize_email(identifier)))
             except User.DoesNotExist:
                 return Response({
                     "status": False,
@@ -514,26 +549,10 @@ class UpdateProfileView(APIView):
             # ── perform update ─────────────────────────────────
             serializer.update(user, profile, serializer.validated_data)
 
-            avatar_url = (
-                request.build_absolute_uri(profile.avatar.url)
-                if profile.avatar and hasattr(profile.avatar, "url") else None
-            )
-
             return Response({
                 "status": True,
                 "message": "Profile updated successfully.",
-                "data": {
-                    "username":   user.username,
-                    "email":      user.email,
-                    "first_name": user.first_name,
-                    "last_name":  user.last_name,
-                    "country":    profile.country,
-                    "city":       profile.city,
-                    "state":      profile.state,
-                    "address":    profile.address,
-                    "avatar":     avatar_url,
-                    "status":     profile.status,
-                }
+                "data": profiles.absolute(profiles.build(user, profile), request.build_absolute_uri)
             }, status=status.HTTP_200_OK)
 
         # ── validation errors ─────────────────────────────────
@@ -577,42 +596,86 @@ class GetProfileView(APIView):
                 "errors": "Email is required."
             }, status=400)
 
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user_id = (UserEmail.objects.filter(email=normalize_email(email))
+                   .values_list('user_id', flat=True).first())
+        if user_id is None:
             return Response({
                 "status": False,
                 "message": "User not found",
                 "errors": f"No user with email '{email}'."
             }, status=404)
 
-        try:
-            profile = user.profile
-        except Profile.DoesNotExist:
+        # conditional request: the document only changes when the user or
+        # profile is saved, which bumps this version (see signals.py).
+        # The host is part of it because the avatar URL is absolute.
+        etag = make_etag('profile', user_id, get_version('profile', user_id), request.get_host())
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        document = profiles.get(user_id)
+        if document is None:
             return Response({
                 "status": False,
                 "message": "Profile not found",
                 "errors": f"No profile for {email}."
             }, status=404)
 
-        avatar_url = (
-            request.build_absolute_uri(profile.avatar.url)
-            if profile.avatar and hasattr(profile.avatar, "url") else None
-        )
-
         return Response({
             "status": True,
             "message": "Profile fetched successfully",
+            "data": profiles.absolute(document, request.build_absolute_uri)
+        }, status=200, headers={'ETag': etag})
+
+
+class GetProfilesView(APIView):
+    """
+    Many profile documents in one call: ``usernames`` and/or ``emails``
+    (at most ``VIBES_PROFILE_BATCH_MAX`` in all), resolved with one
+    indexed query and read with one cache multi-get.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        usernames = request.data.get("usernames") or []
+        emails = request.data.get("emails") or []
+        limit = getattr(settings, 'VIBES_PROFILE_BATCH_MAX', 100)
+        if not isinstance(usernames, list) or not isinstance(emails, list) or not (usernames or emails):
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "Send 'usernames' and/or 'emails' as lists."
+            }, status=400)
+        if len(usernames) + len(emails) > limit:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"At most {limit} profiles per request."
+            }, status=400)
+
+        usernames = [str(username) for username in usernames]
+        emails = {normalize_email(str(email)): email for email in emails}
+        rows = User.objects.filter(
+            Q(username__in=usernames) | Q(email_lookup__email__in=list(emails))
+        ).values_list('id', 'username', 'email_lookup__email')
+        by_username = {username: pk for pk, username, _ in rows}
+        by_email = {email: pk for pk, _, email in rows if email}
+
+        wanted = [(username, by_username.get(username)) for username in usernames]
+        wanted += [(email, by_email.get(normalized)) for normalized, email in emails.items()]
+        documents = profiles.get_many({pk for _, pk in wanted if pk is not None})
+
+        found, not_found = [], []
+        for identifier, pk in wanted:
+            if pk in documents:
+                found.append(profiles.absolute(documents[pk], request.build_absolute_uri))
+            else:
+                not_found.append(identifier)
+
+        return Response({
+            "status": True,
+            "message": "Profiles fetched successfully",
             "data": {
-                "username":   user.username,
-                "email":      user.email,
-                "first_name": user.first_name,
-                "last_name":  user.last_name,
-                "country":    profile.country,
-                "city":       profile.city,
-                "state":      profile.state,
-                "address":    profile.address,
-                "avatar":     avatar_url,
-                "status":     profile.status,
+                "profiles":  found,
+                "not_found": not_found,
             }
         }, status=200)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Vibe
+from .models import Vibe, VibeArchiveSegment, VibeRollup
 
 
 @admin.register(Vibe)
@@ -29,7 +29,7 @@ class VibeAdmin(admin.ModelAdmin):
     )
     ordering = ("-created_at",)
 
-    readonly_fields = ("created_at", "start_time", "end_time")
+    readonly_fields = ("created_at", "start_time", "end_time", "city")
 
     fieldsets = (
         ("Vibe Details", {
@@ -44,6 +44,7 @@ class VibeAdmin(admin.ModelAdmin):
             "fields": (
                 ("latitude", "longitude"),
                 "address",
+                "city",
             )
         }),
         ("Timer", {
@@ -63,3 +64,68 @@ class VibeAdmin(admin.ModelAdmin):
 
     # for performance – avoids  N + 1 queries in admin list view
     list_select_related = ("user",)
+
+
+@admin.register(VibeRollup)
+class VibeRollupAdmin(admin.ModelAdmin):
+    """Read-only: rows are rewritten by the rollup_vibes command."""
+    list_display = (
+        "bucket_start",
+        "grain",
+        "city",
+        "mood_bucket",
+        "status",
+        "vibes",
+        "avg_mood_slider",
+        "avg_timer_seconds",
+    )
+    list_filter = (
+        "grain",
+        "mood_bucket",
+        "status",
+        ("bucket_start", admin.DateFieldListFilter),
+    )
+    search_fields = (
+        "city",
+    )
+    date_hierarchy = "bucket_start"
+    ordering = ("-bucket_start", "city", "mood_bucket", "status")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VibeArchiveSegment)
+class VibeArchiveSegmentAdmin(admin.ModelAdmin):
+    """Archive manifest; payloads are written by the archive_vibes command only."""
+    list_display = (
+        "id",
+        "user",
+        "month",
+        "rows",
+        "first_created_at",
+        "last_created_at",
+        "raw_bytes",
+        "created_at",
+    )
+    list_filter = (
+        ("month", admin.DateFieldListFilter),
+    )
+    search_fields = (
+        "user__username",
+    )
+    ordering = ("-month", "user")
+    exclude = ("payload",)
+    list_select_related = ("user",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
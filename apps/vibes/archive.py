@@ -0,0 +1,180 @@
+"""
+Archival of ended vibes into compressed, append-only monthly segments.
+
+Vibes created before the archive cutoff (``VIBES_ARCHIVE_RETAIN_DAYS``
+plus a day, since timers stay under 24 h) leave the hot ``Vibe`` table in
+batches. Each batch writes one VibeArchiveSegment per (user, created_at
+month): the full rows as gzip NDJSON in (created_at, id) order, next to
+the manifest columns (month, row count, created_at range, sizes). The
+segment insert and the row delete share a transaction.
+
+Rollups are refreshed before rows leave and the cutoff is recorded as the
+archive horizon (VibeRollupWatermark ``vibe_archive``) so later rollup
+runs keep the counts of archived hours.
+
+``archived_rows`` reads segments back for VibeHistoryView; only segments
+overlapping the requested key range are decompressed. Exports
+(apps.vibes.export) merge them back in by user and id.
+"""
+
+import datetime
+import gzip
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone as tz
+from django.utils.dateparse import parse_datetime
+
+from . import services
+from .export import _plain
+from .models import Vibe, VibeArchiveSegment, VibeRollupWatermark
+from .rollups import ARCHIVE_WATERMARK as WATERMARK, refresh_rollups
+
+# generous bound on the gap between a vibe's start_time and its insert
+INSERT_SLACK = datetime.timedelta(hours=1)
+
+# every concrete column, so a segment holds the whole row
+ROW_FIELDS = tuple(field.attname for field in Vibe._meta.concrete_fields)
+
+_DECODERS = {
+    field.attname: Decimal if isinstance(field, models.DecimalField) else parse_datetime
+    for field in Vibe._meta.concrete_fields
+    if isinstance(field, (models.DecimalField, models.DateTimeField))
+}
+
+
+def archive_cutoff(now=None):
+    """Start of the UTC day before which every vibe ended ``retention`` days ago."""
+    retention = getattr(settings, 'VIBES_ARCHIVE_RETAIN_DAYS', 180)
+    moment = (now or tz.now()) - datetime.timedelta(days=retention + 1)
+    return moment.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def encode_rows(rows):
+    encoder = json.JSONEncoder(separators=(',', ':'), default=_plain)
+    return ''.join(encoder.encode(row) + '\n' for row in rows).encode()
+
+
+def decode_segment(payload):
+    rows = []
+    for line in gzip.decompress(payload).splitlines():
+        row = json.loads(line)
+        for name, decode in _DECODERS.items():
+            if row.get(name) is not None:
+                row[name] = decode(row[name])
+        rows.append(row)
+    return rows
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` ended vibes created before ``cutoff``; return the count."""
+    with transaction.atomic():
+        rows = list(
+            Vibe.objects
+            .filter(created_at__lt=cutoff)
+            .exclude(status='running')                 # left for the expiry sweeper
+            .select_for_update(skip_locked=True)
+            .order_by('user_id', 'created_at', 'id')
+            .values(*ROW_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        groups = defaultdict(list)
+        for row in rows:
+            month = row['created_at'].astimezone(datetime.timezone.utc).date().replace(day=1)
+            groups[(row['user_id'], month)].append(row)
+
+        segments = []
+        for (user_id, month), group in groups.items():
+            raw = encode_rows(group)
+            segments.append(VibeArchiveSegment(
+                user_id          = user_id,
+                month            = month,
+                rows             = len(group),
+                first_created_at = group[0]['created_at'],
+                last_created_at  = group[-1]['created_at'],
+                min_vibe_id      = min(row['id'] for row in group),
+                raw_bytes        = len(raw),
+                payload          = gzip.compress(raw),
+            ))
+        VibeArchiveSegment.objects.bulk_create(segments)
+        Vibe.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        services.vibes_changed({row['user_id'] for row in rows})
+    return len(rows)
+
+
+def archive_vibes(now=None, batch_size=None, max_batches=None):
+    """
+    Archive every vibe older than the cutoff at ``now``. Returns the number
+    of rows moved; stops early after ``max_batches`` batches when given.
+    """
+    now = now or tz.now()
+    cutoff = archive_cutoff(now)
+    batch_size = batch_size or getattr(settings, 'VIBES_ARCHIVE_BATCH_SIZE', 2000)
+
+    refresh_rollups(now)
+    with transaction.atomic():
+        horizon, created = VibeRollupWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK, defaults={'value': cutoff},
+        )
+        if not created and horizon.value < cutoff:
+            horizon.value = cutoff
+            horizon.save(update_fields=['value'])
+
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+    return total
+
+
+def archived_rows(user_id, before=None, after=None, limit=20, match=None, start_after=None, end_before=None):
+    """
+    Up to ``limit`` archived vibes of ``user_id``, newest first, with a
+    ``(created_at, id)`` key strictly between ``after`` and ``before``
+    (either may be None) and, when given, passing ``match(row)``.
+
+    ``start_after`` / ``end_before`` only narrow the segments read (the
+    history filters on start_time / end_time); ``match`` still decides.
+    """
+    segments = VibeArchiveSegment.objects.filter(user_id=user_id)
+    if before is not None:
+        segments = segments.filter(first_created_at__lte=before[0])
+    if after is not None:
+        segments = segments.filter(last_created_at__gte=after[0])
+    if start_after is not None:
+        # start_time is set before the row is inserted, so created_at >= start_time
+        segments = segments.filter(last_created_at__gte=start_after)
+    if end_before is not None:
+        # end_time >= start_time, which trails created_at by the insert's latency
+        segments = segments.filter(first_created_at__lte=end_before + INSERT_SLACK)
+
+    found = []
+    for segment_id, last_created_at in segments.order_by('-last_created_at').values_list('id', 'last_created_at'):
+        # older segments cannot beat a full page of newer rows
+        if len(found) >= limit and found[limit - 1]['created_at'] > last_created_at:
+            break
+        payload = VibeArchiveSegment.objects.values_list('payload', flat=True).get(id=segment_id)
+        taken = 0
+        for row in reversed(decode_segment(bytes(payload))):      # stored oldest first
+            key = (row['created_at'], row['id'])
+            if before is not None and key >= before:
+                continue
+            if after is not None and key <= after:
+                break
+            if match is None or match(row):
+                found.append(row)
+                taken += 1
+                if taken == limit:
+                    break       # the rest of this segment is older
+        found.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        del found[limit:]
+    return found
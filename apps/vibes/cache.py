@@ -0,0 +1,122 @@
+"""
+Per-user read cache for the vibes endpoints.
+
+Entries are namespaced by a per-user version counter: writes bump the
+counter instead of deleting keys, so every cached variant of a user's
+responses (any filter set, any page) goes stale at once and simply ages
+out. Works with any Django cache backend that supports ``incr``.
+
+Each entry also carries an ETag so conditional GETs can be answered with
+a 304 straight from the cache, without touching the body.
+"""
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone as tz
+from django.utils.http import parse_etags, quote_etag
+
+# query params that change the history response, in key order
+HISTORY_PARAMS = ('status', 'is_active', 'mood_bucket', 'start_after', 'end_before', 'cursor', 'page_size')
+
+
+def _version_key(namespace, owner_id):
+    return f"{namespace}:ver:{owner_id}"
+
+
+def get_version(namespace, owner_id):
+    """
+    Current version for ``owner_id``. A missing counter (first use or
+    eviction) is seeded from the clock so it can never repeat an old one.
+    """
+    key = _version_key(namespace, owner_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key, time.time_ns())
+    return version
+
+
+def bump_version(namespace, owner_id):
+    key = _version_key(namespace, owner_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def invalidate_user(user_id):
+    """Drop every cached vibes response of ``user_id``."""
+    bump_version('vibes', user_id)
+
+
+def normalize_params(query_params, names):
+    return tuple((name, query_params.get(name, '')) for name in names)
+
+
+def response_key(user_id, view_name, params=()):
+    digest = hashlib.md5(json.dumps(params).encode()).hexdigest() if params else '-'
+    return f"vibes:{view_name}:{user_id}:{get_version('vibes', user_id)}:{digest}"
+
+
+def valid_until(rows, now=None):
+    """
+    Earliest end_time of a running vibe in ``rows``: the moment its status
+    flips to expired on read and the cached representation goes stale.
+    """
+    now = now or tz.now()
+    until = None
+    for row in rows:
+        if isinstance(row, dict):
+            row_status, end_time = row['status'], row['end_time']
+        else:
+            row_status, end_time = row.status, row.end_time
+        if row_status == 'running' and end_time > now and (until is None or end_time < until):
+            until = end_time
+    return until
+
+
+def ttl_for(rows, now=None):
+    """Default TTL, shortened so no cached running vibe outlives its timer."""
+    ttl = getattr(settings, 'VIBES_CACHE_TTL', 300)
+    now = now or tz.now()
+    until = valid_until(rows, now)
+    if until is not None:
+        ttl = min(ttl, (until - now).total_seconds())
+    return max(1, int(ttl))
+
+
+def make_etag(*parts):
+    """Quoted strong ETag over cheap validator parts (never the body)."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(header)]
+    return '*' in etags or etag in etags
+
+
+def cached_entry(key, build):
+    """
+    ``(status_code, payload, etag)`` for ``key``, calling ``build()`` ->
+    ``(status_code, payload, rows)`` on a miss. The ETag is derived from
+    the key (user version + params) and the payload's valid-until time, so
+    a rebuilt but unchanged response keeps the same ETag.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        code, payload, rows = build()
+        until = valid_until(rows)
+        entry = (code, payload, make_etag(key, until.isoformat() if until else ''))
+        cache.set(key, entry, ttl_for(rows))
+    return entry
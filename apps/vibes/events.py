@@ -0,0 +1,210 @@
+"""
+Vibe event pub/sub used by the Server-Sent Events stream.
+
+Channels are plain strings: ``user:<id>`` for a user's own vibes and
+``cell:<geohash_5>`` for running vibes in a ~5 km geohash cell. Subscribers are
+asyncio queues living on the ASGI event loop; publishers may be any thread
+(sync views, management commands). In-process listeners (see
+``add_listener``) see every event regardless of channel, e.g. the
+matching index in apps.vibes.matching.
+
+An event is published once to a set of channels and reaches each
+subscriber at most once, even when it listens on several of them.
+
+Without ``VIBES_EVENTS_REDIS_URL`` events only reach subscribers of the
+same process. With it, every publish goes to one Redis channel and each
+process runs one subscriber thread that fans messages out to its local
+subscribers and listeners, so a write served by any worker reaches streams held by
+every other one.
+
+Browsers' EventSource cannot send an Authorization header, so a stream
+may be opened with a short-lived signed ticket (``make_ticket``) instead:
+it names the user, expires after ``VIBES_EVENTS_TICKET_MAX_AGE`` seconds
+and is useless for any other endpoint, unlike the account's API token.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone as tz
+
+logger = logging.getLogger(__name__)
+
+REDIS_CHANNEL = 'vibes:events'
+TICKET_SALT   = 'vibes.events.ticket'
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def cell_channel(geohash_5):
+    return f"cell:{geohash_5}"
+
+
+def make_ticket(user_id):
+    return signing.dumps({"user_id": user_id}, salt=TICKET_SALT)
+
+
+def ticket_user_id(ticket):
+    """User id of a ticket still within its max age; raises ``signing.BadSignature`` otherwise."""
+    max_age = getattr(settings, 'VIBES_EVENTS_TICKET_MAX_AGE', 60)
+    return signing.loads(ticket, salt=TICKET_SALT, max_age=max_age)["user_id"]
+
+
+class EventBus:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}        # channel -> {(loop, queue), ...}
+        self._listeners = []
+        self._redis = None
+        self._listener = None
+
+    # ── publishing ─────────────────────────────────────────────
+
+    def publish(self, channels, event):
+        """Publish a JSON-serializable ``event`` on ``channels`` from any thread."""
+        channels = list(channels)
+        url = getattr(settings, 'VIBES_EVENTS_REDIS_URL', None)
+        if url:
+            try:
+                message = json.dumps({"channels": channels, "event": event})
+                self._redis_client(url).publish(REDIS_CHANNEL, message)
+                return
+            except Exception:
+                logger.exception("Redis publish failed, delivering locally only")
+        self.deliver(channels, event)
+
+    def deliver(self, channels, event):
+        """Hand ``event`` to the subscribers of this process, once each."""
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscribers.get(channel, ()))
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Vibe event listener %r failed", callback)
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                pass                  # loop already closed
+
+    @staticmethod
+    def _put(queue, event):
+        # slow consumer: drop the oldest event rather than grow unbounded
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def _redis_client(self, url):
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(url)
+        return self._redis
+
+    # ── subscribing ────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        """``async with bus.subscribe([...]) as queue:`` yields incoming events."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=getattr(settings, 'VIBES_EVENTS_QUEUE_SIZE', 100))
+        member = (loop, queue)
+
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(member)
+        self._ensure_listener()
+
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                for channel in channels:
+                    members = self._subscribers.get(channel)
+                    if members:
+                        members.discard(member)
+                        if not members:
+                            del self._subscribers[channel]
+
+    def add_listener(self, callback):
+        """Call ``callback(event)`` for every event this process receives."""
+        with self._lock:
+            self._listeners.append(callback)
+        self._ensure_listener()
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _ensure_listener(self):
+        url = getattr(settings, 'VIBES_EVENTS_REDIS_URL', None)
+        with self._lock:
+            if not url or (self._listener is not None and self._listener.is_alive()):
+                return
+            self._listener = threading.Thread(
+                target=self._listen, args=(url,), name='vibes-events', daemon=True,
+            )
+            self._listener.start()
+
+    def _listen(self, url):
+        import redis
+
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(url).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CHANNEL)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    self.deliver(data['channels'], data['event'])
+            except Exception:
+                logger.exception("Redis event listener failed, reconnecting")
+                time.sleep(1)
+
+
+bus = EventBus()
+
+
+def vibe_event_data(vibe):
+    """Compact public view of a vibe (model instance or values() dict) for events."""
+    get = vibe.get if isinstance(vibe, dict) else lambda name: getattr(vibe, name)
+    end_time = get('end_time')
+    return {
+        "id":          get('id'),
+        "user_id":     get('user_id'),
+        "status":      get('status'),
+        "mood_bucket": get('mood_bucket'),
+        "mood_slider": get('mood_slider'),
+        "latitude":    float(get('latitude')),
+        "longitude":   float(get('longitude')),
+        "end_time":    end_time.isoformat() if end_time else None,
+    }
+
+
+def publish_vibe_event(kind, vibe):
+    """
+    Publish ``kind`` (created / status / expired) for one vibe on its
+    user's channel and, only while it is running and visible, on its cell
+    channel: anyone nearby may follow a cell, and a paused, hidden or
+    finished vibe must not give away where its owner is.
+    """
+    get = vibe.get if isinstance(vibe, dict) else lambda name: getattr(vibe, name)
+    data = vibe_event_data(vibe)
+    channels = [user_channel(data['user_id'])]
+    end_time = get('end_time')
+    visible = get('status') == 'running' and (end_time is None or end_time > tz.now())
+    if visible and get('geohash_5'):
+        channels.append(cell_channel(get('geohash_5')))
+    bus.publish(channels, {"event": kind, "vibe": data})
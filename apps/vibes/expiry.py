@@ -0,0 +1,57 @@
+"""
+Expiry sweeper: moves running vibes whose timer ran out to ``expired``.
+
+Rows are picked through the partial ``vibe_running_end_time_idx`` index
+and rewritten in bounded batches, one UPDATE per batch, each batch in its
+own transaction so a long backlog never holds a big lock.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as tz
+
+from .models import Vibe
+from . import grid, services
+
+
+def expire_batch(now, batch_size):
+    """Expire up to ``batch_size`` timed-out vibes; return the expired ids."""
+    with transaction.atomic():
+        rows = list(
+            Vibe.objects.timed_out(now)
+            .select_for_update(skip_locked=True)
+            .order_by('end_time')
+            .values(*services.EVENT_FIELDS)[:batch_size]
+        )
+        ids = [row['id'] for row in rows]
+        if ids:
+            # re-check status so a concurrent pause/cancel wins
+            Vibe.objects.filter(id__in=ids, status='running').update(
+                status='expired',
+                is_active=False,
+                updated_at=tz.now(),
+            )
+            for row in rows:
+                row['status'] = 'expired'
+            grid.apply(grid.running_deltas(rows, -1))
+            services.clear_current(ids)
+            services.vibes_changed({row['user_id'] for row in rows}, 'expired', rows)
+    return ids
+
+
+def expire_vibes(now=None, batch_size=None, max_batches=None):
+    """
+    Sweep every vibe timed out at ``now``. Returns the number of rows
+    visited; stops early after ``max_batches`` batches when given.
+    """
+    now = now or tz.now()
+    batch_size = batch_size or getattr(settings, 'VIBES_EXPIRY_BATCH_SIZE', 500)
+
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        ids = expire_batch(now, batch_size)
+        total += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return total
@@ -0,0 +1,139 @@
+"""
+Streaming export of vibes as NDJSON or CSV, optionally gzipped.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` and encoded
+one by one into ~64 KiB output chunks, so memory stays flat whatever the
+row count. The same generators feed the HTTP export view and the
+``export_vibes`` management command.
+
+Archived vibes (apps.vibes.archive) are merged back in on (user_id, id):
+a segment is decompressed once the export reaches its user and
+``min_vibe_id`` and dropped when its last row is out. Segments are
+per user and month, so only that user's segments with overlapping id
+ranges are held at once, however many users archived in the same month.
+"""
+
+import csv
+import datetime
+import decimal
+import heapq
+import itertools
+import json
+import zlib
+
+from django.conf import settings
+
+from .models import Vibe, VibeArchiveSegment
+
+EXPORT_FIELDS = (
+    'id', 'user_id', 'mood_bucket', 'mood_slider', 'mood_text',
+    'latitude', 'longitude', 'address', 'timer_seconds',
+    'start_time', 'end_time', 'status', 'is_active', 'created_at',
+)
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv':    'text/csv',
+}
+
+OUTPUT_CHUNK_BYTES = 64 * 1024
+
+
+def _archived_rows(segment_id):
+    from .archive import decode_segment      # archive imports this module
+
+    payload = VibeArchiveSegment.objects.values_list('payload', flat=True).get(id=segment_id)
+    rows = [tuple(row.get(field) for field in EXPORT_FIELDS) for row in decode_segment(bytes(payload))]
+    return iter(sorted(rows))
+
+
+def export_rows(user_id=None, chunk_size=None):
+    """
+    Tuples of EXPORT_FIELDS of the vibes of ``user_id`` (every user when
+    None), live and archived, ordered by user then primary key.
+    """
+    chunk_size = chunk_size or getattr(settings, 'VIBES_EXPORT_CHUNK_SIZE', 2000)
+    vibes, segments = Vibe.objects.all(), VibeArchiveSegment.objects.all()
+    if user_id is not None:
+        vibes, segments = vibes.filter(user_id=user_id), segments.filter(user_id=user_id)
+    pending = [((seg_user_id, min_vibe_id), segment_id) for seg_user_id, min_vibe_id, segment_id
+               in segments.order_by('user_id', 'min_vibe_id', 'id').values_list('user_id', 'min_vibe_id', 'id')]
+
+    # k-way merge on (user_id, id); (key, tiebreak, row, source) so rows are never compared
+    heap, tiebreak = [], itertools.count()
+
+    def advance(source):
+        row = next(source, None)
+        if row is not None:
+            heapq.heappush(heap, ((row[1], row[0]), next(tiebreak), row, source))
+
+    advance(vibes.order_by('user_id', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size))
+    pending.reverse()
+    while heap or pending:
+        while pending and (not heap or pending[-1][0] <= heap[0][0]):
+            advance(_archived_rows(pending.pop()[1]))
+        if heap:
+            _, _, row, source = heapq.heappop(heap)
+            yield row
+            advance(source)
+
+
+def _plain(value):
+    # full-precision ISO datetimes and exact decimals, in both formats
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    return value
+
+
+def ndjson_lines(rows):
+    encoder = json.JSONEncoder(separators=(',', ':'), default=_plain)
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
+
+
+def encode_lines(lines, compress=False):
+    """Join text lines into byte chunks of about OUTPUT_CHUNK_BYTES."""
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer, size = [], 0
+
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= OUTPUT_CHUNK_BYTES:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            if gzip:
+                chunk = gzip.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b''.join(buffer)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
+
+
+def stream_export(user_id=None, export_format='ndjson', compress=False, chunk_size=None):
+    rows = export_rows(user_id, chunk_size)
+    lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    return encode_lines(lines, compress)
@@ -0,0 +1,163 @@
+"""
+Small geo helpers for vibes: geohash encoding / decoding, cell coverage
+of a bounding box and haversine distance. Pure python, no GIS dependency.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# precisions stored on every vibe (see Vibe.GEOHASH_FIELDS), coarse → fine
+GEOHASH_PRECISIONS = (4, 5, 6)
+
+# a nearby query picks the finest precision whose cover stays under this
+MAX_COVER_CELLS = 24
+
+
+def encode(lat, lon, precision):
+    """Encode a coordinate as a geohash string of ``precision`` chars."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch = ch << 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch = ch << 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[ch])
+            bits, ch = 0, 0
+
+    return ''.join(chars)
+
+
+def decode(cell):
+    """Centre (lat, lon) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+
+    for char in cell:
+        ch = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (ch >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees."""
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _lon_ranges(min_lon, max_lon):
+    # split a longitude span crossing the antimeridian into two spans
+    if max_lon - min_lon >= 360:
+        return [(-180.0, 180.0)]
+    if min_lon < -180:
+        return [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return [(min_lon, max_lon)]
+
+
+def cells_covering(min_lat, min_lon, max_lat, max_lon, precision):
+    """All geohash cells of ``precision`` intersecting the bounding box."""
+    height, width = cell_size(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    cells = set()
+
+    for lo, hi in _lon_ranges(min_lon, max_lon):
+        lat = math.floor((min_lat + 90.0) / height) * height - 90.0
+        while lat <= max_lat and lat < 90.0:
+            lon = math.floor((lo + 180.0) / width) * width - 180.0
+            while lon <= hi and lon < 180.0:
+                cells.add(encode(lat + height / 2, lon + width / 2, precision))
+                lon += width
+            lat += height
+
+    return cells
+
+
+def count_covering(min_lat, min_lon, max_lat, max_lon, precision):
+    """Upper bound of ``len(cells_covering(...))`` without enumerating."""
+    height, width = cell_size(precision)
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    rows = math.floor((max_lat + 90.0) / height) - math.floor((min_lat + 90.0) / height) + 1
+    cols = sum(
+        math.floor((hi + 180.0) / width) - math.floor((lo + 180.0) / width) + 1
+        for lo, hi in _lon_ranges(min_lon, max_lon)
+    )
+    return rows * cols
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, min_lon, max_lat, max_lon) of a circle; lon may leave ±180."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat < 1e-6 or lat + dlat >= 90 or lat - dlat <= -90:
+        dlon = 180.0
+    else:
+        dlon = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def cover_circle(lat, lon, radius_km):
+    """
+    Pick the finest stored precision whose cell cover of the circle stays
+    small, and return ``(precision, cells)``.
+
+    Near the poles the box spans every longitude and even the coarsest
+    stored precision needs thousands of cells; the cover then uses a
+    coarser precision (at worst 1, 32 cells for the whole globe), whose
+    cells callers match as prefixes of the coarsest stored geohash. The
+    precision is chosen from ``count_covering``, so no oversized cover is
+    ever enumerated.
+    """
+    box = bounding_box(lat, lon, radius_km)
+    precision = GEOHASH_PRECISIONS[-1]
+    while precision > 1 and count_covering(*box, precision) > MAX_COVER_CELLS:
+        precision -= 1
+    return precision, cells_covering(*box, precision)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
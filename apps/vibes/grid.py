@@ -0,0 +1,126 @@
+"""
+Map grid aggregates: running vibe counts per geohash cell and mood bucket.
+
+Writes call ``running_deltas`` / ``apply`` inside their transaction so the
+counts move together with the vibe rows. Only the precisions stored on
+Vibe (4..6) are kept; coarser map zooms sum the precision-4 rows by
+prefix, which keeps continent-sized cells from becoming a row every write
+has to lock.
+"""
+
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Substr
+
+from . import geo
+from .models import Vibe, VibeGridCell
+
+GRID_PRECISIONS = geo.GEOHASH_PRECISIONS
+
+# a viewport never reads more than this many cells; coarser precision otherwise
+MAX_VIEWPORT_CELLS = 1024
+
+
+def running_deltas(vibes, delta, deltas=None):
+    """
+    Add ``delta`` for every vibe (model instance or values() dict with
+    ``geohash_6`` and ``mood_bucket``) to a ``{(precision, cell, bucket): n}``
+    Counter and return it.
+    """
+    deltas = Counter() if deltas is None else deltas
+    for vibe in vibes:
+        get = vibe.get if isinstance(vibe, dict) else lambda name: getattr(vibe, name)
+        geohash, mood_bucket = get('geohash_6'), get('mood_bucket')
+        if not geohash:
+            continue
+        for precision in GRID_PRECISIONS:
+            deltas[(precision, geohash[:precision], mood_bucket)] += delta
+    return deltas
+
+
+def apply(deltas):
+    """
+    Write a Counter from ``running_deltas``: one INSERT for missing cells
+    and one UPDATE per distinct delta value.
+    """
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+
+    keys = sorted(deltas)
+    VibeGridCell.objects.bulk_create(
+        [VibeGridCell(precision=p, cell=cell, mood_bucket=bucket) for p, cell, bucket in keys],
+        ignore_conflicts=True,
+    )
+
+    by_delta = defaultdict(list)
+    for key in keys:
+        by_delta[deltas[key]].append(key)
+    for delta, group in by_delta.items():
+        match = reduce(or_, (Q(precision=p, cell=cell, mood_bucket=bucket) for p, cell, bucket in group))
+        VibeGridCell.objects.filter(match).update(running=F('running') + delta)
+
+
+def rebuild():
+    """Recount every cell from the Vibe table (backfill / drift repair)."""
+    with transaction.atomic():
+        VibeGridCell.objects.all().delete()
+        running = Vibe.objects.filter(status='running')
+        for precision in GRID_PRECISIONS:
+            field = f'geohash_{precision}'
+            VibeGridCell.objects.bulk_create([
+                VibeGridCell(precision=precision, cell=row[field], mood_bucket=row['mood_bucket'], running=row['n'])
+                for row in running.exclude(**{field: ''}).values(field, 'mood_bucket').annotate(n=Count('id'))
+            ], batch_size=1000)
+
+
+def zoom_precision(zoom):
+    """
+    Geohash precision for a web-map zoom level: the finest whose cells are
+    at least ~1/8 of a 256 px tile wide.
+    """
+    precision = 1
+    for candidate in range(1, max(GRID_PRECISIONS) + 1):
+        lon_bits = (candidate * 5 + 1) // 2
+        if lon_bits <= zoom + 3:
+            precision = candidate
+    return precision
+
+
+def viewport_cells(min_lat, min_lon, max_lat, max_lon, zoom):
+    """
+    ``(precision, rows)`` for a viewport, rows being
+    ``{cell: {mood_bucket: running}}`` of the non-empty cells.
+    """
+    box = (min_lat, min_lon, max_lat, max_lon)
+    precision = zoom_precision(zoom)
+    while precision > 1 and geo.count_covering(*box, precision) > MAX_VIEWPORT_CELLS:
+        precision -= 1
+    cells = geo.cells_covering(*box, precision)
+
+    if precision in GRID_PRECISIONS:
+        rows = (
+            VibeGridCell.objects
+            .filter(precision=precision, cell__in=cells, running__gt=0)
+            .values_list('cell', 'mood_bucket', 'running')
+        )
+    else:
+        base = GRID_PRECISIONS[0]
+        rows = (
+            VibeGridCell.objects
+            .filter(precision=base, running__gt=0)
+            .annotate(prefix=Substr('cell', 1, precision))
+            .filter(prefix__in=cells)
+            .values('prefix', 'mood_bucket')
+            .annotate(total=Sum('running'))
+            .values_list('prefix', 'mood_bucket', 'total')
+        )
+
+    result = defaultdict(dict)
+    for cell, mood_bucket, running in rows:
+        result[cell][mood_bucket] = running
+    return precision, result
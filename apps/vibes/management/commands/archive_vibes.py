@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from apps.vibes.archive import archive_cutoff, archive_vibes
+from apps.vibes.models import VibeArchiveSegment
+
+
+class Command(BaseCommand):
+    help = ("Move vibes ended longer than VIBES_ARCHIVE_RETAIN_DAYS ago into compressed "
+            "monthly archive segments (run from cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per batch (default: VIBES_ARCHIVE_BATCH_SIZE).")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches.")
+        parser.add_argument('--manifest', action='store_true',
+                            help="Print the archived months instead of archiving.")
+
+    def handle(self, *args, **options):
+        if options['manifest']:
+            return self.print_manifest()
+
+        started = time.monotonic()
+        moved = archive_vibes(batch_size=options['batch_size'], max_batches=options['max_batches'])
+        self.stdout.write(
+            f"Archived {moved} vibe(s) created before {archive_cutoff():%Y-%m-%d} "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+
+    def print_manifest(self):
+        months = (
+            VibeArchiveSegment.objects
+            .values('month')
+            .annotate(segments=Count('id'), rows=Sum('rows'), raw_bytes=Sum('raw_bytes'))
+            .order_by('month')
+        )
+        for month in months:
+            self.stdout.write(
+                f"{month['month']:%Y-%m}  segments={month['segments']}  rows={month['rows']}  "
+                f"raw={month['raw_bytes']} bytes"
+            )
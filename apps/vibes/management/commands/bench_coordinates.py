@@ -0,0 +1,75 @@
+import random
+import sqlite3
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.vibes import geo
+from apps.vibes.fields import MicrodegreeField
+
+
+class Command(BaseCommand):
+    help = ("Compare the old DecimalField(17, 14) coordinate columns with the 1e-7 degree "
+            "integer ones: (lat, lon) index size and bounding-box query time. Runs on a "
+            "throwaway in-memory SQLite database, values bound the way Django binds them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--radius', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        cities = [(rng.uniform(-50, 60), rng.uniform(-120, 140)) for _ in range(100)]
+        points = []
+        for _ in range(options['rows']):
+            lat, lon = rng.choice(cities)
+            points.append((
+                Decimal(lat + rng.gauss(0, 0.2)).quantize(Decimal('1e-14')),
+                Decimal(lon + rng.gauss(0, 0.2)).quantize(Decimal('1e-14')),
+            ))
+        boxes = []
+        for _ in range(options['queries']):
+            lat, lon = rng.choice(cities)
+            boxes.append(geo.bounding_box(lat, lon, options['radius']))
+
+        field = MicrodegreeField(max_digits=17, decimal_places=14)
+        results = {
+            # Django's SQLite backend binds Decimal as str
+            'decimal(17,14)': self.measure('decimal(17, 14)', [(str(a), str(b)) for a, b in points],
+                                           boxes, str, lambda value: float(Decimal(value))),
+            'integer 1e-7':   self.measure('integer', [(field.to_units(a), field.to_units(b)) for a, b in points],
+                                           boxes, field.to_units, lambda value: value / 1e7),
+        }
+
+        self.stdout.write(f"rows: {options['rows']}, bounding boxes: {options['queries']} x {options['radius']:g} km")
+        for name, (index_bytes, median_ms, matched) in results.items():
+            self.stdout.write(
+                f"{name:15} index {index_bytes / 1024 / 1024:7.2f} MiB   "
+                f"bbox query p50 {median_ms:7.3f} ms   rows matched {matched}"
+            )
+
+    @staticmethod
+    def measure(column_type, rows, boxes, bind, to_float):
+        db = sqlite3.connect(':memory:')
+        db.execute(f"CREATE TABLE vibe (id INTEGER PRIMARY KEY, lat {column_type} NOT NULL, lon {column_type} NOT NULL)")
+        db.executemany("INSERT INTO vibe (lat, lon) VALUES (?, ?)", rows)
+        pages = db.execute("PRAGMA page_count").fetchone()[0]
+        db.execute("CREATE INDEX vibe_lat_lon ON vibe (lat, lon)")
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        index_bytes = (db.execute("PRAGMA page_count").fetchone()[0] - pages) * page_size
+
+        timings, matched = [], 0
+        for min_lat, min_lon, max_lat, max_lon in boxes:
+            params = [bind(Decimal(repr(v))) for v in (min_lat, max_lat, min_lon, max_lon)]
+            started = time.perf_counter()
+            found = db.execute(
+                "SELECT id, lat, lon FROM vibe WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?", params,
+            ).fetchall()
+            [(to_float(lat), to_float(lon)) for _, lat, lon in found]
+            timings.append((time.perf_counter() - started) * 1000)
+            matched += len(found)
+        db.close()
+        return index_bytes, statistics.median(timings), matched
@@ -0,0 +1,56 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone as tz
+
+from apps.vibes.matching import MatchIndex
+from apps.vibes.models import Vibe
+
+
+class Command(BaseCommand):
+    help = ("Benchmark MatchIndex.top_k on synthetic running vibes clustered "
+            "around city centres. Nothing touches the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vibes', type=int, default=500000)
+        parser.add_argument('--cities', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--k', type=int, default=20)
+        parser.add_argument('--radius', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        buckets = [choice for choice, _ in Vibe.MOOD_BUCKETS]
+        cities = [(rng.uniform(-50, 60), rng.uniform(-120, 140)) for _ in range(options['cities'])]
+        end = time.time() + 3600
+
+        index = MatchIndex()
+        started = time.perf_counter()
+        for vibe_id in range(1, options['vibes'] + 1):
+            lat, lon = rng.choice(cities)
+            index.upsert(
+                vibe_id, vibe_id, rng.choice(buckets), rng.random(),
+                lat + rng.gauss(0, 0.1), lon + rng.gauss(0, 0.1), end,
+            )
+        load_s = time.perf_counter() - started
+
+        now = tz.now()
+        timings = []
+        for _ in range(options['queries']):
+            lat, lon = rng.choice(cities)
+            vibe = {
+                'user_id': 0, 'mood_bucket': rng.choice(buckets), 'mood_slider': rng.random(),
+                'latitude': lat + rng.gauss(0, 0.1), 'longitude': lon + rng.gauss(0, 0.1),
+            }
+            started = time.perf_counter()
+            index.top_k(vibe, options['k'], options['radius'], now)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        p50, p99 = np.percentile(timings, [50, 99])
+        self.stdout.write(f"running vibes: {len(index)} in {options['cities']} cities (loaded in {load_s:.1f} s)")
+        self.stdout.write(f"top_k:         k={options['k']} radius={options['radius']:g} km, {options['queries']} queries")
+        self.stdout.write(f"p50:           {p50:8.2f} ms")
+        self.stdout.write(f"p99:           {p99:8.2f} ms")
+        self.stdout.write(f"max:           {max(timings):8.2f} ms")
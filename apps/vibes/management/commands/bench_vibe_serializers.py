@@ -0,0 +1,73 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone as tz
+from rest_framework.renderers import JSONRenderer
+
+from apps.vibes.models import Vibe
+from apps.vibes.serializers import VibeHistorySerializer, VibeValuesSerializer
+
+
+class Command(BaseCommand):
+    help = ("Micro-benchmark VibeHistorySerializer against VibeValuesSerializer. "
+            "Rows are inserted in a transaction that is rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(f'bench-{time.time_ns()}')
+            self.seed(user, options['rows'])
+            vibes = Vibe.objects.filter(user=user).order_by('-created_at', '-id')
+
+            renderer = JSONRenderer()
+            slow = renderer.render(VibeHistorySerializer(vibes, many=True).data)
+            fast = renderer.render(VibeValuesSerializer(vibes.values(*VibeValuesSerializer.fields), many=True).data)
+            if slow != fast:
+                raise CommandError("VibeValuesSerializer output differs from VibeHistorySerializer.")
+
+            model_ms = self.best_of(options['repeat'], lambda: VibeHistorySerializer(vibes, many=True).data)
+            values_ms = self.best_of(options['repeat'], lambda: VibeValuesSerializer(
+                vibes.values(*VibeValuesSerializer.fields), many=True).data)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"rows:                  {options['rows']}")
+        self.stdout.write(f"VibeHistorySerializer: {model_ms:8.1f} ms")
+        self.stdout.write(f"VibeValuesSerializer:  {values_ms:8.1f} ms")
+        self.stdout.write(f"speedup:               {model_ms / values_ms:8.2f}x (output byte-identical)")
+
+    @staticmethod
+    def seed(user, rows):
+        now = tz.now()
+        buckets = [choice for choice, _ in Vibe.MOOD_BUCKETS]
+        statuses = ['running', 'paused', 'cancelled', 'expired']
+        vibes = []
+        for i in range(rows):
+            lat = Decimal(random.uniform(-80, 80)).quantize(Decimal('1e-14'))
+            lon = Decimal(random.uniform(-179, 179)).quantize(Decimal('1e-14'))
+            vibe = Vibe(
+                user=user, mood_bucket=random.choice(buckets), mood_slider=random.random(),
+                mood_text=f'vibe {i}', latitude=lat, longitude=lon, address='',
+                timer_seconds=3600, start_time=now, end_time=now + tz.timedelta(hours=random.choice([-1, 1])),
+                status=random.choice(statuses),
+            )
+            vibe.refresh_geohash()
+            vibes.append(vibe)
+        Vibe.objects.bulk_create(vibes, batch_size=1000)
+
+    @staticmethod
+    def best_of(repeat, func):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.vibes.expiry import expire_vibes
+
+
+class Command(BaseCommand):
+    help = "Move running vibes whose timer has ended to 'expired' (run from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per UPDATE (default: VIBES_EXPIRY_BATCH_SIZE).")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep sweeping every N seconds instead of exiting.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            expired = expire_vibes(
+                batch_size=options['batch_size'],
+                max_batches=options['max_batches'],
+            )
+            self.stdout.write(f"Expired {expired} vibe(s) in {time.monotonic() - started:.2f}s")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.vibes.export import FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream vibes of one user (or all users), archived ones included, to a file or stdout as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username or id; all users when omitted.")
+        parser.add_argument('--format', dest='export_format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help="gzip the output.")
+        parser.add_argument('--output', '-o', help="Output file (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            lookup = {'id': options['user']} if options['user'].isdigit() else {'username': options['user']}
+            try:
+                user_id = User.objects.values_list('id', flat=True).get(**lookup)
+            except User.DoesNotExist:
+                raise CommandError(f"No user matches '{options['user']}'.")
+
+        chunks = stream_export(user_id, options['export_format'], options['gzip'], options['chunk_size'])
+
+        started, written = time.monotonic(), 0
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        self.stderr.write(f"Exported {written} bytes in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.vibes import grid
+from apps.vibes.models import VibeGridCell
+
+
+class Command(BaseCommand):
+    help = ("Recount the map grid aggregates (VibeGridCell) from the Vibe table, "
+            "e.g. after vibes were edited outside the API.")
+
+    def handle(self, *args, **options):
+        grid.rebuild()
+        self.stdout.write(f"Rebuilt {VibeGridCell.objects.count()} grid cell(s)")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.vibes.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Refresh the hourly / daily vibe analytics rollups from vibes changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Rebuild every rollup instead of only changed hours.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep refreshing every N seconds instead of exiting.")
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            started = time.monotonic()
+            hours = refresh_rollups(full=full)
+            self.stdout.write(f"Recomputed {hours} hour(s) of rollups in {time.monotonic() - started:.2f}s")
+
+            if not options['interval']:
+                break
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,282 @@
+"""
+In-memory matching of running vibes.
+
+Every process keeps the running vibes in a ``MatchIndex``: numpy column
+arrays (id, user, coordinates, slider, end time) bucketed by mood bucket
+and geohash-4 cell (~39 x 20 km). A query only touches the buckets of the
+compatible moods whose cells cover the search circle, scores them in one
+vectorized pass and keeps the top K with ``argpartition``.
+
+The index is loaded from the database on first use and then follows the
+vibe events (see apps.vibes.events): created / status / expired. Across
+several workers that needs ``VIBES_EVENTS_REDIS_URL``; without it each
+worker only sees its own writes until the periodic rebuild
+(``VIBES_MATCH_REBUILD_SECONDS``).
+"""
+
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone as tz
+from django.utils.dateparse import parse_datetime
+
+from . import geo
+from .events import bus
+from .models import Vibe
+
+logger = logging.getLogger(__name__)
+
+# mood buckets a vibe may be matched with
+COMPATIBLE_BUCKETS = {
+    'lighthearted':    ('lighthearted', 'up_for_anything'),
+    'deep':            ('deep', 'up_for_anything'),
+    'up_for_anything': ('up_for_anything', 'lighthearted', 'deep'),
+}
+
+# score = DISTANCE_WEIGHT * closeness + SLIDER_WEIGHT * slider similarity, both 0..1
+DISTANCE_WEIGHT = 0.5
+SLIDER_WEIGHT = 0.5
+
+BUCKET_PRECISION = 4
+
+INDEX_FIELDS = ('id', 'user_id', 'mood_bucket', 'mood_slider', 'latitude', 'longitude', 'end_time')
+
+
+class _Bucket:
+    """Column arrays of the vibes of one (mood bucket, cell); rows [0, size) are live."""
+
+    COLUMNS = (
+        ('ids',      np.int64),
+        ('user_ids', np.int64),
+        ('lat',      np.float64),        # radians
+        ('lon',      np.float64),        # radians
+        ('cos_lat',  np.float64),
+        ('slider',   np.float64),
+        ('end',      np.float64),        # epoch seconds
+    )
+
+    def __init__(self, capacity=16):
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.empty(capacity, dtype=dtype))
+        self.size = 0
+        self.slots = {}                  # vibe id -> row
+
+    def _grow(self):
+        capacity = max(16, len(self.ids) * 2)
+        for name, dtype in self.COLUMNS:
+            column = np.empty(capacity, dtype=dtype)
+            column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+
+    def put(self, vibe_id, user_id, lat, lon, slider, end):
+        row = self.slots.get(vibe_id)
+        if row is None:
+            if self.size == len(self.ids):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.slots[vibe_id] = row
+        lat, lon = math.radians(lat), math.radians(lon)
+        self.ids[row], self.user_ids[row] = vibe_id, user_id
+        self.lat[row], self.lon[row], self.cos_lat[row] = lat, lon, math.cos(lat)
+        self.slider[row], self.end[row] = slider, end
+
+    def remove(self, vibe_id):
+        row = self.slots.pop(vibe_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            # move the last row into the hole
+            for name, _ in self.COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            self.slots[int(self.ids[row])] = row
+        self.size = last
+
+    def score(self, lat, lon, cos_lat, slider, user_id, radius_km, now):
+        """(ids, scores, distances) of the rows within ``radius_km`` that qualify."""
+        n = self.size
+        half_dlat = (self.lat[:n] - lat) * 0.5
+        half_dlon = (self.lon[:n] - lon) * 0.5
+        a = np.sin(half_dlat) ** 2 + cos_lat * self.cos_lat[:n] * np.sin(half_dlon) ** 2
+        distance = 2 * geo.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        keep = (distance <= radius_km) & (self.end[:n] > now) & (self.user_ids[:n] != user_id)
+        distance = distance[keep]
+        score = (DISTANCE_WEIGHT * (1.0 - distance / radius_km)
+                 + SLIDER_WEIGHT * (1.0 - np.abs(self.slider[:n][keep] - slider)))
+        return self.ids[:n][keep], score, distance
+
+
+class MatchIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets = {}               # (mood_bucket, geohash_4) -> _Bucket
+        self._where = {}                 # vibe id -> bucket key
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._where)
+
+    # ── writes ─────────────────────────────────────────────────
+
+    def upsert(self, vibe_id, user_id, mood_bucket, slider, lat, lon, end):
+        key = (mood_bucket, geo.encode(lat, lon, BUCKET_PRECISION))
+        with self._lock:
+            previous = self._where.get(vibe_id)
+            if previous is not None and previous != key:
+                self._buckets[previous].remove(vibe_id)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.put(vibe_id, user_id, lat, lon, slider, end)
+            self._where[vibe_id] = key
+
+    def discard(self, vibe_id):
+        with self._lock:
+            key = self._where.pop(vibe_id, None)
+            if key is not None:
+                self._buckets[key].remove(vibe_id)
+
+    def load(self, rows):
+        """Add ``values()`` rows with INDEX_FIELDS."""
+        for row in rows:
+            self.upsert(
+                row['id'], row['user_id'], row['mood_bucket'], float(row['mood_slider']),
+                float(row['latitude']), float(row['longitude']), row['end_time'].timestamp(),
+            )
+
+    def apply(self, event):
+        """Follow one vibe event (apps.vibes.events.vibe_event_data payload)."""
+        vibe = event['vibe']
+        end_time = parse_datetime(vibe['end_time']) if vibe['end_time'] else None
+        if vibe['status'] == 'running' and end_time and end_time.timestamp() > time.time():
+            self.upsert(
+                vibe['id'], vibe['user_id'], vibe['mood_bucket'], float(vibe['mood_slider']),
+                vibe['latitude'], vibe['longitude'], end_time.timestamp(),
+            )
+        else:
+            self.discard(vibe['id'])
+
+    # ── reads ──────────────────────────────────────────────────
+
+    def top_k(self, vibe, k, radius_km, now=None):
+        """
+        Best ``k`` matches for ``vibe`` (a Vibe or a values() dict with
+        INDEX_FIELDS) as ``[(vibe_id, score, distance_km), ...]``, best first.
+        Other users' running vibes only; ties go to the closer vibe.
+        """
+        get = vibe.get if isinstance(vibe, dict) else lambda name: getattr(vibe, name)
+        lat, lon = float(get('latitude')), float(get('longitude'))
+        lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+        cos_lat = math.cos(lat_rad)
+        slider, user_id = float(get('mood_slider')), get('user_id')
+        now = (now or tz.now()).timestamp()
+
+        cells = geo.cells_covering(*geo.bounding_box(lat, lon, radius_km), BUCKET_PRECISION)
+        ids, scores, distances = [], [], []
+        with self._lock:
+            for mood_bucket in COMPATIBLE_BUCKETS[get('mood_bucket')]:
+                for cell in cells:
+                    bucket = self._buckets.get((mood_bucket, cell))
+                    if not bucket or not bucket.size:
+                        continue
+                    found = bucket.score(lat_rad, lon_rad, cos_lat, slider, user_id, radius_km, now)
+                    if len(found[0]):
+                        ids.append(found[0])
+                        scores.append(found[1])
+                        distances.append(found[2])
+
+        if not ids:
+            return []
+        ids, scores, distances = np.concatenate(ids), np.concatenate(scores), np.concatenate(distances)
+        if len(ids) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            ids, scores, distances = ids[best], scores[best], distances[best]
+        order = np.lexsort((distances, -scores))
+        return [(int(ids[i]), float(scores[i]), float(distances[i])) for i in order]
+
+
+# ── process-wide index ─────────────────────────────────────────
+
+_index = None
+_pending = None           # events seen while a build runs, replayed onto its result
+_builder = None
+_listening = False
+_index_lock = threading.Lock()
+_index_changed = threading.Condition(_index_lock)
+
+
+def build_index():
+    index = MatchIndex()
+    index.load(Vibe.objects.running().values(*INDEX_FIELDS).iterator(chunk_size=5000))
+    return index
+
+
+def _on_event(event):
+    with _index_lock:
+        if _pending is not None:
+            _pending.append(event)
+        index = _index
+    if index is not None:
+        index.apply(event)
+
+
+def _rebuild():
+    global _index, _pending
+    try:
+        index = build_index()
+    except Exception:
+        logger.exception("Match index build failed")
+        index = None
+    finally:
+        connection.close()
+
+    with _index_changed:
+        if index is not None:
+            # the snapshot may predate these; applying them again is harmless
+            for event in _pending:
+                index.apply(event)
+            _index = index
+        _pending = None
+        _index_changed.notify_all()
+
+
+def _start_rebuild():
+    """Build a new index in a background thread unless one is being built. Hold _index_lock."""
+    global _pending, _builder
+    if _pending is not None:
+        return
+    _pending = []
+    _builder = threading.Thread(target=_rebuild, name='vibes-match-index', daemon=True)
+    _builder.start()
+
+
+def get_index():
+    """
+    The process's MatchIndex. The first call starts the initial load and
+    waits for it; once the index is older than ``VIBES_MATCH_REBUILD_SECONDS``
+    a background thread rebuilds it while callers keep the old one. Events
+    arriving during a build are replayed onto the new index before it is
+    swapped in.
+    """
+    global _listening
+    max_age = getattr(settings, 'VIBES_MATCH_REBUILD_SECONDS', 900)
+    with _index_changed:
+        if not _listening:
+            bus.add_listener(_on_event)
+            _listening = True
+        if _index is None or time.monotonic() - _index.built_at > max_age:
+            _start_rebuild()
+        while _index is None and _pending is not None:
+            _index_changed.wait()
+        if _index is None:
+            raise RuntimeError("The match index could not be loaded.")
+        return _index
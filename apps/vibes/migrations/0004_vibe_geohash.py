@@ -0,0 +1,59 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+from apps.vibes import geo
+
+
+def backfill_geohash(apps, schema_editor):
+    Vibe = apps.get_model('vibes', 'Vibe')
+    batch = []
+    for vibe in Vibe.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        lat, lon = float(vibe.latitude), float(vibe.longitude)
+        vibe.geohash_4 = geo.encode(lat, lon, 4)
+        vibe.geohash_5 = geo.encode(lat, lon, 5)
+        vibe.geohash_6 = geo.encode(lat, lon, 6)
+        batch.append(vibe)
+        if len(batch) >= 2000:
+            Vibe.objects.bulk_update(batch, ['geohash_4', 'geohash_5', 'geohash_6'])
+            batch = []
+    if batch:
+        Vibe.objects.bulk_update(batch, ['geohash_4', 'geohash_5', 'geohash_6'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0003_vibe_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vibe',
+            name='geohash_4',
+            field=models.CharField(blank=True, editable=False, max_length=4),
+        ),
+        migrations.AddField(
+            model_name='vibe',
+            name='geohash_5',
+            field=models.CharField(blank=True, editable=False, max_length=5),
+        ),
+        migrations.AddField(
+            model_name='vibe',
+            name='geohash_6',
+            field=models.CharField(blank=True, editable=False, max_length=6),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['geohash_4', 'status'], name='vibe_geohash4_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['geohash_5', 'status'], name='vibe_geohash5_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['geohash_6', 'status'], name='vibe_geohash6_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0004_vibe_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='vibe_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='vibe_user_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user', 'created_at'], name='vibe_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['user', 'created_at'], name='vibe_user_inactive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['user', 'mood_bucket', 'created_at'], name='vibe_user_mood_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(condition=models.Q(('status', 'running')), fields=['user', 'created_at'], name='vibe_user_running_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0005_vibe_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vibe',
+            name='vibe_user_inactive_idx',
+        ),
+        migrations.AlterField(
+            model_name='vibe',
+            name='status',
+            field=models.CharField(choices=[('paused', 'Paused'), ('cancelled', 'Cancelled'), ('running', 'Running'), ('pauseandhide', 'Paused And Hide'), ('expired', 'Expired')], default='running', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(condition=models.Q(('status', 'running')), fields=['end_time'], name='vibe_running_end_time_idx'),
+        ),
+    ]
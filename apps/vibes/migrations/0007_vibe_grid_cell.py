@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:48
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_grid(apps, schema_editor):
+    Vibe = apps.get_model('vibes', 'Vibe')
+    VibeGridCell = apps.get_model('vibes', 'VibeGridCell')
+    running = Vibe.objects.filter(status='running')
+    for precision in (4, 5, 6):
+        field = f'geohash_{precision}'
+        VibeGridCell.objects.bulk_create([
+            VibeGridCell(precision=precision, cell=row[field], mood_bucket=row['mood_bucket'], running=row['n'])
+            for row in running.exclude(**{field: ''}).values(field, 'mood_bucket').annotate(n=Count('id'))
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0006_vibe_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VibeGridCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('cell', models.CharField(max_length=6)),
+                ('mood_bucket', models.CharField(choices=[('lighthearted', 'Lighthearted'), ('up_for_anything', 'Up for Anything'), ('deep', 'Deep Conversation')], max_length=20)),
+                ('running', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vibegridcell',
+            constraint=models.UniqueConstraint(fields=('precision', 'cell', 'mood_bucket'), name='vibe_grid_cell_unique'),
+        ),
+        migrations.RunPython(backfill_grid, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:53
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    Vibe = apps.get_model('vibes', 'Vibe')
+    Vibe.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0007_vibe_grid_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VibeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('city', models.CharField(blank=True, max_length=255)),
+                ('mood_bucket', models.CharField(choices=[('lighthearted', 'Lighthearted'), ('up_for_anything', 'Up for Anything'), ('deep', 'Deep Conversation')], max_length=20)),
+                ('status', models.CharField(choices=[('paused', 'Paused'), ('cancelled', 'Cancelled'), ('running', 'Running'), ('pauseandhide', 'Paused And Hide'), ('expired', 'Expired')], max_length=20)),
+                ('vibes', models.PositiveIntegerField(default=0)),
+                ('slider_sum', models.FloatField(default=0)),
+                ('timer_sum', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VibeRollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vibe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['updated_at'], name='vibe_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vibe',
+            index=models.Index(fields=['created_at'], name='vibe_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='viberollup',
+            constraint=models.UniqueConstraint(fields=('grain', 'bucket_start', 'city', 'mood_bucket', 'status'), name='vibe_rollup_unique'),
+        ),
+    ]
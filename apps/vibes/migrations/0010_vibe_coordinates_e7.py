@@ -0,0 +1,58 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:05
+
+from decimal import ROUND_HALF_EVEN
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 2000
+
+
+def to_e7(value):
+    return int(value.scaleb(7).to_integral_value(ROUND_HALF_EVEN))
+
+
+def backfill_e7(apps, schema_editor):
+    """
+    Copy latitude / longitude into the integer columns in short batches,
+    each committed on its own, so the table stays writable meanwhile.
+    Picks up only rows still missing, so it can be re-run to catch up.
+    """
+    Vibe = apps.get_model('vibes', 'Vibe')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Vibe.objects.filter(id__gt=last_id, lat_e7__isnull=True)
+                .order_by('id')
+                .values_list('id', 'latitude', 'longitude')[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            Vibe.objects.bulk_update(
+                [Vibe(id=pk, lat_e7=to_e7(lat), lon_e7=to_e7(lon)) for pk, lat, lon in rows],
+                ['lat_e7', 'lon_e7'],
+            )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('vibes', '0009_vibe_archive_segment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vibe',
+            name='lat_e7',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vibe',
+            name='lon_e7',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_e7, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:05
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+import apps.vibes.fields
+
+# rows written by the previous release since 0010 ran
+backfill_e7 = import_module('apps.vibes.migrations.0010_vibe_coordinates_e7').backfill_e7
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0010_vibe_coordinates_e7'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_e7, migrations.RunPython.noop),
+        # latitude / longitude now live in the integer columns; the
+        # decimal columns are dropped
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterField(
+                    model_name='vibe',
+                    name='lat_e7',
+                    field=models.IntegerField(editable=False),
+                ),
+                migrations.AlterField(
+                    model_name='vibe',
+                    name='lon_e7',
+                    field=models.IntegerField(editable=False),
+                ),
+                migrations.RemoveField(
+                    model_name='vibe',
+                    name='latitude',
+                ),
+                migrations.RemoveField(
+                    model_name='vibe',
+                    name='longitude',
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='vibe',
+                    name='lat_e7',
+                ),
+                migrations.RemoveField(
+                    model_name='vibe',
+                    name='lon_e7',
+                ),
+                migrations.AlterField(
+                    model_name='vibe',
+                    name='latitude',
+                    field=apps.vibes.fields.MicrodegreeField(db_column='lat_e7', decimal_places=14, max_digits=17),
+                ),
+                migrations.AlterField(
+                    model_name='vibe',
+                    name='longitude',
+                    field=apps.vibes.fields.MicrodegreeField(db_column='lon_e7', decimal_places=14, max_digits=17),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:03
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def stop_duplicates(apps, schema_editor):
+    """Keep each user's newest running vibe; pause the rest (expire the timed-out ones)."""
+    Vibe = apps.get_model('vibes', 'Vibe')
+    VibeGridCell = apps.get_model('vibes', 'VibeGridCell')
+    now = timezone.now()
+
+    seen, paused, expired, deltas = set(), [], [], Counter()
+    running = (
+        Vibe.objects.filter(status='running')
+        .order_by('user_id', '-created_at', '-id')
+        .values_list('id', 'user_id', 'end_time', 'geohash_6', 'mood_bucket')
+    )
+    for vibe_id, user_id, end_time, geohash, mood_bucket in running.iterator():
+        if user_id not in seen:
+            seen.add(user_id)
+            continue
+        (expired if end_time <= now else paused).append(vibe_id)
+        if geohash:
+            for precision in (4, 5, 6):
+                deltas[(precision, geohash[:precision], mood_bucket)] -= 1
+
+    for start in range(0, len(paused), 1000):
+        Vibe.objects.filter(id__in=paused[start:start + 1000]).update(status='paused', updated_at=now)
+    for start in range(0, len(expired), 1000):
+        Vibe.objects.filter(id__in=expired[start:start + 1000]).update(
+            status='expired', is_active=False, updated_at=now,
+        )
+    for (precision, cell, mood_bucket), delta in deltas.items():
+        VibeGridCell.objects.filter(precision=precision, cell=cell, mood_bucket=mood_bucket).update(
+            running=F('running') + delta,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0011_vibe_coordinates_switch'),
+    ]
+
+    operations = [
+        migrations.RunPython(stop_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='vibe',
+            name='vibe_user_running_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='vibe',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('user',), name='vibe_one_running_per_user'),
+        ),
+    ]
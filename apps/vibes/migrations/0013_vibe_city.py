@@ -0,0 +1,30 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:48
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_profile_city(apps, schema_editor):
+    """Existing vibes get their owner's current city, the only one on record."""
+    Vibe = apps.get_model('vibes', 'Vibe')
+    Profile = apps.get_model('users', 'Profile')
+    city = Profile.objects.filter(user_id=OuterRef('user_id')).values('city')[:1]
+    Vibe.objects.update(city=Coalesce(Subquery(city), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_profile_avatar_thumbnails'),
+        ('vibes', '0012_vibe_one_running_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vibe',
+            name='city',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(copy_profile_city, migrations.RunPython.noop),
+    ]
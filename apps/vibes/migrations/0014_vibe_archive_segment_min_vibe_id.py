@@ -0,0 +1,30 @@
+# Generated by Django 4.2.9 on 2026-10-18 21:50
+
+import gzip
+import json
+
+from django.db import migrations, models
+
+
+def fill_min_vibe_id(apps, schema_editor):
+    VibeArchiveSegment = apps.get_model('vibes', 'VibeArchiveSegment')
+    for segment_id in list(VibeArchiveSegment.objects.values_list('id', flat=True)):
+        payload = VibeArchiveSegment.objects.values_list('payload', flat=True).get(id=segment_id)
+        min_vibe_id = min(json.loads(line)['id'] for line in gzip.decompress(bytes(payload)).splitlines())
+        VibeArchiveSegment.objects.filter(id=segment_id).update(min_vibe_id=min_vibe_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vibes', '0013_vibe_city'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vibearchivesegment',
+            name='min_vibe_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_min_vibe_id, migrations.RunPython.noop),
+    ]
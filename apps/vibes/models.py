@@ -2,6 +2,30 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone as tz
 
+from . import geo
+from .fields import MicrodegreeField
+
+
+class VibeQuerySet(models.QuerySet):
+    """
+    A running vibe whose end_time has passed counts as expired even before
+    the expiry sweeper (see apps.vibes.expiry) has rewritten its row.
+    """
+
+    def running(self, now=None):
+        return self.filter(status='running', end_time__gt=now or tz.now())
+
+    def expired(self, now=None):
+        return self.filter(
+            models.Q(status='expired') |
+            models.Q(status='running', end_time__lte=now or tz.now())
+        )
+
+    def timed_out(self, now=None):
+        """Running rows the sweeper still has to move to ``expired``."""
+        return self.filter(status='running', end_time__lte=now or tz.now())
+
+
 class Vibe(models.Model):
     MOOD_BUCKETS = [
         ('lighthearted', 'Lighthearted'),
@@ -14,25 +38,200 @@ class Vibe(models.Model):
         ('cancelled', 'Cancelled'),
         ('running', 'Running'),
         ('pauseandhide', 'Paused And Hide'),
+        ('expired', 'Expired'),
     ]
 
+    # statuses only the server sets
+    SYSTEM_STATUSES = ('expired',)
+
     user          = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='vibes')
     mood_bucket   = models.CharField(max_length=20, choices=MOOD_BUCKETS)
     mood_slider   = models.FloatField(help_text="0.0 → 1.0 position of slider")  # redundant but nice for analytics
     mood_text     = models.CharField(max_length=150)                             # e.g. tooltip message
 
-    latitude = models.DecimalField(max_digits=17, decimal_places=14)
-    longitude = models.DecimalField(max_digits=17, decimal_places=14)
+    # integer 1e-7 degree columns, Decimal degrees in python (see fields.py)
+    latitude      = MicrodegreeField(max_digits=17, decimal_places=14, db_column='lat_e7')
+    longitude     = MicrodegreeField(max_digits=17, decimal_places=14, db_column='lon_e7')
     address       = models.CharField(max_length=255, blank=True)
+    # the owner's Profile.city when the vibe was created, for the rollups
+    city          = models.CharField(max_length=255, blank=True, editable=False)
+
+    # geohash cells of (latitude, longitude), kept in sync by save()
+    geohash_4     = models.CharField(max_length=4, blank=True, editable=False)
+    geohash_5     = models.CharField(max_length=5, blank=True, editable=False)
+    geohash_6     = models.CharField(max_length=6, blank=True, editable=False)
 
     timer_seconds = models.PositiveIntegerField()                                 # total duration
     start_time    = models.DateTimeField(default=tz.now)
     end_time      = models.DateTimeField()
 
     created_at    = models.DateTimeField(auto_now_add=True)
+    # queryset .update() calls must set this too (see apps.vibes.rollups)
+    updated_at    = models.DateTimeField(auto_now=True)
 
     is_active     = models.BooleanField(default=True)
     status = models.CharField(max_length=20, choices=MOOD_STATUS, default='running')
 
+    objects = VibeQuerySet.as_manager()
+
+    GEOHASH_FIELDS = tuple(f'geohash_{p}' for p in geo.GEOHASH_PRECISIONS)
+
+    class Meta:
+        indexes = [
+            # per-user API access paths, all ordered by created_at (see views)
+            models.Index(fields=['user', 'created_at', 'id'], name='vibe_user_created_idx'),
+            models.Index(fields=['user', 'status', 'created_at'], name='vibe_user_status_created_idx'),
+            # is_active=true compiles to a bare boolean term, which only a
+            # partial index on that same term can serve on every backend.
+            # is_active=false also matches timed-out running rows and walks
+            # vibe_user_created_idx instead; most vibes end, so it stops early.
+            models.Index(
+                fields=['user', 'created_at'],
+                condition=models.Q(is_active=True),
+                name='vibe_user_active_idx',
+            ),
+            models.Index(fields=['user', 'mood_bucket', 'created_at'], name='vibe_user_mood_created_idx'),
+            # expiry sweeper: running rows ordered by end_time
+            models.Index(
+                fields=['end_time'],
+                condition=models.Q(status='running'),
+                name='vibe_running_end_time_idx',
+            ),
+            models.Index(fields=['geohash_4', 'status'], name='vibe_geohash4_status_idx'),
+            models.Index(fields=['geohash_5', 'status'], name='vibe_geohash5_status_idx'),
+            models.Index(fields=['geohash_6', 'status'], name='vibe_geohash6_status_idx'),
+            # analytics rollups: changed rows since the watermark, then the
+            # created_at slices they fall in
+            models.Index(fields=['updated_at'], name='vibe_updated_idx'),
+            models.Index(fields=['created_at'], name='vibe_created_idx'),
+        ]
+        constraints = [
+            # starting a vibe stops the previous one (see services.stop_running);
+            # not enforced on backends without partial indexes
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status='running'),
+                name='vibe_one_running_per_user',
+            ),
+        ]
+
+    def refresh_geohash(self):
+        """Recompute the geohash cells from the current coordinates."""
+        lat, lon = float(self.latitude), float(self.longitude)
+        for precision, field in zip(geo.GEOHASH_PRECISIONS, self.GEOHASH_FIELDS):
+            setattr(self, field, geo.encode(lat, lon, precision))
+
+    def is_timed_out(self, now=None):
+        return self.status == 'running' and self.end_time <= (now or tz.now())
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.refresh_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | set(self.GEOHASH_FIELDS)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Vibe({self.user.username}, {self.mood_bucket}, active={self.is_active})"
+
+
+class VibeGridCell(models.Model):
+    """
+    Running vibes per geohash cell and mood bucket, for map tiles.
+
+    Kept up to date by apps.vibes.grid in the same transaction as every
+    running transition, at the precisions stored on Vibe.
+    """
+    precision   = models.PositiveSmallIntegerField()
+    cell        = models.CharField(max_length=6)
+    mood_bucket = models.CharField(max_length=20, choices=Vibe.MOOD_BUCKETS)
+    running     = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['precision', 'cell', 'mood_bucket'], name='vibe_grid_cell_unique'),
+        ]
+
+    def __str__(self):
+        return f"VibeGridCell({self.cell}, {self.mood_bucket}, running={self.running})"
+
+
+class VibeRollup(models.Model):
+    """
+    Vibe counts per hour or day of ``created_at`` (UTC), Vibe.city, mood
+    bucket and status. Sums rather than averages so days add up from hours;
+    maintained by apps.vibes.rollups.
+    """
+    GRAINS = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    grain        = models.CharField(max_length=4, choices=GRAINS)
+    bucket_start = models.DateTimeField()
+    city         = models.CharField(max_length=255, blank=True)
+    mood_bucket  = models.CharField(max_length=20, choices=Vibe.MOOD_BUCKETS)
+    status       = models.CharField(max_length=20, choices=Vibe.MOOD_STATUS)
+
+    vibes        = models.PositiveIntegerField(default=0)
+    slider_sum   = models.FloatField(default=0)
+    timer_sum    = models.BigIntegerField(default=0)                            # seconds
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grain', 'bucket_start', 'city', 'mood_bucket', 'status'],
+                name='vibe_rollup_unique',
+            ),
+        ]
+
+    @property
+    def avg_mood_slider(self):
+        return self.slider_sum / self.vibes if self.vibes else None
+
+    @property
+    def avg_timer_seconds(self):
+        return self.timer_sum / self.vibes if self.vibes else None
+
+    def __str__(self):
+        return f"VibeRollup({self.grain} {self.bucket_start:%Y-%m-%d %H:%M}, {self.mood_bucket}, {self.status})"
+
+
+class VibeRollupWatermark(models.Model):
+    """
+    How far a background job has processed: Vibe.updated_at for the
+    rollups, the created_at cutoff for the archiver.
+    """
+    name  = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value:%Y-%m-%d %H:%M:%S}"
+
+
+class VibeArchiveSegment(models.Model):
+    """
+    Append-only archive of ended vibes: one gzip NDJSON payload of full
+    Vibe rows per user, created_at month and archive batch. The metadata
+    columns double as the manifest (see apps.vibes.archive).
+    """
+    user             = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                         related_name='vibe_archive_segments')
+    month            = models.DateField(help_text="First day of the created_at month (UTC)")
+    rows             = models.PositiveIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at  = models.DateTimeField()
+    min_vibe_id      = models.BigIntegerField(default=0)                          # lowest Vibe id inside (exports)
+    raw_bytes        = models.PositiveIntegerField()                              # NDJSON before gzip
+    payload          = models.BinaryField()
+    created_at       = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # history: the segments of a user overlapping a created_at range
+            models.Index(fields=['user', 'last_created_at'], name='vibe_archive_user_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"VibeArchiveSegment({self.user_id}, {self.month:%Y-%m}, rows={self.rows})"
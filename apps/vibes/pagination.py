@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination over ``(created_at, id)``, newest first.
+
+The cursor is an opaque urlsafe-base64 token holding the sort key of the
+last row of the previous page, so every page is a bounded index range
+scan no matter how deep the client has paged.
+"""
+
+import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(created_at, pk):
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError("Invalid cursor.")
+    if created_at is None:
+        raise ValidationError("Invalid cursor.")
+    return created_at, pk
+
+
+def get_page_size(request):
+    default = getattr(settings, 'VIBES_HISTORY_PAGE_SIZE', 20)
+    maximum = getattr(settings, 'VIBES_HISTORY_MAX_PAGE_SIZE', 100)
+    value = request.query_params.get('page_size')
+    if not value:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValidationError("page_size must be an integer.")
+    return max(1, min(size, maximum))
+
+
+def _sort_key(row):
+    if isinstance(row, dict):
+        return row['created_at'], row['id']
+    return row.created_at, row.id
+
+
+def paginate_keyset(queryset, cursor, page_size, extra=None):
+    """
+    Return ``(rows, next_cursor)`` for the page after ``cursor``. Works on
+    model querysets and on ``.values()`` querysets alike.
+    ``next_cursor`` is None on the last page.
+
+    ``extra(before, after, limit)`` may supply rows kept outside the
+    queryset (archived vibes): up to ``limit`` dicts newest first, keyed
+    strictly between ``after`` and ``before``. They are merged in key order.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    before = None
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        before = (created_at, pk)
+        # the plain bound lets the index range-scan; the OR alone cannot
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+            created_at__lte=created_at,
+        )
+
+    rows = list(queryset[:page_size + 1])
+    if extra is not None:
+        after = _sort_key(rows[page_size]) if len(rows) > page_size else None
+        more = extra(before, after, page_size + 1)
+        if more:
+            rows = sorted(rows + more, key=_sort_key, reverse=True)[:page_size + 1]
+
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, encode_cursor(last['created_at'], last['id'])
+    return rows, encode_cursor(last.created_at, last.id)
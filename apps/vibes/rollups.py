@@ -0,0 +1,127 @@
+"""
+Hourly and daily analytics rollups of vibes (VibeRollup).
+
+Each run picks the vibes whose ``updated_at`` moved past the watermark,
+finds the ``created_at`` hours they fall in, and recomputes just those
+hours from the Vibe table, then the days containing them from the hour
+rows. Recomputing whole slices instead of applying deltas keeps a run
+idempotent and lets status changes move a vibe between rollup rows.
+
+The watermark trails ``now`` by ``VIBES_ROLLUP_LAG_SECONDS`` so rows
+written by transactions still open at run time are picked up next run.
+Deleted vibes are only dropped from the rollups by a ``full`` run.
+Hours before the archive horizon (see apps.vibes.archive) are never
+recomputed, since their vibes may have left the Vibe table.
+
+Rows are keyed by ``Vibe.city``, the owner's city when the vibe was
+created, so recomputing an hour never moves it to wherever the owner
+lives now.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+from django.utils import timezone as tz
+
+from .models import Vibe, VibeRollup, VibeRollupWatermark
+
+WATERMARK = 'vibe_rollups'
+ARCHIVE_WATERMARK = 'vibe_archive'
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def _runs(starts, step):
+    """Group sorted slice starts into contiguous ``(start, end)`` ranges."""
+    runs = []
+    for start in sorted(starts):
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = start + step
+        else:
+            runs.append([start, start + step])
+    return runs
+
+
+def _replace(grain, start, end, rows):
+    VibeRollup.objects.filter(grain=grain, bucket_start__gte=start, bucket_start__lt=end).delete()
+    VibeRollup.objects.bulk_create([
+        VibeRollup(
+            grain        = grain,
+            bucket_start = row['bucket'],
+            city         = row['city_name'],
+            mood_bucket  = row['mood_bucket'],
+            status       = row['status'],
+            vibes        = row['n'],
+            slider_sum   = row['slider'] or 0,
+            timer_sum    = row['timer'] or 0,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def recompute_hours(hours):
+    for start, end in _runs(hours, HOUR):
+        rows = (
+            Vibe.objects
+            .filter(created_at__gte=start, created_at__lt=end)
+            .annotate(
+                bucket=TruncHour('created_at', tzinfo=timezone.utc),
+                city_name=F('city'),
+            )
+            .values('bucket', 'city_name', 'mood_bucket', 'status')
+            .annotate(n=Count('id'), slider=Sum('mood_slider'), timer=Sum('timer_seconds'))
+        )
+        _replace('hour', start, end, rows)
+
+
+def recompute_days(days):
+    for start, end in _runs(days, DAY):
+        rows = (
+            VibeRollup.objects
+            .filter(grain='hour', bucket_start__gte=start, bucket_start__lt=end)
+            .annotate(bucket=TruncDay('bucket_start', tzinfo=timezone.utc), city_name=Coalesce('city', Value('')))
+            .values('bucket', 'city_name', 'mood_bucket', 'status')
+            .annotate(n=Sum('vibes'), slider=Sum('slider_sum'), timer=Sum('timer_sum'))
+        )
+        _replace('day', start, end, rows)
+
+
+def refresh_rollups(now=None, full=False):
+    """
+    Bring the rollups up to ``now`` minus the lag. ``full`` rebuilds every
+    slice from scratch. Returns the number of hours recomputed.
+    """
+    upper = (now or tz.now()) - timedelta(seconds=getattr(settings, 'VIBES_ROLLUP_LAG_SECONDS', 60))
+
+    with transaction.atomic():
+        watermark, _ = VibeRollupWatermark.objects.select_for_update().get_or_create(
+            name=WATERMARK, defaults={'value': datetime(1970, 1, 1, tzinfo=timezone.utc)},
+        )
+
+        horizon = (
+            VibeRollupWatermark.objects.filter(name=ARCHIVE_WATERMARK).values_list('value', flat=True).first()
+            or datetime(1970, 1, 1, tzinfo=timezone.utc)
+        )
+
+        changed = Vibe.objects.filter(created_at__gte=horizon)
+        if full:
+            VibeRollup.objects.filter(bucket_start__gte=horizon).delete()
+        else:
+            changed = changed.filter(updated_at__gt=watermark.value, updated_at__lte=upper)
+        hours = set(
+            changed
+            .annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc))
+            .values_list('bucket', flat=True)
+            .distinct()
+        )
+
+        recompute_hours(hours)
+        recompute_days({hour.replace(hour=0) for hour in hours})
+
+        watermark.value = max(watermark.value, upper)
+        watermark.save(update_fields=['value'])
+    return len(hours)
@@ -1,6 +1,15 @@
-from rest_framework import serializers
+import decimal
+
+from django.conf import settings
 from django.utils import timezone as tz
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework import ISO_8601
 from .models import Vibe
+from . import services
+
+# statuses a client may set on its own vibes
+CLIENT_STATUSES = [choice for choice, _ in Vibe.MOOD_STATUS if choice not in Vibe.SYSTEM_STATUSES]
 
 class CreateVibeSerializer(serializers.ModelSerializer):
     # client will send these as integers
@@ -20,33 +29,30 @@ class CreateVibeSerializer(serializers.ModelSerializer):
         if not 0.0 <= value <= 1.0:
             raise serializers.ValidationError("mood_slider must be between 0 and 1.")
         return value
+
+    def validate_latitude(self, value):
+        if not -90 <= value <= 90:
+            raise serializers.ValidationError("latitude must be between -90 and 90.")
+        return value
+
+    def validate_longitude(self, value):
+        if not -180 <= value <= 180:
+            raise serializers.ValidationError("longitude must be between -180 and 180.")
+        return value
     
     def validate_status(self, value):
-        valid = dict(Vibe.MOOD_STATUS).keys()
-        if value not in valid:
-            raise serializers.ValidationError(f"Invalid status. Must be one of: {', '.join(valid)}")
+        if value not in CLIENT_STATUSES:
+            raise serializers.ValidationError(f"Invalid status. Must be one of: {', '.join(CLIENT_STATUSES)}")
         return value
 
+    def validate(self, attrs):
+        # checked here rather than in create() so bulk requests see it too
+        if services.timer_seconds(attrs) == 0:
+            raise serializers.ValidationError({"timer": "Timer duration cannot be zero."})
+        return attrs
+
     def create(self, validated):
-        # pop timer fields
-        h = validated.pop('hours')
-        m = validated.pop('minutes')
-        s = validated.pop('seconds')
-        total_sec = h * 3600 + m * 60 + s
-        if total_sec == 0:
-            raise serializers.ValidationError("Timer duration cannot be zero.")
-
-        start = tz.now()
-        end   = start + tz.timedelta(seconds=total_sec)
-
-        vibe = Vibe.objects.create(
-            user          = self.context['request'].user,
-            timer_seconds = total_sec,
-            start_time    = start,
-            end_time      = end,
-            **validated
-        )
-        return vibe
+        return services.create_vibe(self.context['request'].user, validated)
 
 class VibeHistorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -67,10 +73,121 @@ class VibeHistorySerializer(serializers.ModelSerializer):
             'created_at',
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # the sweeper may not have caught up with this vibe's timer yet
+        if instance.is_timed_out():
+            data['status'] = 'expired'
+            data['is_active'] = False
+        return data
+
+
+def _value_converter(field):
+    """
+    Plain function doing what ``field.to_representation`` does for the
+    values a ``.values()`` query returns, minus the per-call overhead.
+    Unknown field types fall back to the DRF field itself.
+    """
+    if isinstance(field, serializers.DecimalField) and field.decimal_places is not None \
+            and not field.localize \
+            and getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def convert(value):
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value).strip())
+            return format(value.quantize(exponent, rounding=rounding, context=context), 'f')
+        return convert
+
+    if isinstance(field, serializers.DateTimeField) and settings.USE_TZ \
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601:
+        field_timezone = getattr(field, 'timezone', None) or tz.get_current_timezone()
+
+        def convert(value):
+            if isinstance(value, str) or value.tzinfo is None:
+                return field.to_representation(value)
+            if value.tzinfo is not field_timezone:
+                value = value.astimezone(field_timezone)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+    if isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        return lambda value: value if value == '' else choices.get(str(value), value)
+
+    if type(field) is serializers.IntegerField:
+        return int
+    if type(field) is serializers.FloatField:
+        return float
+    if type(field) is serializers.CharField:
+        return str
+
+    return field.to_representation
+
+
+class VibeValuesSerializer:
+    """
+    Read-only fast path producing exactly what VibeHistorySerializer does,
+    from ``Vibe.objects.values(*VibeValuesSerializer.fields)`` dicts
+    instead of model instances.
+
+        rows = vibes.values(*VibeValuesSerializer.fields)
+        VibeValuesSerializer(rows, many=True).data
+    """
+    serializer_class = VibeHistorySerializer
+    fields = tuple(VibeHistorySerializer.Meta.fields)
+
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+
+    def converters(self):
+        # built per call so the active timezone is honoured
+        drf_fields = self.serializer_class().fields
+        return [(name, _value_converter(drf_fields[name])) for name in self.fields]
+
+    @staticmethod
+    def represent(row, converters, now):
+        data = {}
+        for name, convert in converters:
+            value = row[name]
+            data[name] = None if value is None else convert(value)
+        # same timed-out override as VibeHistorySerializer.to_representation
+        if row['status'] == 'running' and row['end_time'] <= now:
+            data['status'] = 'expired'
+            data['is_active'] = False
+        return data
+
+    @property
+    def data(self):
+        if self.instance is None:
+            return None
+        converters, now = self.converters(), tz.now()
+        if self.many:
+            return [self.represent(row, converters, now) for row in self.instance]
+        return self.represent(self.instance, converters, now)
+
 
 class VibeStatusUpdateSerializer(serializers.ModelSerializer):
-    status = serializers.ChoiceField(choices=[choice[0] for choice in Vibe.MOOD_STATUS])
+    status = serializers.ChoiceField(choices=CLIENT_STATUSES)
 
     class Meta:
         model = Vibe
-        fields = ['status']
\ No newline at end of file
+        fields = ['status']
+
+    def validate_status(self, value):
+        error = services.transition_error(self.instance.status, self.instance.end_time, value)
+        if error:
+            raise serializers.ValidationError(error)
+        return value
+
+
+class VibeStatusChangeSerializer(serializers.Serializer):
+    """One item of a bulk status update."""
+    id     = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=CLIENT_STATUSES)
\ No newline at end of file
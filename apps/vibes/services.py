@@ -0,0 +1,252 @@
+"""
+Write paths for vibes shared by the single-item and bulk endpoints.
+
+Every write that changes what a user's vibes look like goes through here
+so follow-up work (map grid counts, cache invalidation, live events)
+happens in one place, once per transaction.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone as tz
+
+from apps.users.models import Profile
+
+from . import grid
+from .cache import invalidate_user
+from .events import publish_vibe_event
+from .models import Vibe
+
+# columns needed to publish an event for a vibe without loading the model
+EVENT_FIELDS = (
+    'id', 'user_id', 'status', 'mood_bucket', 'mood_slider',
+    'latitude', 'longitude', 'end_time', 'geohash_5', 'geohash_6',
+)
+
+
+def timer_seconds(validated):
+    return validated['hours'] * 3600 + validated['minutes'] * 60 + validated['seconds']
+
+
+def owner_city(user_id):
+    return Profile.objects.filter(user_id=user_id).values_list('city', flat=True).first() or ''
+
+
+def build_vibe(user, validated, now=None, city=None):
+    """
+    Unsaved Vibe from CreateVibeSerializer data, geohash filled in and
+    ``city`` taken from the owner's profile unless given.
+    """
+    validated = dict(validated)
+    total_sec = timer_seconds(validated)
+    for key in ('hours', 'minutes', 'seconds'):
+        validated.pop(key)
+
+    start = now or tz.now()
+    vibe = Vibe(
+        user          = user,
+        timer_seconds = total_sec,
+        start_time    = start,
+        end_time      = start + tz.timedelta(seconds=total_sec),
+        city          = owner_city(user.id) if city is None else city,
+        **validated
+    )
+    vibe.refresh_geohash()
+    return vibe
+
+
+def vibes_changed(user_ids, kind=None, vibes=()):
+    """
+    After-commit hooks for written vibes: drop the users' cached responses
+    and publish ``kind`` events (created / status / expired) for ``vibes``
+    (model instances or values() dicts with EVENT_FIELDS).
+    """
+    user_ids = {user_ids} if isinstance(user_ids, int) else set(user_ids)
+
+    def run():
+        for user_id in user_ids:
+            invalidate_user(user_id)
+        for vibe in vibes:
+            publish_vibe_event(kind, vibe)
+
+    transaction.on_commit(run)
+
+
+def running_vibes(vibes):
+    return [vibe for vibe in vibes if vibe.status == 'running']
+
+
+# ── Single running vibe ─────────────────────────────────────────────
+# A user has at most one running vibe (vibe_one_running_per_user) and
+# Profile.current_vibe points at it. Every write that starts a vibe first
+# locks the user row, so concurrent starts for one user queue up instead of
+# tripping the constraint, then stops the previous one. Lock order is
+# always user row, then vibe rows, then profile row.
+
+def lock_user(user_id):
+    """Row lock on the user, held until the surrounding transaction ends."""
+    list(get_user_model().objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+
+
+def stop_running(user_id, now=None, exclude=()):
+    """
+    Pause the user's running vibe (expire it when its timer already ran out)
+    with one UPDATE, skipping ids in ``exclude``. Call inside a transaction
+    after ``lock_user``, then ``set_current`` for the vibe that replaces it.
+    Returns the stopped rows.
+    """
+    now = now or tz.now()
+    rows = list(
+        Vibe.objects.filter(user_id=user_id, status='running')
+        .exclude(id__in=exclude)
+        .select_for_update()
+        .values(*EVENT_FIELDS)
+    )
+    if not rows:
+        return rows
+
+    timed_out = Q(end_time__lte=now)
+    Vibe.objects.filter(id__in=[row['id'] for row in rows], status='running').update(
+        status=Case(When(timed_out, then=Value('expired')), default=Value('paused')),
+        is_active=Case(When(timed_out, then=Value(False)), default=F('is_active')),
+        updated_at=now,
+    )
+    for row in rows:
+        row['status'] = 'expired' if row['end_time'] <= now else 'paused'
+    grid.apply(grid.running_deltas(rows, -1))
+
+    for kind, status in (('status', 'paused'), ('expired', 'expired')):
+        changed = [row for row in rows if row['status'] == status]
+        if changed:
+            vibes_changed(user_id, kind, changed)
+    return rows
+
+
+def set_current(user_id, vibe_id):
+    """Point the user's Profile.current_vibe at ``vibe_id``."""
+    if not Profile.objects.filter(user_id=user_id).update(current_vibe_id=vibe_id) and vibe_id:
+        Profile.objects.create(user_id=user_id, current_vibe_id=vibe_id)
+
+
+def clear_current(vibe_ids):
+    """Drop Profile.current_vibe pointers at vibes that stopped running."""
+    if vibe_ids:
+        Profile.objects.filter(current_vibe_id__in=vibe_ids).update(current_vibe=None)
+
+
+def create_vibe(user, validated):
+    vibe = build_vibe(user, validated)
+    with transaction.atomic():
+        if vibe.status == 'running':
+            lock_user(user.id)
+            stop_running(user.id, vibe.start_time)
+        vibe.save()
+        if vibe.status == 'running':
+            grid.apply(grid.running_deltas([vibe], +1))
+            set_current(user.id, vibe.id)
+        vibes_changed(user.id, 'created', [vibe])
+    return vibe
+
+
+def bulk_create_vibes(user, validated_items):
+    """
+    Insert many vibes with a single bulk INSERT in one transaction. The
+    outcome matches creating them one by one: only the last running item
+    stays running, earlier running items are stored paused.
+    """
+    now, city = tz.now(), owner_city(user.id)
+    vibes = [build_vibe(user, validated, now, city) for validated in validated_items]
+    started = running_vibes(vibes)
+    for vibe in started[:-1]:
+        vibe.status = 'paused'
+
+    with transaction.atomic():
+        if started:
+            lock_user(user.id)
+            stop_running(user.id, now)
+        Vibe.objects.bulk_create(vibes)
+        if started:
+            grid.apply(grid.running_deltas(started[-1:], +1))
+            set_current(user.id, started[-1].id)
+        vibes_changed(user.id, 'created', vibes)
+    return vibes
+
+
+def transition_error(current, end_time, target, now=None):
+    """Why a client may not move a vibe from ``current`` to ``target``, or None."""
+    if current in Vibe.SYSTEM_STATUSES:
+        return f"An {current} vibe cannot change status."
+    if target == 'running' and end_time <= (now or tz.now()):
+        return "This vibe's timer has run out; it cannot be started again."
+    return None
+
+
+def bulk_update_status(user, changes):
+    """
+    Apply ``{vibe_id: status}`` for vibes owned by ``user`` with one UPDATE
+    per distinct target status. As with one-by-one updates, only the last
+    vibe set to running stays running; earlier ones end up paused. Returns
+    ``({vibe_id: applied status}, {vibe_id: error})``: the vibes updated and
+    those whose transition ``transition_error`` refused.
+    """
+    now = tz.now()
+    rejected = {}
+    with transaction.atomic():
+        if 'running' in changes.values():
+            lock_user(user.id)
+        rows = []
+        for row in (Vibe.objects.filter(user=user, id__in=changes.keys())
+                    .select_for_update().values(*EVENT_FIELDS)):
+            error = transition_error(row['status'], row['end_time'], changes[row['id']], now)
+            if error:
+                rejected[row['id']] = error
+            else:
+                rows.append(row)
+
+        owned = {row['id'] for row in rows}
+        keep = [vibe_id for vibe_id, new in changes.items() if new == 'running' and vibe_id in owned][-1:]
+        if keep:
+            stop_running(user.id, now, exclude=owned)
+
+        by_status, started, stopped = {}, [], []
+        for row in rows:
+            target = changes[row['id']]
+            if target == 'running' and row['id'] not in keep:
+                target = 'paused'
+            previous, row['status'] = row['status'], target
+            by_status.setdefault(row['status'], []).append(row['id'])
+            if previous != 'running' and row['status'] == 'running':
+                started.append(row)
+            elif previous == 'running' and row['status'] != 'running':
+                stopped.append(row)
+
+        # stops first, so the started vibe never meets a second running row
+        for new_status in sorted(by_status, key=lambda new: new == 'running'):
+            Vibe.objects.filter(id__in=by_status[new_status]).update(status=new_status, updated_at=now)
+
+        deltas = grid.running_deltas(started, +1)
+        grid.apply(grid.running_deltas(stopped, -1, deltas))
+        clear_current([row['id'] for row in stopped])
+        if keep:
+            set_current(user.id, keep[0])
+
+        if rows:
+            vibes_changed(user.id, 'status', rows)
+    return {row['id']: row['status'] for row in rows}, rejected
+
+
+def status_changed(vibe, previous):
+    """
+    Follow-up for a single vibe whose status went from ``previous`` to
+    ``vibe.status``; call inside the transaction that saved it (and, when it
+    starts running, called ``stop_running`` before the save).
+    """
+    was_running, is_running = previous == 'running', vibe.status == 'running'
+    if was_running != is_running:
+        grid.apply(grid.running_deltas([vibe], +1 if is_running else -1))
+        if is_running:
+            set_current(vibe.user_id, vibe.id)
+        else:
+            clear_current([vibe.id])
+    vibes_changed(vibe.user_id, 'status', [vibe])
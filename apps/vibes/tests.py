@@ -1,3 +1,1097 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+from importlib import import_module
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone as tz
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.users.models import Profile
+from apps.vibes import archive, events, expiry, export, geo, grid, matching, rollups, services
+from apps.vibes.export import EXPORT_FIELDS
+from apps.vibes.fields import MicrodegreeField
+from apps.vibes.matching import MatchIndex
+from apps.vibes.pagination import encode_cursor
+from apps.vibes.models import Vibe, VibeArchiveSegment, VibeGridCell, VibeRollup
+from apps.vibes.serializers import CreateVibeSerializer, VibeHistorySerializer, VibeValuesSerializer
+from apps.vibes.views import LatestRunningVibeAPIView, VibeHistoryView
+from config.asgi import application as asgi_application
 
 # Create your tests here.
+
+
+async def asgi_get(path, params=None, headers=None, on_send=None, disconnect=None):
+    """
+    GET ``path`` through the project's ASGI application the way a server
+    would, rather than through the test client's own handler. ``on_send``
+    sees each message as it goes out; once the ``disconnect`` event is set
+    the client is gone. Returns the status and the joined body.
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': urlencode(params or {}).encode(),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    disconnect = disconnect or asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+        if on_send:
+            on_send(message)
+
+    await asgi_application(scope, receive, send)
+    return sent[0]['status'], b''.join(m.get('body', b'') for m in sent[1:])
+
+
+@skipUnless(connection.vendor == 'sqlite', "query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class VibeQueryPlanTests(TestCase):
+    """
+    Runs each vibes endpoint, captures the SQL it sends for ``vibes_vibe``
+    and asserts the planner picks the index built for that access path.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', 'planner@example.com', 'secret123')
+        Profile.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def vibe_query_plan(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertLess(response.status_code, 500)
+
+        selects = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('SELECT') and 'FROM "vibes_vibe"' in q['sql']]
+        self.assertTrue(selects, "no vibes_vibe query captured")
+
+        self.query_sql = selects[0]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + selects[0])
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, plan, *index_names):
+        self.assertTrue(any(name in plan for name in index_names), plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+    def test_history_default(self):
+        plan = self.vibe_query_plan(reverse('vibe_history'))
+        self.assertUsesIndex(plan, 'vibe_user_created_idx')
+
+    def test_history_cursor_page(self):
+        # a deep page must start its range scan at the cursor, not at the newest row
+        plan = self.vibe_query_plan(reverse('vibe_history'), {'cursor': encode_cursor(tz.now(), 10 ** 9)})
+        self.assertUsesIndex(plan, 'vibe_user_created_idx')
+        self.assertIn('(user_id=? AND created_at<?)', plan)
+        # planners that do not factor the OR need the plain bound beside it
+        self.assertIn('AND "vibes_vibe"."created_at" <= ', self.query_sql)
+
+    def test_history_by_status(self):
+        plan = self.vibe_query_plan(reverse('vibe_history'), {'status': 'paused'})
+        self.assertUsesIndex(plan, 'vibe_user_status_created_idx')
+
+    def test_history_by_is_active(self):
+        plan = self.vibe_query_plan(reverse('vibe_history'), {'is_active': 'true'})
+        self.assertUsesIndex(plan, 'vibe_user_active_idx')
+
+    def test_history_by_is_inactive(self):
+        plan = self.vibe_query_plan(reverse('vibe_history'), {'is_active': 'false'})
+        self.assertUsesIndex(plan, 'vibe_user_created_idx')
+
+    def test_history_by_mood_bucket(self):
+        plan = self.vibe_query_plan(reverse('vibe_history'), {'mood_bucket': 'deep'})
+        self.assertUsesIndex(plan, 'vibe_user_mood_created_idx')
+
+    def test_expiry_sweep(self):
+        plan = Vibe.objects.timed_out().order_by('end_time').values_list('id', flat=True)[:500].explain()
+        self.assertUsesIndex(plan, 'vibe_running_end_time_idx')
+
+    def test_rollup_changed_since_watermark(self):
+        plan = Vibe.objects.filter(updated_at__gt=tz.now()).values_list('created_at', flat=True).explain()
+        self.assertUsesIndex(plan, 'vibe_updated_idx')
+
+    def test_rollup_hour_slice(self):
+        start = tz.now().replace(minute=0, second=0, microsecond=0)
+        plan = Vibe.objects.filter(created_at__gte=start, created_at__lt=start + tz.timedelta(hours=1)).explain()
+        self.assertUsesIndex(plan, 'vibe_created_idx')
+
+    def test_current_vibe(self):
+        # Profile.current_vibe: the profile by its user, the vibe by primary key
+        plan = self.vibe_query_plan(reverse('current_vibe'))
+        self.assertIn('INTEGER PRIMARY KEY', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+class VibeValuesSerializerTests(TestCase):
+
+    def test_output_matches_model_serializer(self):
+        users = [User.objects.create_user(f'values{n}', f'values{n}@example.com', 'secret123') for n in range(2)]
+        now = tz.now()
+        for user, lat, lon, vibe_status, minutes in [
+            (users[0], Decimal('12.34567890123456'), Decimal('-0.00000000000001'), 'running', 30),
+            (users[1], Decimal('-89.99999999999999'), Decimal('179.5'), 'running', -5),   # timed out
+            (users[0], Decimal('0'), Decimal('45.12'), 'paused', 10),
+        ]:
+            Vibe.objects.create(
+                user=user, mood_bucket='deep', mood_slider=0.25, mood_text='text',
+                latitude=lat, longitude=lon, timer_seconds=600,
+                start_time=now, end_time=now + tz.timedelta(minutes=minutes), status=vibe_status,
+            )
+
+        vibes = Vibe.objects.filter(user__in=users).order_by('-created_at', '-id')
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(VibeHistorySerializer(vibes, many=True).data),
+            renderer.render(VibeValuesSerializer(vibes.values(*VibeValuesSerializer.fields), many=True).data),
+        )
+
+
+class MicrodegreeFieldTests(TestCase):
+    """Coordinates are Decimal degrees everywhere but the column, which holds 1e-7 degree units."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('micro', 'micro@example.com', 'secret123')
+
+    def create(self, latitude, longitude):
+        now = tz.now()
+        return Vibe.objects.create(
+            user=self.user, mood_bucket='deep', mood_slider=0.5, mood_text='micro', latitude=latitude,
+            longitude=longitude, timer_seconds=600, start_time=now, end_time=now + tz.timedelta(minutes=10),
+        )
+
+    def column(self, vibe):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT lat_e7, lon_e7 FROM vibes_vibe WHERE id = %s', [vibe.id])
+            return cursor.fetchone()
+
+    def test_round_trip(self):
+        vibe = self.create(Decimal('12.12345678901234'), Decimal('-77.59460005'))
+        self.assertEqual(self.column(vibe), (121234568, -775946000))        # half-even at 1e-7
+        vibe.refresh_from_db()
+        self.assertEqual((vibe.latitude, vibe.longitude), (Decimal('12.1234568'), Decimal('-77.5946000')))
+        self.assertIsInstance(vibe.latitude, Decimal)
+
+        field = Vibe._meta.get_field('latitude')
+        self.assertIsInstance(field, MicrodegreeField)
+        self.assertEqual([field.to_units(v) for v in ('0.00000015', 90, -180.0, None)], [2, 900000000, -1800000000, None])
+
+    def test_serialized_format(self):
+        vibe = self.create(Decimal('12.9716'), Decimal('77.5946'))
+        vibe.refresh_from_db()
+        self.assertEqual(VibeHistorySerializer(vibe).data['latitude'], '12.97160000000000')
+        self.assertEqual(VibeHistorySerializer(vibe).data['longitude'], '77.59460000000000')
+        row = Vibe.objects.values(*VibeValuesSerializer.fields).get(id=vibe.id)
+        self.assertEqual(VibeValuesSerializer(row).data['latitude'], '12.97160000000000')
+
+    def test_lookups_convert(self):
+        vibe = self.create(Decimal('12.9716'), Decimal('77.5946'))
+        matches = lambda **lookup: list(Vibe.objects.filter(**lookup).values_list('id', flat=True))
+        self.assertEqual(matches(latitude=Decimal('12.97160001')), [vibe.id])       # same 1e-7 unit
+        self.assertEqual(matches(latitude__gte=12.9716, longitude__lte='77.5946'), [vibe.id])
+        self.assertEqual(matches(latitude__gt='12.9716'), [])
+        self.assertEqual(matches(latitude__range=(12, 13), longitude__in=[Decimal('77.5946')]), [vibe.id])
+
+    def test_range_validation(self):
+        valid = {'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'edge',
+                 'hours': 0, 'minutes': 10, 'seconds': 0, 'status': 'running'}
+        for latitude, longitude, ok in [('90', '180', True), ('-90', '-180', True), ('90.0000001', '0', False),
+                                        ('0', '-180.0000001', False), ('-91', '0', False), ('0', '181', False)]:
+            serializer = CreateVibeSerializer(data=dict(valid, latitude=latitude, longitude=longitude))
+            self.assertEqual(serializer.is_valid(), ok, (latitude, longitude, serializer.errors))
+
+
+class MicrodegreeMigrationTests(TransactionTestCase):
+    """0010 / 0011 move existing decimal coordinates into the integer columns, batch by batch."""
+
+    before, after = ('vibes', '0009_vibe_archive_segment'), ('vibes', '0010_vibe_coordinates_e7')
+    switched = ('vibes', '0011_vibe_coordinates_switch')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def add_vibes(self, apps, coordinates):
+        user = apps.get_model('auth', 'User').objects.get_or_create(username='legacy')[0]
+        now = tz.now()
+        apps.get_model('vibes', 'Vibe').objects.bulk_create([
+            apps.get_model('vibes', 'Vibe')(
+                user_id=user.id, mood_bucket='deep', mood_slider=0.5, mood_text='legacy', latitude=latitude,
+                longitude=longitude, timer_seconds=600, start_time=now, end_time=now,
+            ) for latitude, longitude in coordinates
+        ])
+
+    def test_backfill(self):
+        leaves = MigrationExecutor(connection).loader.graph.leaf_nodes()
+        self.addCleanup(self.migrate, leaves)
+
+        old = [(Decimal('12.12345678901234'), Decimal('-0.00000000000001')),
+               (Decimal('-89.99999995'), Decimal('179.99999995')),
+               (Decimal('0.00000005'), Decimal('-0.00000015'))]
+        self.add_vibes(self.migrate([self.before]), old)
+        with mock.patch.object(import_module('apps.vibes.migrations.0010_vibe_coordinates_e7'), 'BATCH_SIZE', 2):
+            apps = self.migrate([self.after])
+            self.assertFalse(apps.get_model('vibes', 'Vibe').objects.filter(lat_e7__isnull=True).exists())
+
+            # written by the previous release between 0010 and 0011
+            late = [(Decimal('51.5007'), Decimal('-0.1246'))]
+            self.add_vibes(apps, late)
+            self.migrate([self.switched])
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT lat_e7, lon_e7 FROM vibes_vibe ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [(121234568, 0), (-900000000, 1800000000), (0, -2),
+                                                 (515007000, -1246000)])
+
+
+class MatchIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.end = tz.now().timestamp() + 3600
+        self.index = MatchIndex()
+        self.me = {'user_id': 1, 'mood_bucket': 'deep', 'mood_slider': 0.5,
+                   'latitude': 12.9716, 'longitude': 77.5946}
+
+    def add(self, vibe_id, user_id, mood_bucket, slider, lat, lon, end=None):
+        self.index.upsert(vibe_id, user_id, mood_bucket, slider, lat, lon, end or self.end)
+
+    def test_ranking_and_filters(self):
+        self.add(10, 2, 'deep', 0.5, 12.98, 77.60)                # close, same slider
+        self.add(11, 3, 'up_for_anything', 0.9, 12.9716, 77.5946)  # compatible bucket
+        self.add(12, 3, 'lighthearted', 0.5, 12.9716, 77.5946)     # incompatible bucket
+        self.add(13, 1, 'deep', 0.5, 12.9716, 77.5946)             # own vibe
+        self.add(14, 4, 'deep', 0.5, 13.5, 77.60)                  # out of radius
+        self.add(15, 5, 'deep', 0.5, 12.9716, 77.5946, end=self.end - 7200)   # timed out
+
+        self.assertEqual([m[0] for m in self.index.top_k(self.me, 20, 10)], [10, 11])
+        self.assertEqual([m[0] for m in self.index.top_k(self.me, 1, 10)], [10])
+
+    def test_follows_events(self):
+        self.add(10, 2, 'deep', 0.5, 12.98, 77.60)
+        event = {'event': 'status', 'vibe': {
+            'id': 10, 'user_id': 2, 'status': 'paused', 'mood_bucket': 'deep', 'mood_slider': 0.5,
+            'latitude': 12.98, 'longitude': 77.60, 'end_time': tz.now().isoformat(),
+        }}
+        self.index.apply(event)
+        self.assertEqual(self.index.top_k(self.me, 20, 10), [])
+
+        event['vibe'].update(status='running', end_time=(tz.now() + tz.timedelta(hours=1)).isoformat())
+        self.index.apply(event)
+        self.assertEqual([m[0] for m in self.index.top_k(self.me, 20, 10)], [10])
+        self.assertEqual(len(self.index), 1)
+
+
+class MatchIndexRebuildTests(SimpleTestCase):
+    """Events fired while the index is being built reach the index that replaces it."""
+
+    def setUp(self):
+        patcher = mock.patch.multiple(matching, _index=None, _pending=None, _builder=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.started, self.release = threading.Event(), threading.Event()
+        self.me = {'user_id': 1, 'mood_bucket': 'deep', 'mood_slider': 0.5,
+                   'latitude': 12.9716, 'longitude': 77.5946}
+
+    def slow_build(self):
+        # a snapshot read before the event below was published
+        self.started.set()
+        self.release.wait(5)
+        return MatchIndex()
+
+    def event(self, vibe_id):
+        return {'event': 'created', 'vibe': {
+            'id': vibe_id, 'user_id': 2, 'status': 'running', 'mood_bucket': 'deep', 'mood_slider': 0.5,
+            'latitude': 12.98, 'longitude': 77.60, 'end_time': (tz.now() + tz.timedelta(hours=1)).isoformat(),
+        }}
+
+    def matches(self, index):
+        return [m[0] for m in index.top_k(self.me, 20, 10)]
+
+    def test_event_during_first_build(self):
+        with mock.patch.object(matching, 'build_index', self.slow_build):
+            caller = threading.Thread(target=matching.get_index)
+            caller.start()
+            self.assertTrue(self.started.wait(5))
+            events.bus.deliver([], self.event(10))
+            self.release.set()
+            caller.join(5)
+        self.assertEqual(self.matches(matching.get_index()), [10])
+
+    def test_event_during_rebuild(self):
+        with mock.patch.object(matching, 'build_index', MatchIndex):
+            old = matching.get_index()
+        old.built_at -= 3600
+
+        with mock.patch.object(matching, 'build_index', self.slow_build), \
+                self.settings(VIBES_MATCH_REBUILD_SECONDS=60):
+            self.assertIs(matching.get_index(), old)      # answered while the rebuild runs
+            self.assertTrue(self.started.wait(5))
+            events.bus.deliver([], self.event(11))
+            self.release.set()
+            matching._builder.join(5)
+
+        new = matching.get_index()
+        self.assertIsNot(new, old)
+        self.assertEqual(self.matches(new), [11])
+
+
+class VibeGridTests(TestCase):
+    """Incremental grid counts must equal a recount after every kind of write."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('grid', 'grid@example.com', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, lat, lon, vibe_status='running'):
+        response = self.client.post(reverse('create_vibe'), {
+            'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'grid',
+            'latitude': lat, 'longitude': lon, 'hours': 1, 'minutes': 0, 'seconds': 0,
+            'status': vibe_status,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['data']['id']
+
+    def assertMatchesRecount(self):
+        def snapshot():
+            return sorted(VibeGridCell.objects.filter(running__gt=0).values_list(
+                'precision', 'cell', 'mood_bucket', 'running'))
+        incremental = snapshot()
+        grid.rebuild()
+        self.assertEqual(incremental, snapshot())
+
+    def test_counts_follow_writes(self):
+        first = self.create('12.9716', '77.5946')
+        paused = self.create('12.98', '77.60', 'paused')
+        self.assertMatchesRecount()
+
+        # starting one vibe stops the other
+        self.client.post(reverse('bulk_update_vibe_status'), {'items': [{'id': paused, 'status': 'running'}]},
+                         format='json')
+        self.assertMatchesRecount()
+        self.client.post(reverse('update_vibe_status', args=[first]), {'status': 'running'}, format='json')
+        self.client.post(reverse('update_vibe_status', args=[first]), {'status': 'running'}, format='json')
+        self.assertMatchesRecount()
+
+        Vibe.objects.filter(id=first).update(end_time=tz.now() - tz.timedelta(seconds=1))
+        expiry.expire_vibes()
+        self.assertMatchesRecount()
+
+        self.create('48.85', '2.35')
+        self.assertMatchesRecount()
+
+        response = self.client.get(reverse('vibe_map_cells'), {'bbox': '-180,-85,180,85', 'zoom': 0})
+        self.assertEqual(response.json()['data'], {
+            'precision': 1,
+            'cells': [{'cell': 'u', 'latitude': 67.5, 'longitude': 22.5, 'running': 1,
+                       'mood_buckets': {'deep': 1}}],
+        })
+
+
+class NearbyVibesTests(TestCase):
+    """Geohash cover plus bounding box finds exactly the vibes within the radius."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('seeker', 'seeker@example.com', 'secret123'))
+        self.owners = 0
+
+    def place(self, lat, lon):
+        # one running vibe per user
+        self.owners += 1
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(f'owner{self.owners}', f'o{self.owners}@example.com', 'pw'))
+        response = client.post(reverse('create_vibe'), {
+            'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'here',
+            'latitude': lat, 'longitude': lon, 'hours': 1, 'minutes': 0, 'seconds': 0,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['data']['id']
+
+    def nearby(self, lat, lon, radius):
+        response = self.client.get(reverse('nearby_vibes'), {'lat': lat, 'lon': lon, 'radius': radius})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['data']]
+
+    def test_normal_radius(self):
+        near, farther = self.place('12.9716', '77.5946'), self.place('12.9900', '77.6100')
+        self.place('13.2000', '77.5946')                                   # ~25 km north
+        self.assertEqual(self.nearby(12.9716, 77.5946, 5), [near, farther])
+        precision, cells = geo.cover_circle(12.9716, 77.5946, 5)
+        self.assertIn(precision, geo.GEOHASH_PRECISIONS)
+        self.assertLessEqual(len(cells), geo.MAX_COVER_CELLS)
+
+    def test_antimeridian(self):
+        east, west = self.place('-16.5', '179.99'), self.place('-16.5', '-179.99')
+        self.place('-16.5', '179.50')                                      # ~53 km west
+        self.assertEqual(sorted(self.nearby(-16.5, 179.999, 10)), sorted([east, west]))
+        self.assertEqual(sorted(self.nearby(-16.5, -179.999, 10)), sorted([east, west]))
+
+    def test_pole(self):
+        across = self.place('89.95', '-170.0')                              # ~11 km over the pole
+        self.place('89.50', '10.0')                                         # ~50 km south
+        precision, cells = geo.cover_circle(89.95, 10.0, 20)
+        self.assertLess(precision, geo.GEOHASH_PRECISIONS[0])
+        self.assertLessEqual(len(cells), 32)
+        self.assertEqual(self.nearby(89.95, 10.0, 20), [across])
+
+
+class HistoryPaginationTests(TestCase):
+    """Cursors walk ties on created_at without gaps or repeats; bad cursors are a 400."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('pager', 'pager@example.com', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        item = {'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'page', 'status': 'paused',
+                'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0}
+        self.client.post(reverse('bulk_create_vibe'), {'items': [item] * 8}, format='json')
+        ids = sorted(Vibe.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual(len(ids), 8)
+        moment = tz.now().replace(microsecond=0)
+        # two groups of equal created_at, so every page boundary falls inside a tie
+        Vibe.objects.filter(id__in=ids[:5]).update(created_at=moment)
+        Vibe.objects.filter(id__in=ids[5:]).update(created_at=moment + tz.timedelta(seconds=1))
+        self.expected = ids[5:][::-1] + ids[:5][::-1]
+
+    def test_ties(self):
+        seen, cursor = [], None
+        while True:
+            cache.clear()
+            params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            body = self.client.get(reverse('vibe_history'), params).json()
+            seen += [item['id'] for item in body['data']]
+            cursor = body['pagination']['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_tampered_cursor(self):
+        for cursor in ('not a cursor', base64.urlsafe_b64encode(b'2026-01-01T00:00:00|x').decode(),
+                       base64.urlsafe_b64encode(b'2026-13-45T00:00:00|1').decode(), '%%%'):
+            response = self.client.get(reverse('vibe_history'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertFalse(response.json()['status'])
+
+
+class SingleRunningVibeTests(TestCase):
+    """Starting a vibe stops the user's previous one; current-vibe follows."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('single', 'single@example.com', 'secret123')
+        Profile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = {'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'one',
+                     'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0}
+
+    def assertCurrent(self, vibe_id):
+        self.assertEqual(list(Vibe.objects.filter(user=self.user, status='running').values_list('id', flat=True)),
+                         [vibe_id])
+        self.assertEqual(Profile.objects.get(user=self.user).current_vibe_id, vibe_id)
+        cache.clear()   # invalidation runs on commit, which TestCase never reaches
+        self.assertEqual(self.client.get(reverse('current_vibe')).json()['data']['id'], vibe_id)
+
+    def test_start_stops_previous(self):
+        first = self.client.post(reverse('create_vibe'), self.item, format='json').json()['data']['id']
+        self.assertCurrent(first)
+
+        second = self.client.post(reverse('create_vibe'), self.item, format='json').json()['data']['id']
+        self.assertCurrent(second)
+        self.assertEqual(Vibe.objects.get(id=first).status, 'paused')
+
+        response = self.client.post(reverse('bulk_create_vibe'), {'items': [self.item, self.item]}, format='json')
+        third, fourth = [item['data']['id'] for item in response.json()['data']]
+        self.assertCurrent(fourth)
+        self.assertEqual(Vibe.objects.get(id=third).status, 'paused')
+
+        response = self.client.post(reverse('bulk_update_vibe_status'), {'items': [
+            {'id': first, 'status': 'running'}, {'id': second, 'status': 'running'},
+        ]}, format='json')
+        self.assertEqual([item['new_status'] for item in response.json()['data']], ['paused', 'running'])
+        self.assertCurrent(second)
+
+        self.client.post(reverse('update_vibe_status', args=[second]), {'status': 'paused'}, format='json')
+        self.assertIsNone(Profile.objects.get(user=self.user).current_vibe_id)
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('current_vibe')).status_code, 404)
+
+
+class BulkVibeTests(TestCase):
+    """Bulk endpoints report every item and only touch the caller's own vibes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bulk', 'bulk@example.com', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = {'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'bulk',
+                     'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0}
+        self.events = []
+        events.bus.add_listener(self.events.append)
+        self.addCleanup(events.bus.remove_listener, self.events.append)
+
+    def bulk_create(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('bulk_create_vibe'), {'items': items}, format='json')
+
+    def test_mixed_items(self):
+        response = self.bulk_create([self.item, dict(self.item, mood_bucket='nope'), dict(self.item, hours=-1)])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertTrue(body['status'])
+        self.assertEqual([(item['index'], item['status']) for item in body['data']],
+                         [(0, True), (1, False), (2, False)])
+        self.assertEqual(list(Vibe.objects.filter(user=self.user).values_list('id', flat=True)),
+                         [body['data'][0]['data']['id']])
+
+    def test_all_invalid(self):
+        response = self.bulk_create([dict(self.item, mood_bucket='nope'), dict(self.item, mood_slider=2)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['status'])
+        self.assertEqual([item['status'] for item in response.json()['data']], [False, False])
+        self.assertFalse(Vibe.objects.exists())
+        self.assertEqual(self.events, [])
+
+    def test_status_update_of_other_users_vibe(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', 'other@example.com', 'secret123'))
+        theirs = other.post(reverse('create_vibe'), self.item, format='json').json()['data']['id']
+        mine = self.client.post(reverse('create_vibe'), self.item, format='json').json()['data']['id']
+
+        response = self.client.post(reverse('bulk_update_vibe_status'), {'items': [
+            {'id': theirs, 'status': 'paused'}, {'id': mine, 'status': 'paused'},
+        ]}, format='json')
+        self.assertEqual([(item['id'], item['status']) for item in response.json()['data']],
+                         [(theirs, False), (mine, True)])
+        self.assertEqual(response.json()['data'][0]['errors'], 'Vibe not found')
+        self.assertEqual(Vibe.objects.get(id=theirs).status, 'running')
+
+
+class VibeStatusTransitionTests(TestCase):
+    """Expired or timed-out vibes cannot be restarted; the sweeper expires them."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('timer', 'timer@example.com', 'secret123')
+        Profile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.events = []
+        events.bus.add_listener(self.events.append)
+        self.addCleanup(events.bus.remove_listener, self.events.append)
+
+    def create(self):
+        return self.client.post(reverse('create_vibe'), {
+            'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'timer',
+            'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0,
+        }, format='json').json()['data']['id']
+
+    def test_expire_vibes(self):
+        vibe_id = self.create()
+        Vibe.objects.filter(id=vibe_id).update(end_time=tz.now() - tz.timedelta(seconds=1))
+        self.events.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expiry.expire_vibes(), 1)
+
+        vibe = Vibe.objects.get(id=vibe_id)
+        self.assertEqual((vibe.status, vibe.is_active), ('expired', False))
+        self.assertIsNone(Profile.objects.get(user=self.user).current_vibe_id)
+        self.assertEqual([(e['event'], e['vibe']['id'], e['vibe']['status']) for e in self.events],
+                         [('expired', vibe_id, 'expired')])
+
+    def test_no_restart(self):
+        expired, timed_out = self.create(), self.create()
+        Vibe.objects.filter(id=expired).update(status='expired', is_active=False)
+        Vibe.objects.filter(id=timed_out).update(end_time=tz.now() - tz.timedelta(seconds=1))
+        counts = sorted(VibeGridCell.objects.values_list('cell', 'running'))
+
+        for vibe_id, new_status in ((expired, 'running'), (expired, 'paused'), (timed_out, 'running')):
+            response = self.client.post(reverse('update_vibe_status', args=[vibe_id]), {'status': new_status},
+                                        format='json')
+            self.assertEqual(response.status_code, 400, (vibe_id, new_status))
+        response = self.client.post(reverse('bulk_update_vibe_status'), {'items': [
+            {'id': expired, 'status': 'running'}, {'id': timed_out, 'status': 'running'},
+        ]}, format='json')
+        self.assertEqual([item['status'] for item in response.json()['data']], [False, False])
+
+        self.assertEqual(Vibe.objects.get(id=expired).status, 'expired')
+        self.assertEqual(sorted(VibeGridCell.objects.values_list('cell', 'running')), counts)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                        'LOCATION': 'vibes-read-cache-tests'}})
+class VibeReadCacheTests(TestCase):
+    """Repeat reads are served from the cache; a committed write refreshes them."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached', 'cached@example.com', 'secret123')
+        Profile.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_vibe'), {
+                'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': text,
+                'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0,
+            }, format='json')
+        return response.json()['data']['id']
+
+    def test_second_get_runs_no_queries(self):
+        self.create('first')
+        for name in ('current_vibe', 'vibe_history'):
+            first = self.client.get(reverse(name))
+            self.assertEqual(first.status_code, 200)
+            with self.assertNumQueries(0):
+                second = self.client.get(reverse(name))
+            self.assertEqual(second.json(), first.json())
+
+    def test_write_refreshes_body(self):
+        first = self.create('first')
+        self.assertEqual(self.client.get(reverse('current_vibe')).json()['data']['id'], first)
+        self.assertEqual([row['id'] for row in self.client.get(reverse('vibe_history')).json()['data']], [first])
+
+        second = self.create('second')
+        self.assertEqual(self.client.get(reverse('current_vibe')).json()['data']['id'], second)
+        self.assertEqual([row['id'] for row in self.client.get(reverse('vibe_history')).json()['data']],
+                         [second, first])
+
+    def test_conditional_get(self):
+        self.create('first')
+        for name, view, build in (('current_vibe', LatestRunningVibeAPIView, 'build'),
+                                  ('vibe_history', VibeHistoryView, 'build_page')):
+            etag = self.client.get(reverse(name))['ETag']
+            with self.assertNumQueries(0), mock.patch.object(view, build, side_effect=AssertionError):
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+
+        etags = [self.client.get(reverse(name))['ETag'] for name in ('current_vibe', 'vibe_history')]
+        self.create('second')
+        for name, etag in zip(('current_vibe', 'vibe_history'), etags):
+            response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(VIBES_EVENTS_REDIS_URL=None, VIBES_EVENTS_HEARTBEAT=0.2)
+class VibeEventStreamTests(TestCase):
+    """The SSE stream opens with a signed ticket and carries only the caller's events."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@example.com', 'secret123')
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'secret123')
+        self.vibe = Vibe.objects.create(
+            user=self.alice, mood_bucket='deep', mood_slider=0.5, mood_text='stream',
+            latitude=Decimal('12.9716'), longitude=Decimal('77.5946'), timer_seconds=600,
+            start_time=tz.now(), end_time=tz.now() + tz.timedelta(minutes=10), status='paused',
+        )
+
+    def ticket(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(reverse('vibe_events_ticket')).json()['data']['ticket']
+
+    def test_ticket_required(self):
+        token = Token.objects.create(user=self.alice)
+        self.assertEqual(self.client.get(reverse('vibe_events'), {'token': token.key}).status_code, 401)
+        self.assertEqual(self.client.get(reverse('vibe_events'), {'ticket': 'forged'}).status_code, 401)
+        self.assertEqual(APIClient().post(reverse('vibe_events_ticket')).status_code, 401)
+
+        ticket = self.ticket(self.alice)
+        with override_settings(VIBES_EVENTS_TICKET_MAX_AGE=-1):
+            self.assertEqual(self.client.get(reverse('vibe_events'), {'ticket': ticket}).status_code, 401)
+        self.assertEqual(events.ticket_user_id(ticket), self.alice.id)
+        # a valid ticket over WSGI: refused rather than pinning the worker
+        self.assertEqual(self.client.get(reverse('vibe_events'), {'ticket': ticket}).status_code, 503)
+
+    def test_area_validated(self):
+        ticket = self.ticket(self.alice)
+        for area in ({'lat': 'inf', 'lon': '0'}, {'lat': '91', 'lon': '0'}, {'lat': '0', 'lon': '-180.5'},
+                     {'lat': 'nan', 'lon': '0'}, {'lat': '0', 'lon': '0', 'radius': '0'}, {'lat': 'x', 'lon': '0'}):
+            response = self.client.get(reverse('vibe_events'), {'ticket': ticket, **area})
+            self.assertEqual(response.status_code, 400, area)
+
+    def test_cell_channels_carry_only_running_vibes(self):
+        # anyone may follow a cell: paused, hidden or finished vibes stay on the owner's channel
+        self.assertTrue(self.vibe.geohash_5)
+        cell, own = events.cell_channel(self.vibe.geohash_5), events.user_channel(self.alice.id)
+        with mock.patch.object(events.bus, 'publish') as publish:
+            for status in ('running', 'paused', 'pauseandhide', 'cancelled', 'expired'):
+                self.vibe.status = status
+                events.publish_vibe_event('status', self.vibe)
+            self.vibe.status, self.vibe.end_time = 'running', tz.now() - tz.timedelta(seconds=1)
+            self.vibe.save()
+            events.publish_vibe_event('status', self.vibe)
+            events.publish_vibe_event('expired', Vibe.objects.values(*services.EVENT_FIELDS).get(id=self.vibe.id))
+
+        channels = [call.args[0] for call in publish.call_args_list]
+        self.assertEqual([cell in sent for sent in channels], [True, False, False, False, False, False, False])
+        self.assertTrue(all(own in sent for sent in channels))
+
+    async def test_only_own_events(self):
+        responses, streams = [], []
+        for user in (self.alice, self.bob):
+            ticket = await sync_to_async(self.ticket)(user)
+            response = await self.async_client.get(reverse('vibe_events'), {'ticket': ticket})
+            self.assertEqual(response.status_code, 200)
+            stream = response.streaming_content
+            self.assertEqual(await anext(stream), b'retry: 5000\n\n')     # subscribed from here on
+            responses.append(response)
+            streams.append(stream)
+        alice, bob = streams
+
+        try:
+            self.vibe.status = 'running'
+            events.publish_vibe_event('status', self.vibe)
+
+            chunk = (await asyncio.wait_for(anext(alice), 5)).decode()
+            self.assertTrue(chunk.startswith('event: status\n'), chunk)
+            self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['id'], self.vibe.id)
+            self.assertEqual(await asyncio.wait_for(anext(bob), 5), b': ping\n\n')
+        finally:
+            # close the view's own generators too (a server drops them on disconnect),
+            # so the subscriptions end before the test's event loop does
+            for stream, response in zip(streams, responses):
+                await stream.aclose()
+                await response._iterator.aclose()
+
+    async def test_disconnect_unsubscribes(self):
+        ticket = await sync_to_async(self.ticket)(self.alice)
+        channel = events.user_channel(self.alice.id)
+        disconnect = asyncio.Event()
+        subscribed = []
+
+        def on_send(message):
+            if message.get('body') == b'retry: 5000\n\n':
+                subscribed.append(channel in events.bus._subscribers)
+                disconnect.set()
+
+        # the stream never ends by itself: only the disconnect can finish this request
+        status, _ = await asyncio.wait_for(
+            asgi_get(reverse('vibe_events'), {'ticket': ticket}, on_send=on_send, disconnect=disconnect), 5)
+        self.assertEqual((status, subscribed), (200, [True]))
+        self.assertNotIn(channel, events.bus._subscribers)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Retried create-vibe requests replay the first response instead of inserting again."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('retry', 'retry@example.com', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.item = {'mood_bucket': 'deep', 'mood_slider': 0.5, 'mood_text': 'retry',
+                     'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0}
+
+    def post(self, item, key):
+        return self.client.post(reverse('create_vibe'), item, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        first = self.post(self.item, 'abc')
+        retry = self.post(self.item, 'abc')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Vibe.objects.filter(user=self.user).count(), 1)
+
+        self.assertEqual(self.post(dict(self.item, mood_text='other'), 'abc').status_code, 422)
+        self.assertEqual(self.post(self.item, 'def').status_code, 201)
+        self.assertEqual(Vibe.objects.filter(user=self.user).count(), 2)
+
+    def test_retry_while_in_flight(self):
+        # retries sent while the first request is inside the write path are answered at once
+        retries = []
+
+        def create_vibe(*args, real=services.create_vibe):
+            retries.append(self.post(self.item, 'abc'))
+            retries.append(self.post(dict(self.item, mood_text='other'), 'abc'))
+            return real(*args)
+
+        with mock.patch.object(services, 'create_vibe', create_vibe):
+            first = self.post(self.item, 'abc')
+        self.assertEqual(first.status_code, 201)
+        same, other = retries
+        self.assertEqual((same.status_code, same['Retry-After']), (409, '1'))
+        self.assertEqual(other.status_code, 422)
+        self.assertEqual(self.post(self.item, 'abc')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Vibe.objects.filter(user=self.user).count(), 1)
+
+
+@override_settings(VIBES_ROLLUP_LAG_SECONDS=0)
+class VibeRollupTests(TestCase):
+    """Rollups count vibes under the city their owner had when creating them."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('rollup', 'rollup@example.com', 'secret123')
+        self.profile = Profile.objects.create(user=self.user, city='Pune')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, slider):
+        return self.client.post(reverse('create_vibe'), {
+            'mood_bucket': 'deep', 'mood_slider': slider, 'mood_text': 'rollup',
+            'latitude': '12.9716', 'longitude': '77.5946', 'hours': 1, 'minutes': 0, 'seconds': 0,
+        }, format='json').json()['data']['id']
+
+    def rollup(self, grain):
+        totals = {}
+        for row in VibeRollup.objects.filter(grain=grain):
+            vibes, slider_sum = totals.get((row.city, row.mood_bucket, row.status), (0, 0))
+            totals[(row.city, row.mood_bucket, row.status)] = (vibes + row.vibes, slider_sum + row.slider_sum)
+        return {key: (vibes, round(slider_sum / vibes, 6)) for key, (vibes, slider_sum) in totals.items()}
+
+    def test_refresh_rollups(self):
+        self.create(0.2)
+        second = self.create(0.6)       # pauses the first
+        self.assertGreaterEqual(rollups.refresh_rollups(), 1)
+        expected = {('Pune', 'deep', 'paused'): (1, 0.2), ('Pune', 'deep', 'running'): (1, 0.6)}
+        self.assertEqual(self.rollup('hour'), expected)
+        self.assertEqual(self.rollup('day'), expected)
+
+        self.profile.city = 'Goa'
+        self.profile.save()
+        self.client.post(reverse('update_vibe_status', args=[second]), {'status': 'paused'}, format='json')
+        self.create(0.9)
+        rollups.refresh_rollups()
+        expected = {('Pune', 'deep', 'paused'): (2, 0.4), ('Goa', 'deep', 'running'): (1, 0.9)}
+        self.assertEqual(self.rollup('hour'), expected)
+        self.assertEqual(self.rollup('day'), expected)
+
+
+class VibeArchiveTests(TestCase):
+    """History pages read the same before and after vibes are archived."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('archive', 'archive@example.com', 'secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        now = tz.now()
+        vibes = []
+        for i, days in enumerate([1, 2, 200, 200, 300, 301, 400, 401, 402]):
+            created = now - tz.timedelta(days=days, minutes=i)
+            vibes.append(Vibe(
+                user=self.user, mood_bucket='deep' if i % 2 else 'lighthearted', mood_slider=0.5,
+                mood_text=f'vibe {i}', latitude=Decimal('12.12345678901234'), longitude=Decimal('-0.5'),
+                timer_seconds=600, start_time=created, end_time=created + tz.timedelta(minutes=10),
+                status='paused' if i % 3 else 'expired',
+            ))
+        Vibe.objects.bulk_create(vibes)
+        for vibe in vibes:
+            Vibe.objects.filter(id=vibe.id).update(created_at=vibe.start_time)
+
+    def walk(self, params):
+        rows, cursor = [], None
+        while True:
+            response = self.client.get(reverse('vibe_history'), dict(params, **({'cursor': cursor} if cursor else {})))
+            rows += response.json()['data']
+            cursor = response.json()['pagination']['next_cursor']
+            if not cursor:
+                return rows
+
+    def test_history_merges_archived_segments(self):
+        since, until = (tz.now() - tz.timedelta(days=days) for days in (250, 350))
+        combos = [{'page_size': 2}, {'page_size': 3, 'mood_bucket': 'deep'}, {'status': 'expired'},
+                  {'page_size': 2, 'start_after': since.isoformat()}, {'end_before': until.isoformat()}]
+        before = [self.walk(params) for params in combos]
+
+        cache.clear()
+        self.assertEqual(archive.archive_vibes(batch_size=4), 7)
+        self.assertEqual(Vibe.objects.count(), 2)
+        self.assertEqual(sum(VibeArchiveSegment.objects.values_list('rows', flat=True)), 7)
+
+        self.assertEqual(before, [self.walk(params) for params in combos])
+
+    def test_history_skips_segments_outside_the_range(self):
+        archive.archive_vibes()
+        since = tz.now() - tz.timedelta(days=250)
+        with mock.patch.object(archive, 'decode_segment', wraps=archive.decode_segment) as decode:
+            rows = self.walk({'start_after': since.isoformat()})
+        self.assertEqual([row['mood_text'] for row in rows], ['vibe 0', 'vibe 1', 'vibe 2', 'vibe 3'])
+        self.assertEqual(decode.call_count, 1)      # the 200-days-ago month only
+
+
+class VibeExportTests(TestCase):
+    """Exports hold every row in every format; only staff may widen the scope."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', 'exporter@example.com', 'secret123')
+        self.other = User.objects.create_user('exported', 'exported@example.com', 'secret123')
+        self.staff = User.objects.create_user('auditor', 'auditor@example.com', 'secret123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        now = tz.now()
+        Vibe.objects.bulk_create([
+            Vibe(user=user, mood_bucket='deep', mood_slider=0.25 * i, mood_text=f'line {i}, "quoted"\nnext',
+                 latitude=Decimal('12.12345678901234'), longitude=Decimal('-0.00000000000001'),
+                 address='' if i % 2 else 'Somewhere', timer_seconds=600, start_time=now,
+                 end_time=now + tz.timedelta(minutes=10), status='paused')
+            for i, user in enumerate([self.user, self.other, self.user, self.other, self.user])
+        ])
+
+    def expected(self, **filters):
+        rows = Vibe.objects.filter(**filters).order_by('user_id', 'id').values_list(*EXPORT_FIELDS)
+        return [[value.isoformat() if isinstance(value, datetime.datetime)
+                 else str(value) if isinstance(value, Decimal) else value for value in row] for row in rows]
+
+    def export(self, client=None, **params):
+        response = (client or self.client).get(reverse('export_vibes'), params)
+        if response.status_code != 200:
+            return response.status_code, None
+        body = b''.join(response.streaming_content)
+        return 200, gzip.decompress(body) if params.get('gzip') == 'true' else body
+
+    def parse(self, body, export_format):
+        text = body.decode()
+        if export_format == 'csv':
+            header, *rows = csv.reader(io.StringIO(text))
+            self.assertEqual(tuple(header), EXPORT_FIELDS)
+            return rows
+        return [[json.loads(line)[field] for field in EXPORT_FIELDS] for line in text.splitlines()]
+
+    def as_csv(self, rows):
+        return [['' if value is None else str(value) for value in row] for row in rows]
+
+    def test_formats(self):
+        mine = self.expected(user=self.user)
+        for compress in ('false', 'true'):
+            _, body = self.export(export_format='ndjson', gzip=compress)
+            self.assertEqual(self.parse(body, 'ndjson'), mine)
+            _, body = self.export(export_format='csv', gzip=compress)
+            self.assertEqual(self.parse(body, 'csv'), self.as_csv(mine))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'vibes.csv.gz')
+            call_command('export_vibes', user='exported', export_format='csv', gzip=True, output=path,
+                         chunk_size=2, stderr=io.StringIO())
+            with open(path, 'rb') as exported:
+                body = gzip.decompress(exported.read())
+        self.assertEqual(self.parse(body, 'csv'), self.as_csv(self.expected(user=self.other)))
+
+    def test_archived_rows(self):
+        old = tz.now() - tz.timedelta(days=400)
+        for vibe_id in Vibe.objects.order_by('id').values_list('id', flat=True)[1:4]:
+            Vibe.objects.filter(id=vibe_id).update(created_at=old + tz.timedelta(minutes=vibe_id))
+        staff = APIClient()
+        staff.force_authenticate(self.staff)
+
+        def exports():
+            return [self.export(staff, all='true')[1], self.export(staff, export_format='csv', user_id=self.other.id)[1],
+                    self.export(export_format='csv', gzip='true')[1]]
+
+        before = exports()
+        self.assertEqual(archive.archive_vibes(), 3)
+        self.assertEqual(Vibe.objects.count(), 2)
+        self.assertEqual(exports(), before)
+
+    async def test_asgi_streams_lazily(self):
+        # Django 4.2's ASGI handler reads a sync body into a list before sending a byte
+        token = await sync_to_async(Token.objects.create)(user=self.user)
+        headers = {'Authorization': f'Token {token.key}'}
+        status, body = await asgi_get(reverse('export_vibes'), {'export_format': 'csv'}, headers)
+        self.assertEqual(status, 200)
+        expected = await sync_to_async(self.expected)(user=self.user)
+        self.assertEqual(self.parse(body, 'csv'), self.as_csv(expected))
+
+        pulled, pulled_at_send = [], []
+
+        def stream_export(*args):
+            for chunk in (b'a', b'b', b'c'):
+                pulled.append(chunk)
+                yield chunk
+
+        def on_send(message):
+            if message.get('body'):
+                pulled_at_send.append(len(pulled))
+
+        with mock.patch('apps.vibes.views.stream_export', stream_export):
+            status, body = await asgi_get(reverse('export_vibes'), headers=headers, on_send=on_send)
+        self.assertEqual(body, b'abc')
+        self.assertEqual(pulled_at_send, [1, 2, 3])
+
+    def test_segments_held_per_user(self):
+        # every user archived in one month: their segments' id ranges all overlap
+        users = User.objects.bulk_create([User(username=f'bulk{i}') for i in range(12)])
+        old, now = tz.now() - tz.timedelta(days=400), tz.now()
+        Vibe.objects.bulk_create([
+            Vibe(user=user, mood_bucket='deep', mood_slider=0.5, mood_text='old', latitude=Decimal('1'),
+                 longitude=Decimal('2'), timer_seconds=600, start_time=now, end_time=now, status='paused')
+            for _ in range(3) for user in users
+        ])
+        Vibe.objects.filter(user__in=users).update(created_at=old.replace(day=1, hour=12))
+        expected = self.expected()
+        self.assertEqual(archive.archive_vibes(), 36)
+        self.assertEqual(VibeArchiveSegment.objects.values('month').distinct().count(), 1)
+
+        opened, most = [0], [0]
+
+        def archived_rows(segment_id, real=export._archived_rows):
+            opened[0] += 1
+            most[0] = max(most[0], opened[0])
+            yield from real(segment_id)
+            opened[0] -= 1
+
+        with mock.patch.object(export, '_archived_rows', archived_rows):
+            body = b''.join(export.stream_export(chunk_size=5))
+        self.assertEqual(most[0], 1)
+        self.assertEqual(self.parse(body, 'ndjson'), expected)
+
+    def test_scoping(self):
+        self.assertEqual(self.export(all='true')[0], 403)
+        self.assertEqual(self.export(user_id=self.other.id)[0], 403)
+
+        staff = APIClient()
+        staff.force_authenticate(self.staff)
+        _, body = self.export(staff, all='true')
+        self.assertEqual(self.parse(body, 'ndjson'), self.expected())
+        _, body = self.export(staff, user_id=self.other.id)
+        self.assertEqual(self.parse(body, 'ndjson'), self.expected(user=self.other))
+        _, body = self.export(staff)
+        self.assertEqual(self.parse(body, 'ndjson'), [])
@@ -8,4 +8,13 @@ urlpatterns = [
     path('api/v1/vibe-history/', views.VibeHistoryView.as_view(), name='vibe_history'),
     path('api/v1/vibe/<int:vibe_id>/update-status/', views.UpdateVibeStatusView.as_view(), name='update_vibe_status'),
     path('api/v1/current-vibe/', views.LatestRunningVibeAPIView.as_view(), name='current_vibe'),
+    path('api/v1/bulk/create-vibe/', views.BulkCreateVibeView.as_view(), name='bulk_create_vibe'),
+    path('api/v1/bulk/update-status/', views.BulkUpdateVibeStatusView.as_view(), name='bulk_update_vibe_status'),
+    path('api/v1/vibe/<int:vibe_id>/matches/', views.VibeMatchesView.as_view(), name='vibe_matches'),
+    path('api/v1/nearby/', views.NearbyVibesView.as_view(), name='nearby_vibes'),
+    path('api/v1/map/cells/', views.VibeMapCellsView.as_view(), name='vibe_map_cells'),
+    path('api/v1/analytics/rollups/', views.VibeRollupView.as_view(), name='vibe_rollups'),
+    path('api/v1/export/', views.VibeExportView.as_view(), name='export_vibes'),
+    path('api/v1/events/', views.vibe_events, name='vibe_events'),
+    path('api/v1/events/ticket/', views.VibeEventTicketView.as_view(), name='vibe_events_ticket'),
 ]
\ No newline at end of file
@@ -1,18 +1,104 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError
-from django.db import IntegrityError
-from .serializers import CreateVibeSerializer, VibeHistorySerializer, VibeStatusUpdateSerializer
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.core import signing
+from django.http import JsonResponse, StreamingHttpResponse
+from .serializers import (
+    CreateVibeSerializer, VibeValuesSerializer, VibeStatusUpdateSerializer, VibeStatusChangeSerializer,
+)
 from rest_framework.views import APIView
 from django.db.models import Q
-from django.utils.dateparse import parse_datetime
-from .models import Vibe
+from django.utils import timezone as tz
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Vibe, VibeRollup
+from apps.users import avatars
+from apps.users.authentication import CachedTokenAuthentication
+from apps.users.idempotency import idempotent
+from apps.users.models import Profile
+from .pagination import get_page_size, paginate_keyset
+from .cache import HISTORY_PARAMS, cached_entry, etag_matches, normalize_params, response_key
+from .export import CONTENT_TYPES, FORMATS, stream_export
+from . import archive, events, geo, grid, matching, services
+from config.streaming import async_chunks, is_asgi
+
+NEARBY_DEFAULT_RADIUS_KM = 5.0
+NEARBY_MAX_RADIUS_KM     = 50.0
+NEARBY_DEFAULT_LIMIT     = 50
+NEARBY_MAX_LIMIT         = 200
+EVENTS_MAX_RADIUS_KM     = 20.0
+EVENTS_MAX_CELLS         = 256         # channels per stream; the polar caps exceed it
+MATCH_DEFAULT_RADIUS_KM  = 10.0
+MATCH_MAX_RADIUS_KM      = 50.0
+MATCH_DEFAULT_K          = 20
+MATCH_MAX_K              = 100
+MAP_MAX_ZOOM             = 22
+ROLLUP_DEFAULT_DAYS      = 7
+ROLLUP_MAX_DAYS          = {'hour': 31, 'day': 366}
+
+
+def conditional_response(request, entry):
+    """Response for a cached ``(status_code, payload, etag)`` entry, 304 when the client's copy is current."""
+    code, payload, etag = entry
+    if code != status.HTTP_200_OK:
+        return Response(payload, status=code)
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(payload, status=code, headers={'ETag': etag})
+
+
+def created_vibe_data(vibe):
+    return {
+        "id":           vibe.id,
+        "mood_bucket":  vibe.mood_bucket,
+        "mood_slider":  vibe.mood_slider,
+        "mood_text":    vibe.mood_text,
+        "latitude":     float(vibe.latitude),
+        "longitude":    float(vibe.longitude),
+        "address":      vibe.address,
+        "timer_seconds":vibe.timer_seconds,
+        "end_time":     vibe.end_time.isoformat(),
+        "is_active":    vibe.is_active,
+        "status":       vibe.status
+    }
+
+
+def validation_sentence(detail):
+    # ---- collect missing‑field names ---------------------------------
+    missing = [
+        field
+        for field, msgs in detail.items()
+        if (isinstance(msgs, (list, tuple)) and msgs and msgs[0] == "This field is required.")
+        or msgs == "This field is required."
+    ]
+
+    if missing:
+        # join with comma and add grammar
+        return ", ".join(missing) + (" field is required." if len(missing) == 1
+                                     else " fields are required.")
+
+    # fallback – join all error strings
+    flat = [
+        f"{field}: {' '.join(msgs) if isinstance(msgs, (list, tuple)) else msgs}"
+        for field, msgs in detail.items()
+    ]
+    return " | ".join(flat)
+
 
 class CreateVibeView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class   = CreateVibeSerializer
 
+    @idempotent('create_vibe')
     def create(self, request, *args, **kwargs):
         try:
             serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -22,45 +108,14 @@ class CreateVibeView(generics.CreateAPIView):
             return Response({
                 "status": True,
                 "message": "Vibe created successfully",
-                "data": {
-                    "id":           vibe.id,
-                    "mood_bucket":  vibe.mood_bucket,
-                    "mood_slider":  vibe.mood_slider,
-                    "mood_text":    vibe.mood_text,
-                    "latitude":     float(vibe.latitude),
-                    "longitude":    float(vibe.longitude),
-                    "address":      vibe.address,
-                    "timer_seconds":vibe.timer_seconds,
-                    "end_time":     vibe.end_time.isoformat(),
-                    "is_active":    vibe.is_active,
-                    "status":       vibe.status
-                }
+                "data": created_vibe_data(vibe)
             }, status=status.HTTP_201_CREATED)
 
         except ValidationError as e:
-            # ---- collect missing‑field names ---------------------------------
-            missing = [
-                field
-                for field, msgs in e.detail.items()
-                if (isinstance(msgs, (list, tuple)) and msgs and msgs[0] == "This field is required.")
-                or msgs == "This field is required."
-            ]
-
-            if missing:
-                # join with comma and add grammar
-                sentence = ", ".join(missing) + (" field is required." if len(missing) == 1
-                                                else " fields are required.")
-            else:
-                # fallback – join all error strings
-                flat = [
-                    f"{field}: {' '.join(msgs) if isinstance(msgs, (list, tuple)) else msgs}"
-                    for field, msgs in e.detail.items()
-                ]
-                sentence = " | ".join(flat)
             return Response({
                 "status": False,
                 "message": "Validation Error",
-                "errors": sentence
+                "errors": validation_sentence(e.detail)
             }, status=400)
 
         except IntegrityError as e:
@@ -83,42 +138,10 @@ class VibeHistoryView(APIView):
     def get(self, request):
         try:
             user = request.user
-            vibes = Vibe.objects.filter(user=user)
-
-            # ── Optional filters ──────────────────────
-            status_param      = request.query_params.get('status')
-            is_active_param   = request.query_params.get('is_active')
-            mood_bucket_param = request.query_params.get('mood_bucket')
-            start_after       = request.query_params.get('start_after')
-            end_before        = request.query_params.get('end_before')
-
-            if status_param:
-                vibes = vibes.filter(status=status_param)
-
-            if is_active_param in ['true', 'false']:
-                vibes = vibes.filter(is_active=(is_active_param.lower() == 'true'))
 
-            if mood_bucket_param:
-                vibes = vibes.filter(mood_bucket=mood_bucket_param)
-
-            if start_after:
-                dt = parse_datetime(start_after)
-                if dt:
-                    vibes = vibes.filter(start_time__gte=dt)
-
-            if end_before:
-                dt = parse_datetime(end_before)
-                if dt:
-                    vibes = vibes.filter(end_time__lte=dt)
-
-            vibes = vibes.order_by('-created_at')
-
-            serializer = VibeHistorySerializer(vibes, many=True)
-            return Response({
-                "status": True,
-                "message": "Vibe history fetched successfully.",
-                "data": serializer.data
-            }, status=status.HTTP_200_OK)
+            cache_key = response_key(user.id, 'history', normalize_params(request.query_params, HISTORY_PARAMS))
+            entry = cached_entry(cache_key, lambda: self.build_page(request, user))
+            return conditional_response(request, entry)
 
         except ValidationError as e:
             return Response({
@@ -141,12 +164,88 @@ class VibeHistoryView(APIView):
                 "errors": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def build_page(self, request, user):
+        vibes = Vibe.objects.filter(user=user)
+
+        # ── Optional filters ──────────────────────
+        status_param      = request.query_params.get('status')
+        is_active_param   = request.query_params.get('is_active')
+        mood_bucket_param = request.query_params.get('mood_bucket')
+        start_after       = request.query_params.get('start_after')
+        end_before        = request.query_params.get('end_before')
+
+        # the same filters for archived rows (apps.vibes.archive), which
+        # have all ended, so plain comparisons do
+        checks = []
+        start_dt = end_dt = None
+
+        # running rows past their end_time read as expired / inactive
+        if status_param == 'running':
+            vibes = vibes.running()
+        elif status_param == 'expired':
+            vibes = vibes.expired()
+        elif status_param:
+            vibes = vibes.filter(status=status_param)
+        if status_param:
+            checks.append(lambda row: row['status'] == status_param)
+
+        if is_active_param == 'true':
+            vibes = vibes.filter(is_active=True).exclude(pk__in=Vibe.objects.timed_out().filter(user=user))
+            checks.append(lambda row: row['is_active'])
+        elif is_active_param == 'false':
+            vibes = vibes.filter(Q(is_active=False) | Q(pk__in=Vibe.objects.timed_out().filter(user=user)))
+            checks.append(lambda row: not row['is_active'])
+
+        if mood_bucket_param:
+            vibes = vibes.filter(mood_bucket=mood_bucket_param)
+            checks.append(lambda row: row['mood_bucket'] == mood_bucket_param)
+
+        if start_after:
+            start_dt = parse_datetime(start_after)
+            if start_dt:
+                vibes = vibes.filter(start_time__gte=start_dt)
+                checks.append(lambda row: row['start_time'] >= start_dt)
+
+        if end_before:
+            end_dt = parse_datetime(end_before)
+            if end_dt:
+                vibes = vibes.filter(end_time__lte=end_dt)
+                checks.append(lambda row: row['end_time'] <= end_dt)
+
+        def archived(before, after, limit):
+            return archive.archived_rows(
+                user.id, before, after, limit, match=lambda row: all(check(row) for check in checks),
+                start_after=start_dt, end_before=end_dt,
+            )
+
+        # ── Keyset pagination on (created_at, id) ─────
+        page_size = get_page_size(request)
+        rows, next_cursor = paginate_keyset(
+            vibes.values(*VibeValuesSerializer.fields), request.query_params.get('cursor'), page_size,
+            extra=archived,
+        )
+
+        serializer = VibeValuesSerializer(rows, many=True)
+        payload = {
+            "status": True,
+            "message": "Vibe history fetched successfully.",
+            "data": serializer.data,
+            "pagination": {
+                "page_size":   page_size,
+                "next_cursor": next_cursor,
+                "has_more":    next_cursor is not None,
+            }
+        }
+        return status.HTTP_200_OK, payload, rows
+
 class UpdateVibeStatusView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def post(self, request, vibe_id):
+        services.lock_user(request.user.id)
         try:
-            vibe = Vibe.objects.get(id=vibe_id, user=request.user)
+            vibe = Vibe.objects.select_for_update().get(id=vibe_id, user=request.user)
         except Vibe.DoesNotExist:
             return Response({
                 "status": False,
@@ -155,7 +254,11 @@ class UpdateVibeStatusView(APIView):
 
         serializer = VibeStatusUpdateSerializer(vibe, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            previous = vibe.status
+            if serializer.validated_data.get('status') == 'running':
+                services.stop_running(request.user.id, exclude=[vibe.id])
+            vibe = serializer.save()
+            services.status_changed(vibe, previous)
             return Response({
                 "status": True,
                 "message": "Vibe status updated successfully",
@@ -168,22 +271,623 @@ class UpdateVibeStatusView(APIView):
                 "errors": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
+def bulk_items(request):
+    """``items`` list of a bulk request, or an error Response."""
+    items = request.data.get('items') if isinstance(request.data, dict) else request.data
+    max_items = getattr(settings, 'VIBES_BULK_MAX_ITEMS', 100)
+
+    if not isinstance(items, list) or not items:
+        return None, Response({
+            "status": False,
+            "message": "Validation Error",
+            "errors": "items must be a non-empty list."
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(items) > max_items:
+        return None, Response({
+            "status": False,
+            "message": "Validation Error",
+            "errors": f"At most {max_items} items per request."
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return items, None
+
+
+class BulkCreateVibeView(APIView):
+    """
+    Create many vibes in one request: ``{"items": [<create-vibe body>, ...]}``.
+
+    Every item is validated first; the valid ones are inserted with one
+    bulk INSERT in a single transaction. ``data`` reports each item in
+    request order. A user has one running vibe, so only the last running
+    item stays running and it pauses the previous one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items, error = bulk_items(request)
+        if error:
+            return error
+
+        results, valid = [], []
+        for index, item in enumerate(items):
+            serializer = CreateVibeSerializer(data=item, context={'request': request})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({
+                    "index": index,
+                    "status": False,
+                    "errors": validation_sentence(serializer.errors)
+                })
+
+        if not valid:
+            return Response({
+                "status": False,
+                "message": f"0 of {len(items)} vibes created",
+                "data": results
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            vibes = services.bulk_create_vibes(request.user, [data for _, data in valid])
+        except IntegrityError as e:
+            return Response({
+                "status": False,
+                "message": "Database Error",
+                "errors": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        for (index, _), vibe in zip(valid, vibes):
+            results[index] = {
+                "index": index,
+                "status": True,
+                "data": created_vibe_data(vibe)
+            }
+
+        return Response({
+            "status": True,
+            "message": f"{len(vibes)} of {len(items)} vibes created",
+            "data": results
+        }, status=status.HTTP_201_CREATED)
+
+
+class BulkUpdateVibeStatusView(APIView):
+    """
+    Change the status of many vibes: ``{"items": [{"id": 1, "status": "paused"}, ...]}``.
+
+    Ownership is checked with one query and the changes are applied with one
+    UPDATE per target status, all in one transaction. When an id repeats,
+    its last item wins; of several vibes set to running only the last stays
+    running and ``new_status`` reports the others as paused.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items, error = bulk_items(request)
+        if error:
+            return error
+
+        results, changes = [], {}
+        for index, item in enumerate(items):
+            serializer = VibeStatusChangeSerializer(data=item)
+            if serializer.is_valid():
+                vibe_id = serializer.validated_data['id']
+                changes[vibe_id] = serializer.validated_data['status']
+                results.append((index, vibe_id))
+            else:
+                results.append({
+                    "index": index,
+                    "status": False,
+                    "errors": validation_sentence(serializer.errors)
+                })
+
+        updated, rejected = services.bulk_update_status(request.user, changes) if changes else ({}, {})
+
+        data = []
+        for result in results:
+            if isinstance(result, dict):
+                data.append(result)
+                continue
+            index, vibe_id = result
+            if vibe_id in updated:
+                data.append({"index": index, "status": True, "id": vibe_id, "new_status": updated[vibe_id]})
+            elif vibe_id in rejected:
+                data.append({"index": index, "status": False, "id": vibe_id, "errors": rejected[vibe_id]})
+            else:
+                data.append({"index": index, "status": False, "id": vibe_id, "errors": "Vibe not found"})
+
+        return Response({
+            "status": True,
+            "message": f"{sum(1 for item in data if item['status'])} of {len(items)} vibes updated",
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+
 class LatestRunningVibeAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
-        vibe = Vibe.objects.filter(user=user, status='running').order_by('-created_at').first()
-        
+
+        cache_key = response_key(user.id, 'current')
+        entry = cached_entry(cache_key, lambda: self.build(user))
+        return conditional_response(request, entry)
+
+    @staticmethod
+    def build(user):
+        # Profile.current_vibe points at the one running vibe (see services);
+        # running() still drops it once its timer ran out
+        vibe = (
+            Vibe.objects.running().filter(current_profiles__user=user)
+            .values(*VibeValuesSerializer.fields)
+            .first()
+        )
+
         if not vibe:
-            return Response({
+            return 404, {
                 "status": False,
                 "message": "No running vibe found."
-            }, status=404)
+            }, []
 
-        serializer = VibeHistorySerializer(vibe)
-        return Response({
+        serializer = VibeValuesSerializer(vibe)
+        return 200, {
             "status": True,
             "message": "Latest running vibe fetched successfully.",
             "data": serializer.data
-        })
\ No newline at end of file
+        }, [vibe]
+
+
+class NearbyVibesView(APIView):
+    """
+    Running vibes around ``lat``/``lon`` within ``radius`` km, closest first.
+
+    Candidates come from the geohash cell indexes (one IN lookup on the
+    finest precision that keeps the cover small), are trimmed to the
+    bounding box in SQL and ranked by haversine distance in python.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            lat    = float(request.query_params['lat'])
+            lon    = float(request.query_params['lon'])
+            radius = float(request.query_params.get('radius', NEARBY_DEFAULT_RADIUS_KM))
+            limit  = int(request.query_params.get('limit', NEARBY_DEFAULT_LIMIT))
+        except KeyError as e:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"{e.args[0]} field is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "lat, lon, radius and limit must be numbers."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "lat must be within ±90 and lon within ±180."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 0 < radius <= NEARBY_MAX_RADIUS_KM:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"radius must be between 0 and {NEARBY_MAX_RADIUS_KM:g} km."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = max(1, min(limit, NEARBY_MAX_LIMIT))
+
+        precision, cells = geo.cover_circle(lat, lon, radius)
+        min_lat, min_lon, max_lat, max_lon = geo.bounding_box(lat, lon, radius)
+
+        vibes = (
+            Vibe.objects
+            .running()
+            .filter(self.cell_filter(precision, cells))
+            .filter(latitude__gte=min_lat, latitude__lte=max_lat)
+            .exclude(user=request.user)
+        )
+        if -180 <= min_lon and max_lon <= 180:
+            vibes = vibes.filter(longitude__gte=min_lon, longitude__lte=max_lon)
+
+        ranked = []
+        for row in vibes.values(*VibeValuesSerializer.fields, *self.USER_FIELDS):
+            distance = geo.haversine_km(lat, lon, float(row['latitude']), float(row['longitude']))
+            if distance <= radius:
+                ranked.append((distance, row))
+        ranked.sort(key=lambda item: item[0])
+
+        rows = [row for _, row in ranked[:limit]]
+        data = VibeValuesSerializer(rows, many=True).data
+        for item, (distance, row) in zip(data, ranked):
+            item['distance_km'] = round(distance, 3)
+            item['user'] = self.user_snippet(request, row)
+
+        return Response({
+            "status": True,
+            "message": "Nearby vibes fetched successfully.",
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def cell_filter(precision, cells):
+        if precision in geo.GEOHASH_PRECISIONS:
+            return Q(**{f'geohash_{precision}__in': cells})
+        # coarser than any stored precision: prefix ranges on the coarsest
+        # stored geohash ('{' sorts right after 'z', the last base32 digit)
+        field = f'geohash_{geo.GEOHASH_PRECISIONS[0]}'
+        return reduce(or_, (Q(**{f'{field}__gte': cell, f'{field}__lt': cell + '{'}) for cell in sorted(cells)))
+
+    # owner snippet, joined into the same query
+    USER_FIELDS = (
+        'user__username', 'user__first_name', 'user__last_name',
+        'user__profile__city', 'user__profile__avatar', 'user__profile__avatar_thumbnails',
+    )
+
+    @staticmethod
+    def user_snippet(request, row):
+        avatar = row['user__profile__avatar']
+        avatar_url = (
+            request.build_absolute_uri(Profile._meta.get_field('avatar').storage.url(avatar))
+            if avatar else None
+        )
+        return {
+            "username":   row['user__username'],
+            "first_name": row['user__first_name'],
+            "last_name":  row['user__last_name'],
+            "city":       row['user__profile__city'],
+            "avatar":     avatar_url,
+            "avatars":    avatars.urls(avatar, row['user__profile__avatar_thumbnails'],
+                                       request.build_absolute_uri),
+        }
+
+
+class VibeMatchesView(APIView):
+    """
+    Top ``k`` compatible running vibes of other users within ``radius`` km
+    of one of the caller's running vibes, best first. Ranking comes from
+    the in-memory index in apps.vibes.matching; rows are then read with
+    one primary-key lookup.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vibe_id):
+        try:
+            vibe = Vibe.objects.running().values(*matching.INDEX_FIELDS).get(id=vibe_id, user=request.user)
+        except Vibe.DoesNotExist:
+            return Response({
+                "status": False,
+                "message": "No running vibe found"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            radius = float(request.query_params.get('radius', MATCH_DEFAULT_RADIUS_KM))
+            k      = int(request.query_params.get('k', MATCH_DEFAULT_K))
+        except ValueError:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "radius and k must be numbers."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 0 < radius <= MATCH_MAX_RADIUS_KM:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"radius must be between 0 and {MATCH_MAX_RADIUS_KM:g} km."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        k = max(1, min(k, MATCH_MAX_K))
+        ranked = matching.get_index().top_k(vibe, k, radius)
+
+        rows = {
+            row['id']: row
+            for row in Vibe.objects.running()
+            .filter(id__in=[vibe_id for vibe_id, _, _ in ranked])
+            .values(*VibeValuesSerializer.fields, *NearbyVibesView.USER_FIELDS)
+        }
+        data = []
+        for match_id, score, distance in ranked:
+            row = rows.get(match_id)
+            if row is None:
+                continue                 # changed since the index saw it
+            item = VibeValuesSerializer(row).data
+            item['score'] = round(score, 4)
+            item['distance_km'] = round(distance, 3)
+            item['user'] = NearbyVibesView.user_snippet(request, row)
+            data.append(item)
+
+        return Response({
+            "status": True,
+            "message": "Vibe matches fetched successfully.",
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+
+class VibeMapCellsView(APIView):
+    """
+    Running vibe counts per geohash cell for a map viewport, broken down
+    by mood bucket. ``bbox`` is ``west,south,east,north`` in degrees
+    (west > east crosses the antimeridian) and ``zoom`` the web-map zoom
+    level that picks the cell size. Reads the VibeGridCell aggregates only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            west, south, east, north = (float(v) for v in request.query_params['bbox'].split(','))
+            zoom = int(request.query_params['zoom'])
+        except KeyError as e:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"{e.args[0]} field is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "bbox must be four numbers west,south,east,north and zoom an integer."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "bbox latitudes must be within ±90 with south <= north, longitudes within ±180."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if east < west:
+            east += 360                  # cells_covering splits the span at ±180
+        zoom = max(0, min(zoom, MAP_MAX_ZOOM))
+        precision, cells = grid.viewport_cells(south, west, north, east, zoom)
+
+        data = []
+        for cell in sorted(cells):
+            lat, lon = geo.decode(cell)
+            data.append({
+                "cell":         cell,
+                "latitude":     lat,
+                "longitude":    lon,
+                "running":      sum(cells[cell].values()),
+                "mood_buckets": cells[cell],
+            })
+
+        return Response({
+            "status": True,
+            "message": "Map cells fetched successfully.",
+            "data": {
+                "precision": precision,
+                "cells": data,
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class VibeExportView(APIView):
+    """
+    Stream the caller's full vibe history, archived vibes included, as
+    NDJSON (default) or CSV.
+
+    Query params: ``export_format`` (``ndjson``/``csv``), ``gzip=true``.
+    Staff may pass ``all=true`` for every user or ``user_id`` for one;
+    anyone else passing either gets a 403.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        compress      = request.query_params.get('gzip') == 'true'
+
+        if export_format not in FORMATS:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"export_format must be one of: {', '.join(FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        scoped = 'all' in request.query_params or 'user_id' in request.query_params
+        if scoped and not request.user.is_staff:
+            return Response({
+                "status": False,
+                "message": "Permission Denied",
+                "errors": "Only staff may export other users' vibes."
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        user_id = request.user.id
+        if request.user.is_staff:
+            if request.query_params.get('all') == 'true':
+                user_id = None
+            elif request.query_params.get('user_id', '').isdigit():
+                user_id = int(request.query_params['user_id'])
+
+        filename = f"vibes.{export_format}" + (".gz" if compress else "")
+        body = stream_export(user_id, export_format, compress)
+        if is_asgi(request):
+            body = async_chunks(body)
+        response = StreamingHttpResponse(body, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class VibeRollupView(APIView):
+    """
+    Staff-only analytics over the VibeRollup tables.
+
+    Query params: ``grain`` (``day`` default / ``hour``), ``from`` / ``to``
+    (ISO dates or datetimes, default the last 7 days) and optional
+    ``city``, ``mood_bucket`` and ``status`` filters.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        grain = request.query_params.get('grain', 'day')
+        if grain not in ROLLUP_MAX_DAYS:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"grain must be one of: {', '.join(ROLLUP_MAX_DAYS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            end   = self.parse_moment(request.query_params.get('to')) or tz.now()
+            start = self.parse_moment(request.query_params.get('from')) or end - tz.timedelta(days=ROLLUP_DEFAULT_DAYS)
+        except ValueError:
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": "from and to must be ISO dates or datetimes."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not start <= end <= start + tz.timedelta(days=ROLLUP_MAX_DAYS[grain]):
+            return Response({
+                "status": False,
+                "message": "Validation Error",
+                "errors": f"from must precede to by at most {ROLLUP_MAX_DAYS[grain]} days for {grain} grain."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = VibeRollup.objects.filter(grain=grain, bucket_start__gte=start, bucket_start__lt=end)
+        for field in ('city', 'mood_bucket', 'status'):
+            if field in request.query_params:
+                rollups = rollups.filter(**{field: request.query_params[field]})
+
+        data = [
+            {
+                "bucket_start":      rollup.bucket_start,
+                "city":              rollup.city,
+                "mood_bucket":       rollup.mood_bucket,
+                "status":            rollup.status,
+                "vibes":             rollup.vibes,
+                "avg_mood_slider":   rollup.avg_mood_slider,
+                "avg_timer_seconds": rollup.avg_timer_seconds,
+            }
+            for rollup in rollups.order_by('bucket_start', 'city', 'mood_bucket', 'status')
+        ]
+
+        return Response({
+            "status": True,
+            "message": "Vibe rollups fetched successfully.",
+            "data": data
+        }, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def parse_moment(value):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            moment = datetime.combine(day, datetime.min.time())
+        return moment if tz.is_aware(moment) else moment.replace(tzinfo=timezone.utc)
+
+
+class VibeEventTicketView(APIView):
+    """
+    A signed ticket for opening the events stream as ``?ticket=``; it
+    expires after ``VIBES_EVENTS_TICKET_MAX_AGE`` seconds.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            "status": True,
+            "message": "Stream ticket issued",
+            "data": {
+                "ticket": events.make_ticket(request.user.id),
+                "expires_in": getattr(settings, 'VIBES_EVENTS_TICKET_MAX_AGE', 60)
+            }
+        }, status=status.HTTP_200_OK)
+
+
+async def vibe_events(request):
+    """
+    Server-Sent Events stream of the caller's own vibe transitions
+    (``created``, ``status``, ``expired``) and, with ``lat``/``lon``, of
+    running vibes within ``radius`` km (default 5, max 20).
+
+    Plain async Django view, served on its own by the ASGI entry point
+    (config/asgi.py, gunicorn-events-cfg.py) where an idle stream is just
+    a parked coroutine; under WSGI it would pin a worker for good, so the
+    WSGI workers answer 503 and the proxy routes it away from them.
+    Browsers' EventSource cannot set headers, so instead of the
+    ``Authorization: Token`` header it may pass ``?ticket=`` from
+    VibeEventTicketView. The API token itself is never read from the URL.
+    """
+    header = request.headers.get('Authorization', '')
+    try:
+        if header.startswith('Token '):
+            user, _ = await sync_to_async(CachedTokenAuthentication().authenticate_credentials)(header[6:].strip())
+            user_id = user.id
+        else:
+            user_id = events.ticket_user_id(request.GET.get('ticket', ''))
+    except AuthenticationFailed as e:
+        return JsonResponse({
+            "status": False,
+            "message": "Authentication Error",
+            "errors": str(e.detail)
+        }, status=401)
+    except signing.BadSignature:
+        return JsonResponse({
+            "status": False,
+            "message": "Authentication Error",
+            "errors": "Invalid or expired stream ticket."
+        }, status=401)
+
+    channels = {events.user_channel(user_id)}
+    try:
+        if 'lat' in request.GET and 'lon' in request.GET:
+            lat, lon = float(request.GET['lat']), float(request.GET['lon'])
+            radius = min(float(request.GET.get('radius', NEARBY_DEFAULT_RADIUS_KM)), EVENTS_MAX_RADIUS_KM)
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius):
+                return JsonResponse({
+                    "status": False,
+                    "message": "Validation Error",
+                    "errors": "lat must be within ±90, lon within ±180 and radius above 0."
+                }, status=400)
+            box = geo.bounding_box(lat, lon, radius)
+            if geo.count_covering(*box, 5) > EVENTS_MAX_CELLS:
+                return JsonResponse({
+                    "status": False,
+                    "message": "Validation Error",
+                    "errors": "This area is too wide to follow; use a smaller radius or subscribe without lat/lon."
+                }, status=400)
+            cells = geo.cells_covering(*box, 5)
+            channels.update(events.cell_channel(cell) for cell in cells)
+    except ValueError:
+        return JsonResponse({
+            "status": False,
+            "message": "Validation Error",
+            "errors": "lat, lon and radius must be numbers."
+        }, status=400)
+
+    if not is_asgi(request):
+        return JsonResponse({
+            "status": False,
+            "message": "Service Unavailable",
+            "errors": "The event stream is only served by the ASGI server."
+        }, status=503)
+
+    heartbeat = getattr(settings, 'VIBES_EVENTS_HEARTBEAT', 15)
+
+    async def stream():
+        async with events.bus.subscribe(channels) as queue:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event['event']}\ndata: {json.dumps(event['vibe'])}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -7,10 +7,50 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
+from contextlib import suppress
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+
+class DisconnectAware:
+    """
+    Django 4.2 stops reading ``receive`` once the request body is in, so a
+    streaming response never learns that its client went away and an idle
+    event stream (with its subscription) would live as long as the worker.
+    This keeps reading: an ``http.disconnect`` before the response is
+    complete cancels the app, which unwinds the streaming generator and
+    its cleanup (Django 5 does the same itself).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        inbox = asyncio.Queue()
+        app = asyncio.create_task(self.app(scope, inbox.get, send))
+        pump = asyncio.create_task(self.pump(receive, inbox))
+        try:
+            await asyncio.wait((app, pump), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pump.cancel()
+            app.cancel()        # no-op once the response is complete
+        with suppress(asyncio.CancelledError):
+            await app
+
+    @staticmethod
+    async def pump(receive, inbox):
+        while True:
+            message = await receive()
+            inbox.put_nowait(message)
+            if message['type'] == 'http.disconnect':
+                return
+
+
+application = DisconnectAware(get_asgi_application())
@@ -0,0 +1,178 @@
+"""
+Media and static file delivery.
+
+Django decides whether a file may be served and with which cache headers;
+the bytes are moved by someone else:
+
+* behind the bundled nginx (``VIBES_MEDIA_ACCEL_REDIRECT``) the response is
+  an empty one carrying ``X-Accel-Redirect`` to an ``internal`` location
+  (see nginx/appseed-app.conf); nginx sends the file, Range requests and
+  all, without a Python worker touching it;
+* otherwise a FileResponse is returned. WSGI servers with a
+  ``wsgi.file_wrapper`` (gunicorn's sync workers) push it with
+  ``os.sendfile``. Under ASGI Django 4.2 would read a file body whole
+  before sending it, so there the file is read in
+  ``MediaFileResponse.block_size`` blocks off a worker thread
+  (config.streaming). Single byte ranges and conditional requests are
+  answered here.
+
+Content-addressed avatars (apps.users.avatars) are cached as immutable;
+other files for ``VIBES_MEDIA_MAX_AGE`` / ``VIBES_STATIC_MAX_AGE`` seconds.
+Media outside ``VIBES_MEDIA_PUBLIC_PREFIXES`` needs a logged-in user.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.static import was_modified_since
+
+from apps.users.avatars import is_content_addressed
+from config.streaming import async_chunks, is_asgi
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class MediaFileResponse(FileResponse):
+    block_size = 256 * 1024
+
+
+class FileRange:
+    """
+    ``length`` bytes of ``file`` from ``start``. Keeps ``fileno`` so a WSGI
+    file wrapper can still sendfile it: the offset is the file position and
+    the byte count comes from Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def read_blocks(file, block_size):
+    try:
+        while data := file.read(block_size):
+            yield data
+    finally:
+        file.close()
+
+
+def byte_range(header, size):
+    """
+    ``(start, end)`` (inclusive) of a single-range Range header, None to
+    send the whole file, or False when the range cannot be satisfied.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None      # no, malformed or multi-range: whole file
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve(request, path, document_root, accel_prefix, max_age, public_prefixes=None):
+    """
+    ``document_root``/``path``. ``public_prefixes`` None serves every file
+    to anyone; otherwise other paths need an authenticated user.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found.")
+
+    public = public_prefixes is None or path.startswith(tuple(public_prefixes))
+    if not public and not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    stat = os.stat(fullpath)
+    etag = quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    headers = {
+        'Content-Type':  content_type or 'application/octet-stream',
+        'Last-Modified': http_date(stat.st_mtime),
+        'ETag':          etag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (IMMUTABLE if is_content_addressed(path)
+                          else f"{'public' if public else 'private'}, max-age={max_age}"),
+    }
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    if request.headers.get('If-None-Match') == etag or (
+            'If-None-Match' not in request.headers
+            and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime)):
+        response = HttpResponse(status=304)
+        for name in ('Last-Modified', 'ETag', 'Cache-Control'):
+            response[name] = headers[name]
+        return response
+
+    if getattr(settings, 'VIBES_MEDIA_ACCEL_REDIRECT', False):
+        response = HttpResponse(headers=headers)
+        response['X-Accel-Redirect'] = quote(accel_prefix + path)
+        return response
+
+    # If-Range: only honour the range while the client's copy is current
+    if_range = request.headers.get('If-Range')
+    current = (if_range is None or if_range == etag
+               or parse_http_date_safe(if_range) == int(stat.st_mtime))
+    span = byte_range(request.headers.get('Range'), stat.st_size) if current else None
+    if span is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    start, end = span or (0, stat.st_size - 1)
+    length = end - start + 1 if stat.st_size else 0
+    if request.method == 'HEAD':
+        response = HttpResponse(status=206 if span else 200, headers=headers)
+    else:
+        body = FileRange(open(fullpath, 'rb'), start, length)
+        if is_asgi(request):
+            body = async_chunks(read_blocks(body, MediaFileResponse.block_size), thread_sensitive=False)
+        response = MediaFileResponse(body, status=206 if span else 200, headers=headers)
+    response['Content-Length'] = length
+    if span:
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return response
+
+
+def serve_media(request, path):
+    return serve(request, path, settings.MEDIA_ROOT, '/internal/media/',
+                 getattr(settings, 'VIBES_MEDIA_MAX_AGE', 3600),
+                 getattr(settings, 'VIBES_MEDIA_PUBLIC_PREFIXES', ('avatar/',)))
+
+
+def serve_static(request, path):
+    return serve(request, path, settings.STATIC_ROOT, '/internal/static/',
+                 getattr(settings, 'VIBES_STATIC_MAX_AGE', 86400))
@@ -132,6 +132,27 @@ else:
     }
 
 
+# Cache
+# A shared backend (Redis) is required in production so per-user cache
+# versions bumped by one worker are seen by all others.
+
+CACHE_URL = os.environ.get('CACHE_URL', None)
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND' : 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -216,7 +237,7 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.CachedTokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -255,3 +276,33 @@ DYNAMIC_API = {
     'product' : "apps.pages.models.Product",
 }
 ########################################
+
+# ### Vibes Settings ###
+VIBES_HISTORY_PAGE_SIZE     = int(os.environ.get('VIBES_HISTORY_PAGE_SIZE', 20))
+VIBES_HISTORY_MAX_PAGE_SIZE = int(os.environ.get('VIBES_HISTORY_MAX_PAGE_SIZE', 100))
+VIBES_EXPIRY_BATCH_SIZE     = int(os.environ.get('VIBES_EXPIRY_BATCH_SIZE', 500))
+VIBES_CACHE_TTL             = int(os.environ.get('VIBES_CACHE_TTL', 300))
+VIBES_BULK_MAX_ITEMS        = int(os.environ.get('VIBES_BULK_MAX_ITEMS', 100))
+VIBES_EXPORT_CHUNK_SIZE     = int(os.environ.get('VIBES_EXPORT_CHUNK_SIZE', 2000))
+VIBES_EVENTS_REDIS_URL      = os.environ.get('VIBES_EVENTS_REDIS_URL', None)   # unset = single process
+VIBES_EVENTS_HEARTBEAT      = int(os.environ.get('VIBES_EVENTS_HEARTBEAT', 15))
+VIBES_EVENTS_QUEUE_SIZE     = int(os.environ.get('VIBES_EVENTS_QUEUE_SIZE', 100))
+VIBES_EVENTS_TICKET_MAX_AGE = int(os.environ.get('VIBES_EVENTS_TICKET_MAX_AGE', 60))
+VIBES_MATCH_REBUILD_SECONDS = int(os.environ.get('VIBES_MATCH_REBUILD_SECONDS', 900))
+VIBES_ROLLUP_LAG_SECONDS    = int(os.environ.get('VIBES_ROLLUP_LAG_SECONDS', 60))
+VIBES_ARCHIVE_RETAIN_DAYS   = int(os.environ.get('VIBES_ARCHIVE_RETAIN_DAYS', 180))
+VIBES_ARCHIVE_BATCH_SIZE    = int(os.environ.get('VIBES_ARCHIVE_BATCH_SIZE', 2000))
+VIBES_IDEMPOTENCY_TTL       = int(os.environ.get('VIBES_IDEMPOTENCY_TTL', 3600))
+VIBES_AUTH_CACHE_TTL        = int(os.environ.get('VIBES_AUTH_CACHE_TTL', 300))
+VIBES_AUTH_LOCAL_TTL        = int(os.environ.get('VIBES_AUTH_LOCAL_TTL', 10))
+VIBES_AUTH_LOCAL_SIZE       = int(os.environ.get('VIBES_AUTH_LOCAL_SIZE', 10000))
+VIBES_LOGIN_HASH_WORKERS    = int(os.environ.get('VIBES_LOGIN_HASH_WORKERS', 4))
+VIBES_LOGIN_MAX_PENDING     = int(os.environ.get('VIBES_LOGIN_MAX_PENDING', 64))
+VIBES_DIRECTORY_COUNT_TTL   = int(os.environ.get('VIBES_DIRECTORY_COUNT_TTL', 300))
+VIBES_MEDIA_ACCEL_REDIRECT  = bool(str2bool(os.environ.get('VIBES_MEDIA_ACCEL_REDIRECT')))   # behind nginx/
+VIBES_MEDIA_PUBLIC_PREFIXES = ('avatar/',)      # other media needs a login
+VIBES_MEDIA_MAX_AGE         = int(os.environ.get('VIBES_MEDIA_MAX_AGE', 3600))
+VIBES_STATIC_MAX_AGE        = int(os.environ.get('VIBES_STATIC_MAX_AGE', 86400))
+VIBES_PROFILE_CACHE_TTL     = int(os.environ.get('VIBES_PROFILE_CACHE_TTL', 3600))
+VIBES_PROFILE_BATCH_MAX     = int(os.environ.get('VIBES_PROFILE_BATCH_MAX', 100))
+########################################
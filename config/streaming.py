@@ -0,0 +1,35 @@
+"""
+Streaming bodies that stay streamed under both kinds of server.
+
+Django 4.2 sends a StreamingHttpResponse body only in the form the server
+speaks: under ASGI a sync iterator is first read into a list, under WSGI an
+async one is. Views build their body as a plain iterator and, when the
+request came in over ASGI, hand it to ``async_chunks``, which pulls it one
+chunk at a time through ``sync_to_async``; memory then stays at one chunk
+whichever server runs the app.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+def is_asgi(request):
+    """Whether ``request`` (a Django or DRF request) came in over ASGI."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def async_chunks(chunks, thread_sensitive=True):
+    """
+    Yield ``chunks`` without blocking the event loop. ``thread_sensitive``
+    keeps every pull on the request's thread, which database cursors need;
+    plain file reads can pass False and use any worker thread. The iterator
+    is closed when the response is, even if the client left half way.
+    """
+    chunks = iter(chunks)
+    pull = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while (chunk := await pull(chunks, None)) is not None:
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            await sync_to_async(chunks.close, thread_sensitive=thread_sensitive)()
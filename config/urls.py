@@ -20,7 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
-from django.views.static import serve 
+from config.media import serve_media, serve_static
 
 urlpatterns = [
     path("", include("apps.dashboard.urls")),
@@ -29,9 +29,9 @@ urlpatterns = [
     path("vibes/", include("apps.vibes.urls")),
     path("__debug__/", include("debug_toolbar.urls")),
 
-    re_path(r'^media/(?P<path>.*)$', serve,{'document_root': settings.MEDIA_ROOT}), 
-    re_path(r'^static/(?P<path>.*)$', serve,{'document_root': settings.STATIC_ROOT}),     
+    # authorized here, sent by nginx (X-Accel-Redirect) or sendfile; see config/media.py
+    re_path(r'^media/(?P<path>.*)$', serve_media),
+    re_path(r'^static/(?P<path>.*)$', serve_static),
 ]
 
 urlpatterns += static(settings.CELERY_LOGS_URL, document_root=settings.CELERY_LOGS_DIR)
-urlpatterns += static(settings.MEDIA_URL      , document_root=settings.MEDIA_ROOT     )
@@ -0,0 +1,15 @@
+# -*- encoding: utf-8 -*-
+"""
+ASGI server for the vibes event stream (SSE) alone: an idle stream is a
+parked coroutine here instead of a pinned worker. Everything else stays on
+the WSGI workers of gunicorn-cfg.py; nginx/appseed-app.conf routes between
+them.
+"""
+
+bind = '0.0.0.0:5006'
+workers = 1
+worker_class = 'uvicorn.workers.UvicornWorker'
+accesslog = '-'
+loglevel = 'debug'
+capture_output = True
+enable_stdio_inheritance = True
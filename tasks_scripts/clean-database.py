@@ -5,12 +5,26 @@ Copyright (c) 2019 - present AppSeed.us
 
 import os, sys
 
+# Archives ended vibes (see apps/vibes/archive.py); extra arguments are
+# passed to the command, e.g. --max-batches 10
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 def main(argv):
         
     try:
         
         print(' EXEC -> ' + os.path.basename(__file__)) 
 
+        sys.path.insert(0, BASE_DIR)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+        import django
+        from django.core.management import call_command
+
+        django.setup()
+        call_command('archive_vibes', *argv[1:])
+
         # Unix ErrCode
         exit(0)
 